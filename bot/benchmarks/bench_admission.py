@@ -0,0 +1,96 @@
+"""Latency of well-behaved users while one user floods the bot.
+
+The abusive user keeps --abusive-clients requests open at all times, the
+others send one request every --interval seconds. Each request holds the
+serverless API for --service seconds. The baseline is a plain semaphore of
+the same concurrency, which serves the requests in arrival order. Run it from
+the bot directory:
+
+    python -m benchmarks.bench_admission --seconds 5
+"""
+import argparse
+import asyncio
+import random
+import time
+from contextlib import asynccontextmanager
+
+from src.agent.agent_admission import AdmissionController, AdmissionRejected
+
+
+class SemaphoreBaseline:
+    def __init__(self, concurrency: int):
+        self.semaphore = asyncio.Semaphore(concurrency)
+
+    @asynccontextmanager
+    async def admit(self, user_id, cost: float = 1.0):
+        async with self.semaphore:
+            yield
+
+
+def percentile(values, q):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))] if values else 0.0
+
+
+async def simulate(controller, args):
+    deadline = time.perf_counter() + args.seconds
+    latencies, rejected = [], [0]
+
+    async def call(user_id):
+        started = time.perf_counter()
+        try:
+            async with controller.admit(user_id):
+                await asyncio.sleep(args.service * random.uniform(0.5, 1.5))
+        except AdmissionRejected as e:
+            rejected[0] += 1
+            await asyncio.sleep(min(e.retry_after, 0.05))
+            return None
+        return time.perf_counter() - started
+
+    async def abuser(client):
+        while time.perf_counter() < deadline:
+            await call("abuser")
+
+    async def polite(user):
+        while time.perf_counter() < deadline:
+            latency = await call(f"user-{user}")
+            if latency is not None:
+                latencies.append(latency)
+            await asyncio.sleep(args.interval * random.uniform(0.5, 1.5))
+
+    await asyncio.gather(
+        *[abuser(client) for client in range(args.abusive_clients)],
+        *[polite(user) for user in range(args.users)],
+    )
+    return latencies, rejected[0]
+
+
+async def run(args):
+    random.seed(args.seed)
+    print(f"{'mode':>10} {'requests':>8} {'p50 ms':>7} {'p95 ms':>7} {'p99 ms':>7} {'rejected':>8}")
+    modes = [
+        ("semaphore", SemaphoreBaseline(args.concurrency)),
+        ("admission", AdmissionController(args.concurrency, per_user=2, max_queue=64, per_user_queue=4)),
+    ]
+    for name, controller in modes:
+        latencies, rejected = await simulate(controller, args)
+        print(
+            f"{name:>10} {len(latencies):>8} {percentile(latencies, 0.5) * 1000:>7.0f} "
+            f"{percentile(latencies, 0.95) * 1000:>7.0f} {percentile(latencies, 0.99) * 1000:>7.0f} {rejected:>8}"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--seconds", type=float, default=5.0)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--abusive-clients", type=int, default=40)
+    parser.add_argument("--users", type=int, default=10)
+    parser.add_argument("--interval", type=float, default=0.2, help="Seconds between the requests of a user.")
+    parser.add_argument("--service", type=float, default=0.05, help="Seconds each request takes.")
+    parser.add_argument("--seed", type=int, default=7)
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,128 @@
+"""Benchmark PodcastAgentBotAPI with a pooled session vs one session per call.
+
+A local aiohttp server stands in for API Gateway. Run it from the bot directory:
+
+    python -m benchmarks.bench_api_pool --requests 500 --concurrency 10 --tls
+"""
+import argparse
+import asyncio
+import os
+import ssl
+import statistics
+import subprocess
+import tempfile
+import time
+
+from aiohttp import web
+
+
+def make_certificate(directory: str):
+    cert = os.path.join(directory, "cert.pem")
+    key = os.path.join(directory, "key.pem")
+    subprocess.run(
+        [
+            "openssl", "req", "-x509", "-newkey", "rsa:2048", "-nodes",
+            "-keyout", key, "-out", cert, "-days", "1",
+            "-subj", "/CN=localhost",
+            "-addext", "subjectAltName=DNS:localhost,IP:127.0.0.1",
+        ],
+        check=True,
+        capture_output=True,
+    )
+    return cert, key
+
+
+async def start_server(port: int, ssl_context=None):
+    async def ask(request):
+        body = await request.json()
+        messages = body.get("messages", [])
+        return web.json_response(
+            {
+                "context": "stand-in",
+                "last_message": {"role": "assistant", "content": "pong"},
+                "memory": messages,
+                "memory_count": len(messages),
+            }
+        )
+
+    async def sessions(request):
+        return web.json_response([])
+
+    app = web.Application()
+    app.router.add_post("/gpt/ask", ask)
+    app.router.add_get("/sessions/", sessions)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", port, ssl_context=ssl_context)
+    await site.start()
+    return runner
+
+
+async def run_mode(api, requests: int, concurrency: int):
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+
+    async def one():
+        async with semaphore:
+            start = time.perf_counter()
+            res = await api.chat_completion([{"role": "user", "content": "ping"}])
+            latencies.append(time.perf_counter() - start)
+            assert res["last_message"]["content"] == "pong", res
+
+    await api.open()
+    start = time.perf_counter()
+    await asyncio.gather(*(one() for _ in range(requests)))
+    elapsed = time.perf_counter() - start
+    await api.close()
+
+    latencies.sort()
+    return {
+        "rps": requests / elapsed,
+        "p50_ms": statistics.median(latencies) * 1000,
+        "p99_ms": latencies[int(len(latencies) * 0.99) - 1] * 1000,
+    }
+
+
+async def main(args):
+    ssl_context = None
+    scheme = "http"
+    with tempfile.TemporaryDirectory() as tmp:
+        if args.tls:
+            cert, key = make_certificate(tmp)
+            ssl_context = ssl.create_default_context(ssl.Purpose.CLIENT_AUTH)
+            ssl_context.load_cert_chain(cert, key)
+            # Make the client trust the self-signed certificate.
+            os.environ["SSL_CERT_FILE"] = cert
+            scheme = "https"
+
+        # Imported late so aiohttp builds its SSL context after SSL_CERT_FILE is set.
+        from src.api.api_podcast_agent_bot import PodcastAgentBotAPI
+
+        runner = await start_server(args.port, ssl_context)
+        base_url = f"{scheme}://localhost:{args.port}"
+        try:
+            for pooled in (False, True):
+                api = PodcastAgentBotAPI(
+                    api_base_url=base_url,
+                    api_key_value="bench",
+                    api_key_header="x-api-key",
+                    pooled=pooled,
+                    connection_limit_per_host=args.concurrency,
+                )
+                result = await run_mode(api, args.requests, args.concurrency)
+                name = "pooled" if pooled else "per-call"
+                print(
+                    f"{name:>9}: {result['rps']:8.1f} req/s  "
+                    f"p50 {result['p50_ms']:7.2f} ms  p99 {result['p99_ms']:7.2f} ms"
+                )
+        finally:
+            await runner.cleanup()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=300)
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--tls", action="store_true", help="Serve over HTTPS to include the TLS handshake.")
+    asyncio.run(main(parser.parse_args()))
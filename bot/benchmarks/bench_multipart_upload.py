@@ -0,0 +1,120 @@
+"""Benchmark of the multipart uploader per part concurrency.
+
+A local aiohttp server stands in for the Discord CDN and S3. Each connection is
+limited to --connection-mbps, as a single TCP stream to a distant region is,
+so the throughput shows how much the parallel parts recover. The uploader reads
+the parts with ranged GETs and PUTs them to the presigned URLs. Run it from the
+bot directory:
+
+    python -m benchmarks.bench_multipart_upload --size-mb 200 --concurrency 1 2 4 8
+"""
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+import tracemalloc
+
+from aiohttp import web
+
+from src.api.api_multipart_upload import MultipartUploader, UrlSource
+
+
+class ThrottledStorage:
+    def __init__(self, size: int, bytes_per_second: float, latency: float):
+        self.source = os.urandom(size)
+        self.bytes_per_second = bytes_per_second
+        self.latency = latency
+        self.uploads = {}
+
+    async def throttle(self, size: int, started: float):
+        # The time a connection of bytes_per_second needs for the body
+        remaining = self.latency + size / self.bytes_per_second - (time.perf_counter() - started)
+        if remaining > 0:
+            await asyncio.sleep(remaining)
+
+    async def put_part(self, request):
+        started = time.perf_counter()
+        data = await request.read()
+        await self.throttle(len(data), started)
+        self.uploads.setdefault(request.match_info["upload_id"], {})[int(request.match_info["part"])] = len(data)
+        return web.Response(headers={"ETag": f'"{request.match_info["part"]}"'})
+
+    async def get_source(self, request):
+        started = time.perf_counter()
+        start, end = request.http_range.start, request.http_range.stop
+        await self.throttle(end - start, started)
+        return web.Response(status=206, body=self.source[start:end])
+
+
+class LocalServerless:
+    """The multipart endpoints of the serverless API, presigning local URLs."""
+
+    def __init__(self, storage: ThrottledStorage, base_url: str):
+        self.storage = storage
+        self.base_url = base_url
+
+    async def create_multipart_upload(self, key, size, part_size=None, content_type=None):
+        upload_id = f"upload-{len(self.storage.uploads)}"
+        self.storage.uploads[upload_id] = {}
+        count = -(-size // part_size)
+        parts = [{"part_number": n, "url": f"{self.base_url}/s3/{upload_id}/{n}"} for n in range(1, count + 1)]
+        return {"upload_id": upload_id, "part_size": part_size, "part_count": count, "parts": parts}
+
+    async def get_multipart_upload(self, upload_id, key, parts):
+        return {"uploaded": [], "parts": []}
+
+    async def complete_multipart_upload(self, upload_id, key, parts):
+        assert sum(self.storage.uploads[upload_id].values()) == len(self.storage.source)
+        return {"keyFile": key}
+
+    async def abort_multipart_upload(self, upload_id, key):
+        return {"aborted": True}
+
+
+async def run(args):
+    storage = ThrottledStorage(args.size_mb * 1024 * 1024, args.connection_mbps * 1024 * 1024 / 8, args.latency_ms / 1000)
+    app = web.Application(client_max_size=args.part_mb * 1024 * 1024 * 2)
+    app.router.add_put("/s3/{upload_id}/{part}", storage.put_part)
+    app.router.add_get("/episode.wav", storage.get_source)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    base_url = f"http://127.0.0.1:{site._server.sockets[0].getsockname()[1]}"
+    serverless = LocalServerless(storage, base_url)
+
+    print(
+        f"{args.size_mb} MB in parts of {args.part_mb} MB, {args.connection_mbps:g} Mbit/s "
+        f"and {args.latency_ms:g} ms per connection"
+    )
+    print(f"{'parts':>5} {'seconds':>8} {'MB/s':>7} {'speedup':>8} {'peak MB':>8}")
+    baseline = None
+    with tempfile.TemporaryDirectory() as state_path:
+        for concurrency in args.concurrency:
+            uploader = MultipartUploader(serverless, state_path, concurrency, args.part_mb * 1024 * 1024)
+            tracemalloc.start()
+            res = await uploader.upload(UrlSource(f"{base_url}/episode.wav"), "audio/episode.wav", len(storage.source))
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+            await uploader.close()
+            baseline = baseline or res["elapsed"]
+            print(
+                f"{concurrency:>5} {res['elapsed']:>8.2f} {res['throughput'] / 1024 / 1024:>7.1f} "
+                f"{baseline / res['elapsed']:>7.2f}x {peak / 1024 / 1024:>8.1f}"
+            )
+    await runner.cleanup()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--size-mb", type=int, default=200)
+    parser.add_argument("--part-mb", type=int, default=8)
+    parser.add_argument("--connection-mbps", type=float, default=200.0, help="Bandwidth of each connection.")
+    parser.add_argument("--latency-ms", type=float, default=40.0, help="Round trip added to each request.")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 2, 4, 8, 16])
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,59 @@
+"""Input tokens per question with the full transcript and with retrieval.
+
+Without retrieval the transcription is in the session memory, so every
+question sends it again. With retrieval only the top-k chunks of the local
+index are sent, whatever the length of the episode. The embeddings are the
+offline hashing backend, to measure the index without network calls. Run it
+from the bot directory:
+
+    python -m benchmarks.bench_retrieval --minutes 30 60 120 --top-k 4
+"""
+import argparse
+import asyncio
+import random
+import tempfile
+import time
+
+from benchmarks.bench_summarizer import generate_transcript
+from src.agent.agent_context import ContextWindow
+from src.agent.agent_embeddings import HashingEmbedding
+from src.agent.agent_retrieval import TranscriptIndex
+
+QUESTION = "What did the guest say about the market data of the model?"
+
+
+async def run(args):
+    count_tokens = ContextWindow().count_text
+    rnd = random.Random(args.seed)
+    print(f"{'minutes':>7} {'full':>8} {'retrieval':>9} {'index s':>8} {'search ms':>9}")
+    with tempfile.TemporaryDirectory() as directory:
+        index = TranscriptIndex(
+            HashingEmbedding(), directory, args.chunk_tokens, top_k=args.top_k, count_tokens=count_tokens
+        )
+        for minutes in args.minutes:
+            text = generate_transcript(rnd, minutes)
+            full = count_tokens(text) + count_tokens(QUESTION)
+
+            started = time.perf_counter()
+            transcript_id = await index.add(text)
+            indexed = time.perf_counter() - started
+            started = time.perf_counter()
+            for _ in range(args.questions):
+                excerpts = await index.search(transcript_id, QUESTION)
+            searched = (time.perf_counter() - started) / args.questions * 1000
+            retrieval = sum(count_tokens(chunk) for chunk, _ in excerpts) + count_tokens(QUESTION)
+            print(f"{minutes:>7} {full:>8} {retrieval:>9} {indexed:>8.2f} {searched:>9.2f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--minutes", type=int, nargs="+", default=[30, 60, 120])
+    parser.add_argument("--chunk-tokens", type=int, default=300)
+    parser.add_argument("--top-k", type=int, default=4)
+    parser.add_argument("--questions", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=7)
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
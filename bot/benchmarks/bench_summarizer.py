@@ -0,0 +1,88 @@
+"""Wall time of the map-reduce summary per transcript length and concurrency.
+
+The chat completions are simulated: each request takes a fixed latency plus a
+prefill time per input token and a decode time per output token, with rates in
+the range of the hosted GPT models. The single request baseline is the previous
+/summarize approach, which only works while the transcript fits the context.
+Run it from the bot directory:
+
+    python -m benchmarks.bench_summarizer --minutes 30 60 120 --concurrency 1 4 8
+"""
+import argparse
+import asyncio
+import random
+import time
+
+from src.agent.agent_context import ContextWindow
+from src.agent.agent_summarizer import TranscriptSummarizer
+
+WORDS = "the of and to a in that is was podcast guest host episode market data model team question answer".split()
+
+
+class SimulatedModel:
+    def __init__(self, count_tokens, latency: float, prefill: float, decode: float, output_tokens: int, scale: float):
+        self.count_tokens = count_tokens
+        self.latency = latency
+        self.prefill = prefill
+        self.decode = decode
+        self.output_tokens = output_tokens
+        self.scale = scale
+
+    async def chat_completion(self, messages):
+        tokens = sum(self.count_tokens(message["content"]) for message in messages)
+        seconds = self.latency + tokens * self.prefill + self.output_tokens * self.decode
+        await asyncio.sleep(seconds * self.scale)
+        content = " ".join(["Summary of the part."] * (self.output_tokens // 5))
+        return {"last_message": {"role": "assistant", "content": content}}
+
+
+def generate_transcript(rnd: random.Random, minutes: int) -> str:
+    lines, seconds = [], 0
+    while seconds < minutes * 60:
+        sentence = " ".join(rnd.choices(WORDS, k=rnd.randint(8, 30)))
+        lines.append(f"[{seconds // 3600:02d}:{seconds // 60 % 60:02d}:{seconds % 60:02d}] Host: {sentence}.")
+        seconds += rnd.randint(4, 12)
+    return "\n".join(lines)
+
+
+async def run(args):
+    count_tokens = ContextWindow().count_text
+    rnd = random.Random(args.seed)
+    print(f"{'minutes':>7} {'tokens':>7} {'mode':>12} {'chunks':>6} {'requests':>8} {'seconds':>8}")
+    for minutes in args.minutes:
+        text = generate_transcript(rnd, minutes)
+        tokens = count_tokens(text)
+
+        model = SimulatedModel(count_tokens, args.latency, args.prefill, args.decode, 400, args.scale)
+        started = time.perf_counter()
+        await model.chat_completion([{"role": "user", "content": text}])
+        single = (time.perf_counter() - started) / args.scale
+        fits = "" if tokens <= args.context_tokens else " (over context)"
+        print(f"{minutes:>7} {tokens:>7} {'single':>12} {1:>6} {1:>8} {single:>8.1f}{fits}")
+
+        for concurrency in args.concurrency:
+            model = SimulatedModel(count_tokens, args.latency, args.prefill, args.decode, 200, args.scale)
+            summarizer = TranscriptSummarizer(model, args.chunk_tokens, concurrency=concurrency, count_tokens=count_tokens)
+            started = time.perf_counter()
+            _, stats = await summarizer.summarize(text)
+            elapsed = (time.perf_counter() - started) / args.scale
+            mode = f"map x{concurrency}"
+            print(f"{minutes:>7} {tokens:>7} {mode:>12} {stats['chunks']:>6} {stats['requests']:>8} {elapsed:>8.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--minutes", type=int, nargs="+", default=[30, 60, 120])
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 8, 16])
+    parser.add_argument("--chunk-tokens", type=int, default=3000)
+    parser.add_argument("--context-tokens", type=int, default=16000, help="Context window of the model.")
+    parser.add_argument("--latency", type=float, default=0.5, help="Seconds of latency per request.")
+    parser.add_argument("--prefill", type=float, default=0.0002, help="Seconds per input token.")
+    parser.add_argument("--decode", type=float, default=0.02, help="Seconds per output token.")
+    parser.add_argument("--scale", type=float, default=0.01, help="Speed of the simulated clock.")
+    parser.add_argument("--seed", type=int, default=7)
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
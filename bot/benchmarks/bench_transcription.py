@@ -0,0 +1,64 @@
+"""Real-time factor of the local Whisper transcription per worker count.
+
+For each worker count the pool is started and warmed up first, so the model
+loading is not measured, then the whole episode is transcribed. The real-time
+factor is the wall time over the audio duration: below 1 is faster than real
+time. Run it from the bot directory, with an hour long episode ideally:
+
+    python -m benchmarks.bench_transcription --audio files/audio/episode.mp3 --model base
+    python -m benchmarks.bench_transcription --audio episode.mp3 --workers 1 4 8 16
+"""
+import argparse
+import os
+import time
+
+import numpy as np
+
+from src.audio.audio_transcriber import SAMPLE_RATE, AudioTranscriber, load_audio
+
+
+def worker_counts(cores: int):
+    counts, count = [], 1
+    while count < cores:
+        counts.append(count)
+        count *= 2
+    return counts + [cores]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--audio", required=True, help="Audio file to transcribe.")
+    parser.add_argument("--model", default="base", help="Whisper model.")
+    parser.add_argument("--language", default=None, help="Skip the language detection of each part.")
+    parser.add_argument("--minutes", type=float, default=None, help="Only the first N minutes of the audio.")
+    parser.add_argument("--segment-seconds", type=float, default=120.0)
+    parser.add_argument("--workers", type=int, nargs="+", default=None, help="Worker counts, powers of two up to the cores by default.")
+    args = parser.parse_args()
+
+    samples = load_audio(args.audio)
+    if args.minutes:
+        samples = samples[: int(args.minutes * 60 * SAMPLE_RATE)]
+    duration = len(samples) / SAMPLE_RATE
+    print(f"{args.audio}: {duration / 60:.1f} min, model {args.model}, {os.cpu_count()} cores")
+    print(f"{'workers':>7} {'parts':>6} {'wall s':>8} {'RTF':>7} {'speedup':>8}")
+
+    baseline = None
+    for workers in args.workers or worker_counts(os.cpu_count() or 1):
+        transcriber = AudioTranscriber(args.model, workers, args.segment_seconds)
+        # Loads the model in every worker before the clock starts
+        warm_up = np.zeros(workers * 30 * SAMPLE_RATE, np.float32)
+        transcriber.transcribe_samples(warm_up, args.language)
+
+        started = time.perf_counter()
+        result = transcriber.transcribe_samples(samples, args.language)
+        elapsed = time.perf_counter() - started
+        baseline = baseline or elapsed
+        print(
+            f"{workers:>7} {result['parts']:>6} {elapsed:>8.1f} {elapsed / duration:>7.3f} "
+            f"{baseline / elapsed:>7.2f}x"
+        )
+        transcriber.executor.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -8,8 +8,11 @@ commands_info = [
     "`/clear` - Clears your chat history, removing all previous interactions and responses.",
     "`/save_session` - Save the current conversation to the memory persistance."
     "`/delete_session [session_id]` - Delete a specific session using the provided session ID.",
+    "`/delete_sessions [session_ids]` - Delete many sessions at once, separate the session IDs with spaces or commas.",
+    "`/clear_sessions [session_ids]` - Delete the messages of many saved sessions at once, keeping the sessions.",
     "`/restore_session [session_id]` - Restore a previous session using the provided session ID.",
-    "`/get_all_sessions` - Get a list of all available sessions."
+    "`/get_all_sessions` - Get your saved sessions, newest first, page by page."
+    "`/search_sessions [query]` - Find your saved sessions that talk about something, best match first.",
     "`/help` - Displays this list of commands, helping you understand how to interact with the agent.",
 ]
 
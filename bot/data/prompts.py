@@ -12,3 +12,31 @@ Once you receive it, please acknowledge by saying 'Incredible, I just received t
 Let's proceed to analyze the podcast together.' After that, wait for my cue to ask questions or analyze 
 the text further. Do not generate a summary until I specifically request it.
 """
+
+context_summary_prompt = """
+You maintain a running summary of a conversation between a user and a podcast analysis assistant. 
+You will receive the current summary, which may be empty, followed by older messages of the conversation. 
+Update the summary so that it keeps every fact, decision, question and podcast detail that may be needed 
+later in the conversation. Write it in the language of the conversation, in plain prose, and do not 
+exceed 300 words. Reply with the updated summary only.
+"""
+
+chunk_summary_prompt = """
+You will receive one part of the transcription of a podcast, with its position in the episode. 
+Summarize this part in at most 150 words. Keep the topics discussed, the arguments, the names, 
+figures and conclusions mentioned, in the order they appear. Do not add an introduction or 
+information that is not in the text. Write in the language of the transcription.
+"""
+
+reduce_summary_prompt = """
+You will receive the summaries of consecutive parts of the transcription of a podcast, in order. 
+Merge them into one summary of at most 250 words that keeps the key points, the names and the 
+conclusions, without repeating what the parts share. Write in the language of the summaries 
+and reply with the summary only.
+"""
+
+retrieval_transcription_prompt = """
+I shared the transcription of an audio with you. It is not included in full: each of my next 
+questions comes with the excerpts of the transcription most relevant to it, with their timestamps. 
+Answer from these excerpts and say so when they do not contain the answer.
+"""
@@ -1,4 +1,5 @@
 from importlib import metadata
+import asyncio
 import os
 import discord
 
@@ -6,37 +7,208 @@ from dotenv import load_dotenv, find_dotenv
 from common.utils.utils import read_json
 
 from bot.src.discord.discord_client import DiscordClient, DiscordSender
+from src.discord.discord_scheduler import OutboundScheduler
 
 from src.agent.agent_podcast import PodcastAgent
-from src.agent.agent_memory import InMemoryDB
+from src.agent.agent_memory import ShardedMemoryDB
+from src.agent.agent_context import ContextWindow
+from src.agent.agent_embeddings import HashingEmbedding, ServerlessEmbedding
+from src.agent.agent_semantic_cache import SemanticCache
+from src.agent.agent_summarizer import TranscriptSummarizer
+from src.agent.agent_retrieval import TranscriptIndex
+from src.agent.agent_search import SessionSearch
+from src.agent.agent_admission import AdmissionController
+from src.audio.audio_transcriber import AudioTranscriber, AUDIO_EXTENSIONS
+from src.audio.audio_cache import TranscriptionCache, download
 
 from data.discord import commands_info, usage_info, copyright_info
 from data.prompts import summarize_prompt, pre_transcription_prompt
 
 from bot.src.api.api_podcast_agent_bot import PodcastAgentBotAPI
+from src.api.api_session_cache import SessionCache
+from src.api.api_multipart_upload import MultipartUploader, UrlSource
 
 load_dotenv(find_dotenv())
 API_BASE_URL = os.getenv("API_BASE_URL")
 API_KEY_VALUE = os.getenv("API_KEY_VALUE")
 API_KEY_HEADER = os.getenv("API_KEY_HEADER")
+API_CONNECTION_LIMIT = int(os.getenv("API_CONNECTION_LIMIT", 100))
+API_CONNECTION_LIMIT_PER_HOST = int(os.getenv("API_CONNECTION_LIMIT_PER_HOST", 20))
+API_REQUEST_TIMEOUT = float(os.getenv("API_REQUEST_TIMEOUT", 30))
+API_STREAM_URL = os.getenv("API_STREAM_URL")
+STREAM_EDIT_INTERVAL = float(os.getenv("STREAM_EDIT_INTERVAL", 1.0))
+# Keep the conversation history in the memory table and send only new messages
+ASK_SERVER_HISTORY = os.getenv("ASK_SERVER_HISTORY", "false").lower() == "true"
+MEMORY_MAX_SESSIONS = int(os.getenv("MEMORY_MAX_SESSIONS", 1000))
+MEMORY_IDLE_TTL = float(os.getenv("MEMORY_IDLE_TTL", 3600))
+MEMORY_PER_CHANNEL = os.getenv("MEMORY_PER_CHANNEL", "false").lower() == "true"
+CONTEXT_MAX_TOKENS = int(os.getenv("CONTEXT_MAX_TOKENS", 6000))
+CONTEXT_SUMMARIZE = os.getenv("CONTEXT_SUMMARIZE", "true").lower() == "true"
+# Embedding backend: "openai" uses the serverless API, "offline" the local stand-in
+EMBEDDINGS_BACKEND = os.getenv("EMBEDDINGS_BACKEND", "openai")
+SEMANTIC_CACHE = os.getenv("SEMANTIC_CACHE", "false").lower() == "true"
+SEMANTIC_CACHE_THRESHOLD = float(os.getenv("SEMANTIC_CACHE_THRESHOLD", 0.92))
+SEMANTIC_CACHE_MAX_ENTRIES = int(os.getenv("SEMANTIC_CACHE_MAX_ENTRIES", 1000))
+SESSIONS_PAGE_SIZE = int(os.getenv("SESSIONS_PAGE_SIZE", 10))
+# Send the top excerpts of the transcription with each question instead of all of it
+TRANSCRIPT_RETRIEVAL = os.getenv("TRANSCRIPT_RETRIEVAL", "false").lower() == "true"
+RETRIEVAL_TOP_K = int(os.getenv("RETRIEVAL_TOP_K", 4))
+RETRIEVAL_CHUNK_TOKENS = int(os.getenv("RETRIEVAL_CHUNK_TOKENS", 300))
+# Saved sessions read from memory until the bot changes them, 0 entries to disable
+SESSION_CACHE_MAX_ENTRIES = int(os.getenv("SESSION_CACHE_MAX_ENTRIES", 256))
+SESSION_CACHE_TTL = float(os.getenv("SESSION_CACHE_TTL", 300))
+# Requests in progress at a time, overall and per user, and how many can wait
+ADMISSION_MAX_CONCURRENCY = int(os.getenv("ADMISSION_MAX_CONCURRENCY", 8))
+ADMISSION_PER_USER = int(os.getenv("ADMISSION_PER_USER", 2))
+ADMISSION_MAX_QUEUE = int(os.getenv("ADMISSION_MAX_QUEUE", 64))
+ADMISSION_PER_USER_QUEUE = int(os.getenv("ADMISSION_PER_USER_QUEUE", 4))
+# Restored sessions that need more messages are replayed as a Markdown file
+REPLAY_MAX_MESSAGES = int(os.getenv("REPLAY_MAX_MESSAGES", 5))
+# Seconds before the welcome text is sent again to a channel
+WELCOME_COOLDOWN = float(os.getenv("WELCOME_COOLDOWN", 600))
+# Inverted index of the saved sessions for /search_sessions
+SESSION_SEARCH = os.getenv("SESSION_SEARCH", "true").lower() == "true"
+SESSION_SEARCH_RESULTS = int(os.getenv("SESSION_SEARCH_RESULTS", 5))
+SUMMARY_CHUNK_TOKENS = int(os.getenv("SUMMARY_CHUNK_TOKENS", 3000))
+SUMMARY_CONCURRENCY = int(os.getenv("SUMMARY_CONCURRENCY", 4))
+WHISPER_MODEL = os.getenv("WHISPER_MODEL", "base")
+# Transcription worker processes, one per core by default
+TRANSCRIPTION_WORKERS = int(os.getenv("TRANSCRIPTION_WORKERS", 0)) or None
+TRANSCRIPTION_SEGMENT_SECONDS = float(os.getenv("TRANSCRIPTION_SEGMENT_SECONDS", 120))
+TRANSCRIPTION_CACHE_MAX_MB = int(os.getenv("TRANSCRIPTION_CACHE_MAX_MB", 512))
+# Bucket shared by the bot instances, the cache is only local without it
+TRANSCRIPTION_CACHE_BUCKET = os.getenv("TRANSCRIPTION_CACHE_BUCKET")
+# Keep the uploaded audio in the S3 bucket of the serverless API
+UPLOAD_AUDIO_TO_S3 = os.getenv("UPLOAD_AUDIO_TO_S3", "false").lower() == "true"
+UPLOAD_CONCURRENCY = int(os.getenv("UPLOAD_CONCURRENCY", 4))
+UPLOAD_PART_SIZE_MB = int(os.getenv("UPLOAD_PART_SIZE_MB", 8))
 
 # Initialize models
 assistant = read_json("./config/prompt_assistant.json")
-inmemory = InMemoryDB(assistant_prompt=assistant)
 serverless = PodcastAgentBotAPI(
     api_base_url=API_BASE_URL,
     api_key_value=API_KEY_VALUE,
     api_key_header=API_KEY_HEADER,
+    connection_limit=API_CONNECTION_LIMIT,
+    connection_limit_per_host=API_CONNECTION_LIMIT_PER_HOST,
+    request_timeout=API_REQUEST_TIMEOUT,
+    stream_url=API_STREAM_URL,
+    session_cache=(
+        SessionCache(SESSION_CACHE_MAX_ENTRIES, SESSION_CACHE_TTL) if SESSION_CACHE_MAX_ENTRIES > 0 else None
+    ),
+)
+
+
+async def flush_session(session_id, messages, metadata):
+    # Evicted sessions are saved and searchable as if /save was used
+    res = await serverless.save_session(session_id, messages, metadata)
+    if res.get("status") != "error":
+        await podcast_gpt.index_session(session_id, messages, metadata)
+    return res
+
+
+inmemory = ShardedMemoryDB(
+    assistant_prompt=assistant,
+    max_sessions=MEMORY_MAX_SESSIONS,
+    idle_ttl=MEMORY_IDLE_TTL,
+    per_channel=MEMORY_PER_CHANNEL,
+    # Server-side sessions are already persisted turn by turn
+    flush_session=None if ASK_SERVER_HISTORY else flush_session,
+)
+
+context_window = ContextWindow(
+    max_tokens=CONTEXT_MAX_TOKENS,
+    pinned_messages=len(assistant or []),
+)
+
+embeddings = (
+    HashingEmbedding() if EMBEDDINGS_BACKEND == "offline" else ServerlessEmbedding(serverless)
+)
+semantic_cache = (
+    SemanticCache(
+        embeddings,
+        threshold=SEMANTIC_CACHE_THRESHOLD,
+        max_entries=SEMANTIC_CACHE_MAX_ENTRIES,
+    )
+    if SEMANTIC_CACHE
+    else None
+)
+
+summarizer = TranscriptSummarizer(
+    serverless,
+    chunk_tokens=SUMMARY_CHUNK_TOKENS,
+    concurrency=SUMMARY_CONCURRENCY,
+    count_tokens=context_window.count_text,
+)
+
+audio = AudioTranscriber(
+    model_name=WHISPER_MODEL,
+    workers=TRANSCRIPTION_WORKERS,
+    segment_seconds=TRANSCRIPTION_SEGMENT_SECONDS,
 )
 
 base_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "files")
-podcast_gpt = PodcastAgent(serverless, inmemory, base_path)
+transcription_cache = TranscriptionCache(
+    os.path.join(base_path, "transcriptions", "cache"),
+    max_bytes=TRANSCRIPTION_CACHE_MAX_MB * 1024 * 1024,
+    s3_bucket=TRANSCRIPTION_CACHE_BUCKET,
+)
+retrieval = (
+    TranscriptIndex(
+        embeddings,
+        os.path.join(base_path, "transcriptions", "index"),
+        chunk_tokens=RETRIEVAL_CHUNK_TOKENS,
+        top_k=RETRIEVAL_TOP_K,
+        count_tokens=context_window.count_text,
+    )
+    if TRANSCRIPT_RETRIEVAL
+    else None
+)
+session_search = SessionSearch(os.path.join(base_path, "search", "sessions.json.gz")) if SESSION_SEARCH else None
+uploader = MultipartUploader(
+    serverless,
+    os.path.join(base_path, "uploads"),
+    concurrency=UPLOAD_CONCURRENCY,
+    part_size=UPLOAD_PART_SIZE_MB * 1024 * 1024,
+)
+podcast_gpt = PodcastAgent(
+    serverless,
+    inmemory,
+    base_path,
+    context_window=context_window,
+    semantic_cache=semantic_cache,
+    server_history=ASK_SERVER_HISTORY,
+    audio=audio,
+    transcription_cache=transcription_cache,
+    summarizer=summarizer,
+    retrieval=retrieval,
+    search=session_search,
+)
+# Keeps one user from taking the whole serverless API throttle
+admission = AdmissionController(
+    max_concurrency=ADMISSION_MAX_CONCURRENCY,
+    per_user=ADMISSION_PER_USER,
+    max_queue=ADMISSION_MAX_QUEUE,
+    per_user_queue=ADMISSION_PER_USER_QUEUE,
+)
+if CONTEXT_SUMMARIZE:
+    # Older turns are folded into a rolling summary instead of being dropped
+    context_window.summarize = podcast_gpt.summarize_turns
 
 
 def run():
     """Run discord bot using discord client and sender."""
     intents = discord.Intents.all()
 
+    scheduler = OutboundScheduler()
+
+    async def report_outbound():
+        print(scheduler)
+        print(admission)
+        print(serverless.singleflight)
+        if serverless.session_cache is not None:
+            print(serverless.session_cache)
+
     client = DiscordClient(
         intents=intents,
         guild_id=int(os.getenv("DISCORD_GUILD_ID")),
@@ -46,8 +218,12 @@ def run():
         context=str(podcast_gpt),
         usage=usage_info,
         copyright=copyright_info,
+        startup_hooks=[serverless.open] + ([uploader.resume_pending] if UPLOAD_AUDIO_TO_S3 else []),
+        shutdown_hooks=[inmemory.flush_all, serverless.close, audio.close, uploader.close, report_outbound],
+        scheduler=scheduler,
+        welcome_cooldown=WELCOME_COOLDOWN,
     )
-    sender = DiscordSender()
+    sender = DiscordSender(scheduler)
 
     @client.tree.command(
         name="help",
@@ -78,9 +254,22 @@ def run():
 
         await interaction.response.defer()
         try:
-            last_message, context, memory, memory_count = (
-                await podcast_gpt.get_response(user_id, message)
-            )
+            async with admission.admit(user_id):
+                if API_STREAM_URL:
+                    # Show the answer while it is generated instead of waiting for all of it
+                    deltas = podcast_gpt.get_response_stream(
+                        user_id, message, interaction.channel_id
+                    )
+                    await sender.send_stream(
+                        interaction, user_id, message, deltas, STREAM_EDIT_INTERVAL
+                    )
+                    return
+
+                last_message, context, memory, memory_count = (
+                    await podcast_gpt.get_response(
+                        user_id, message, interaction.channel_id
+                    )
+                )
             await sender.send_message(
                 interaction, user_id, message, last_message["content"]
             )
@@ -101,7 +290,8 @@ def run():
 
         await interaction.response.defer()
         try:
-            res = await podcast_gpt.save_session()
+            async with admission.admit(user_id):
+                res = await podcast_gpt.save_session(user_id, interaction.channel_id)
             if res.get("status") == "error":
                 raise Exception("Error saving the memory. Please try again.")
 
@@ -117,7 +307,7 @@ def run():
 
     @client.tree.command(
         name="get_all_sessions",
-        description="Restore a conversation using session_id.",
+        description="List your saved sessions, newest first.",
     )
     async def get_all_sessions(interaction: discord.Interaction):
         user_id = interaction.user.id
@@ -127,30 +317,70 @@ def run():
             await sender.send_message(interaction, user_id, "/restore", send)
             return
 
+        await interaction.response.defer()
+
+        async def pages():
+            # Each page is requested from the API only when the user asks for more
+            count = 0
+            async for page in podcast_gpt.iter_sessions(user_id, SESSIONS_PAGE_SIZE):
+                sessions = page.get("sessions", [])
+                body = []
+                if count == 0:
+                    body += [
+                        "Here are your saved sessions, newest first:",
+                        "--------------------------------------------------------",
+                    ]
+                for session in sessions:
+                    metadata = session.get("metadata", {})
+                    message_count = session.get("message_count", 0)
+
+                    pk = session.get("pk", "").replace("SESSION#", "")
+                    date = session.get("created_at", "No date")
+                    title = metadata.get("title", "No title")
+
+                    text = f"- {title} with session_id `{pk}`. It has {message_count} messages. ({date.split('T')[0].replace('-', '/')})"
+                    body.append(text)
+                count += len(sessions)
+                if count == 0:
+                    body.append("You don't have saved sessions.")
+                if not page.get("cursor"):
+                    body.append("--------------------------------------------------------")
+                    body.append(
+                        "To restore a session, use the `/restore` command with the session_id."
+                    )
+                yield "\n".join(body), bool(page.get("cursor"))
+
+        await sender.send_pages(interaction, user_id, "/get_all_sessions", pages())
+
+    @client.tree.command(
+        name="search_sessions",
+        description="Find your saved sessions that talk about something.",
+    )
+    async def search_sessions(interaction: discord.Interaction, query: str):
+        user_id = interaction.user.id
+
+        if client.is_channel_allowed(str(interaction.channel_id)) is False:
+            send = "You're not allowed to use this command in this channel."
+            await sender.send_message(interaction, user_id, "/search_sessions", send)
+            return
+
         await interaction.response.defer()
         try:
-            res = await podcast_gpt.get_all_sessions()
-            body = [
-                f"You saved {len(res)} sessions. Here are the details:",
-                "--------------------------------------------------------",
-            ]
-            for session in res:
-                metadata = session.get("metadata", {})
-                messages = session.get("messages", [])
-                
-                pk = session.get("pk", "").replace("SESSION#", "")
-                date = session.get("created_at", "No date")
-                title = metadata.get("title", "No title")
-                
-                text = f"- {title} with session_id `{pk}`. It has {len(messages)} messages. ({date.split('T')[0].replace('-', '/')})"
-                body.append(text)
-            body.append("--------------------------------------------------------")
-            body.append(
-                "To restore a session, use the `/restore` command with the session_id."
-            )
-            await sender.send_message(interaction, user_id, "/restore", "\n".join(body))
+            async with admission.admit(user_id):
+                results = await podcast_gpt.search_sessions(user_id, query, SESSION_SEARCH_RESULTS)
+            if not results:
+                send = f"No saved sessions match `{query}`."
+            else:
+                body = [f"Saved sessions matching `{query}`, best first:"]
+                for result in results:
+                    body.append(f"- {result['title'] or 'No title'} with session_id `{result['session_id']}`")
+                    if result["snippet"]:
+                        body.append(f"  > {result['snippet']}")
+                body.append("To restore a session, use the `/restore` command with the session_id.")
+                send = "\n".join(body)
+            await sender.send_message(interaction, user_id, "/search_sessions", send)
         except Exception as e:
-            await sender.send_message(interaction, user_id, "/restore", str(e))
+            await sender.send_message(interaction, user_id, "/search_sessions", str(e))
 
     @client.tree.command(
         name="restore_session",
@@ -166,7 +396,10 @@ def run():
 
         await interaction.response.defer()
         try:
-            restored_messages = await podcast_gpt.restore_session(session_id)
+            async with admission.admit(user_id):
+                restored_messages = await podcast_gpt.restore_session(
+                    session_id, user_id, interaction.channel_id
+                )
 
             user_message = [
                 "Memory restored successfully. We're ready to continue the conversation 😃",
@@ -175,13 +408,16 @@ def run():
             await sender.send_message(
                 interaction, user_id, "/restore", "\n".join(user_message)
             )
-            
-            restored_messages.pop(0)
-            for msg in restored_messages:
-                if msg["role"] == "assistant":
-                    await sender.send_message(
-                        interaction, user_id, "/restore", msg["content"]
-                    )
+
+            # Skip the assistant prompt without mutating the restored session
+            await sender.send_replay(
+                interaction,
+                user_id,
+                "/restore",
+                restored_messages[podcast_gpt.pinned_messages:],
+                f"Session {session_id}",
+                max_messages=REPLAY_MAX_MESSAGES,
+            )
         except Exception as e:
             await sender.send_message(interaction, user_id, "/restore", str(e))
 
@@ -199,7 +435,7 @@ def run():
 
         await interaction.response.defer()
         try:
-            podcast_gpt.clear_memory()
+            podcast_gpt.clear_memory(user_id, interaction.channel_id)
             messages = [
                 "Memory cleared successfully. We're ready for the next conversation. 🚀",
                 "If you want to restore the conversation, use the /restore command.",
@@ -224,7 +460,8 @@ def run():
 
         await interaction.response.defer()
         try:
-            res = await podcast_gpt.delete_session(session_id)
+            async with admission.admit(user_id):
+                res = await podcast_gpt.delete_session(session_id)
             if res.get("status") == "error":
                 raise Exception("Session not found. Please check the session_id.")
 
@@ -239,6 +476,66 @@ def run():
         except Exception as e:
             await sender.send_message(interaction, user_id, "/delete", str(e))
 
+    def parse_session_ids(session_ids: str) -> list:
+        # Session ids separated by spaces or commas, as pasted from /get_all_sessions
+        return [session_id.strip("`") for session_id in session_ids.replace(",", " ").split() if session_id.strip("`")]
+
+    def format_batch_result(res: dict, done_key: str, done_text: str) -> str:
+        lines = []
+        if res.get(done_key):
+            lines.append(f"{done_text}: {', '.join(f'`{s}`' for s in res[done_key])}")
+        if res.get("not_found"):
+            lines.append(f"Not found: {', '.join(f'`{s}`' for s in res['not_found'])}")
+        if res.get("failed"):
+            lines.append(f"Failed, please try again: {', '.join(f'`{s}`' for s in res['failed'])}")
+        return "\n".join(lines) or "Nothing to do."
+
+    @client.tree.command(
+        name="delete_sessions",
+        description="Delete many conversations using their session_ids.",
+    )
+    async def delete_sessions(interaction: discord.Interaction, session_ids: str):
+        user_id = interaction.user.id
+
+        if client.is_channel_allowed(str(interaction.channel_id)) is False:
+            send = "You're not allowed to use this command in this channel."
+            await sender.send_message(interaction, user_id, "/delete_sessions", send)
+            return
+
+        await interaction.response.defer()
+        try:
+            async with admission.admit(user_id):
+                res = await podcast_gpt.delete_sessions(parse_session_ids(session_ids))
+            if res.get("status") == "error":
+                raise Exception("Failed to delete the sessions. Please check the session_ids.")
+            send = format_batch_result(res, "deleted", "Deleted 🗑️")
+            await sender.send_message(interaction, user_id, "/delete_sessions", send)
+        except Exception as e:
+            await sender.send_message(interaction, user_id, "/delete_sessions", str(e))
+
+    @client.tree.command(
+        name="clear_sessions",
+        description="Delete the messages of many saved conversations, keeping the sessions.",
+    )
+    async def clear_sessions(interaction: discord.Interaction, session_ids: str):
+        user_id = interaction.user.id
+
+        if client.is_channel_allowed(str(interaction.channel_id)) is False:
+            send = "You're not allowed to use this command in this channel."
+            await sender.send_message(interaction, user_id, "/clear_sessions", send)
+            return
+
+        await interaction.response.defer()
+        try:
+            async with admission.admit(user_id):
+                res = await podcast_gpt.clear_sessions(parse_session_ids(session_ids))
+            if res.get("status") == "error":
+                raise Exception("Failed to clear the sessions. Please check the session_ids.")
+            send = format_batch_result(res, "cleared", "Cleared")
+            await sender.send_message(interaction, user_id, "/clear_sessions", send)
+        except Exception as e:
+            await sender.send_message(interaction, user_id, "/clear_sessions", str(e))
+
     @client.tree.command(
         name="purge_channel",
         description="Purge the chat history of the user.",
@@ -258,11 +555,108 @@ def run():
             send = f"Channel purged. Removed {len(deleted)} messages."
             await sender.send_message(interaction, user_id, "/purge", send)
 
-    # TODO: Upload Audio to s3 server and transcribe it using ChatGPT4-o
-    # TODO: Summarize Audio with a command
+    @client.tree.command(
+        name="upload_audio",
+        description="Upload a podcast audio file to transcribe it and analyze it with the agent.",
+    )
+    async def upload_audio(interaction: discord.Interaction, file: discord.Attachment, language: str = None):
+        user_id = interaction.user.id
+
+        if client.is_channel_allowed(str(interaction.channel_id)) is False:
+            send = "You're not allowed to use this command in this channel."
+            await sender.send_message(interaction, user_id, "/upload_audio", send)
+            return
+
+        await interaction.response.defer()
+        upload = None
+        try:
+            name, extension = os.path.splitext(os.path.basename(file.filename))
+            if extension.lower() not in AUDIO_EXTENSIONS:
+                raise Exception(f"Unsupported audio format. Use one of {', '.join(AUDIO_EXTENSIONS)}.")
+
+            file_name = f"{interaction.id}{extension.lower()}"
+            if UPLOAD_AUDIO_TO_S3:
+                # Ranged reads of the attachment straight to S3, next to the transcription
+                upload = asyncio.create_task(
+                    uploader.upload(UrlSource(file.url), f"audio/{user_id}/{file_name}", file.size, file.content_type)
+                )
+            # Hashed while it is written, a known episode is not transcribed again
+            audio_hash, audio_bytes = await download(
+                file.url, os.path.join(podcast_gpt.audio_base_path, file_name)
+            )
+            async with admission.admit(user_id, cost=4):
+                # Transcribed by the worker processes, the bot keeps answering meanwhile
+                result = await podcast_gpt.get_transcriptions_async(
+                    file_name, language, audio_hash=audio_hash, audio_bytes=audio_bytes
+                )
+                if not result["text"]:
+                    raise Exception("No speech was found in the audio.")
+
+                transcription_file = podcast_gpt.save_transcription(result["text"], name)
+                await podcast_gpt.add_transcription(user_id, result["text"], interaction.channel_id)
+
+            if result["cached"]:
+                done = f"This audio was already transcribed, loaded its {result['duration'] / 60:.1f} minutes transcript. ⚡"
+            else:
+                done = f"Transcribed {result['duration'] / 60:.1f} minutes of audio in {result['elapsed']:.0f} seconds. 🎙️"
+            print(str(transcription_cache))
+            messages = [
+                done,
+                "You can now ask questions about the podcast with the `/ask` command.",
+            ]
+            if upload is not None:
+                task, upload = upload, None
+                try:
+                    res = await task
+                    print(f"Uploaded {res['key']} at {res['throughput'] / 1024 / 1024:.1f} MB/s.")
+                except Exception as e:
+                    messages.append(f"The audio could not be stored yet, the upload resumes on the next start: {e}")
+            await sender.send_message(
+                interaction, user_id, "/upload_audio", "\n".join(messages)
+            )
+            await interaction.followup.send(
+                file=discord.File(os.path.join(podcast_gpt.transcription_base_path, transcription_file))
+            )
+        except Exception as e:
+            await sender.send_message(interaction, user_id, "/upload_audio", str(e))
+        finally:
+            if upload is not None:
+                # The download or the transcription failed, the audio is not kept
+                upload.cancel()
+                await asyncio.gather(upload, return_exceptions=True)
+                try:
+                    await uploader.abort(f"audio/{user_id}/{file_name}")
+                except Exception as e:
+                    print(f"Error aborting the upload of {file_name}: {e}")
+
+    @client.tree.command(
+        name="summarize",
+        description="Summarize the podcast transcribed from the last uploaded audio.",
+    )
+    async def summarize(interaction: discord.Interaction):
+        user_id = interaction.user.id
+
+        if client.is_channel_allowed(str(interaction.channel_id)) is False:
+            send = "You're not allowed to use this command in this channel."
+            await sender.send_message(interaction, user_id, "/summarize", send)
+            return
+
+        await interaction.response.defer()
+        try:
+            # One summary is many chat completions
+            async with admission.admit(user_id, cost=4):
+                summary, stats = await podcast_gpt.summarize_transcription(user_id, interaction.channel_id)
+            print(
+                f"{user_id} summary: {stats['chunks']} chunks, {stats['levels']} reduce levels, "
+                f"{stats['requests']} requests in {stats['elapsed']:.1f} seconds."
+            )
+            await sender.send_message(interaction, user_id, "/summarize", summary)
+        except Exception as e:
+            await sender.send_message(interaction, user_id, "/summarize", str(e))
+
     # TODO: Metadata Session to save the title of the session
     # TODO: Create command and API Endpoint to generate a notion page with the session messages
-    
+
     # Run your discord client
     client.run(token=os.getenv("DISCORD_TOKEN"))
 
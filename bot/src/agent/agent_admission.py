@@ -0,0 +1,169 @@
+import asyncio
+import itertools
+import math
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Callable, Dict, List, Optional
+
+
+class AdmissionRejected(Exception):
+    """The request was not queued, the user can try again after `retry_after` seconds."""
+
+    def __init__(self, retry_after: float, reason: str = "The bot is busy"):
+        self.retry_after = retry_after
+        super().__init__(f"{reason}, please try again in {max(1, math.ceil(retry_after))} seconds. ⏳")
+
+
+class AdmissionController:
+    """Admission control in front of the agent, fair across users.
+
+    At most ``max_concurrency`` requests run at a time, and at most
+    ``per_user`` of them belong to the same user. The others wait in a
+    weighted fair queue: each request is tagged with the virtual time at which
+    its user would finish it, ``cost / weight`` after the user's previous
+    request, and the smallest tag runs next. A user who sends many requests
+    only pushes their own tags further, so the others keep their place.
+
+    A request is rejected at once, with a retry-after hint from the average
+    run time, when the queue or the queue of its user is full.
+    """
+
+    def __init__(
+        self,
+        max_concurrency: int = 8,
+        per_user: int = 2,
+        max_queue: int = 64,
+        per_user_queue: int = 4,
+        weights: Optional[Dict[str, float]] = None,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        if max_concurrency < 1 or per_user < 1:
+            raise ValueError("max_concurrency and per_user should be greater than 0.")
+        self.max_concurrency = max_concurrency
+        self.per_user = per_user
+        self.max_queue = max_queue
+        self.per_user_queue = per_user_queue
+        self.weights = weights or {}
+        self.clock = clock
+
+        self.running = 0
+        self.in_flight: Dict[str, int] = {}
+        # Waiting requests: [tag, order, user, future, queued_at]
+        self.waiting: List[List] = []
+        self.queued: Dict[str, int] = {}
+        self.last_tag: Dict[str, float] = {}
+        self.virtual_time = 0.0
+        self.service_time = 1.0
+        self._order = itertools.count()
+        self.waits = deque(maxlen=1000)
+        self.stats = {"admitted": 0, "queued": 0, "rejected": 0, "completed": 0, "wait_total": 0.0, "max_wait": 0.0}
+
+    def __str__(self) -> str:
+        return (
+            f"Admission: {self.running} of {self.max_concurrency} running, {len(self.waiting)} queued, "
+            f"{self.stats['rejected']} rejected, p95 wait {self.wait_percentile(0.95):.2f}s."
+        )
+
+    @property
+    def queue_length(self) -> int:
+        return len(self.waiting)
+
+    def wait_percentile(self, q: float) -> float:
+        if not self.waits:
+            return 0.0
+        waits = sorted(self.waits)
+        return waits[min(len(waits) - 1, int(q * len(waits)))]
+
+    def retry_after(self, ahead: int) -> float:
+        # Rounds of max_concurrency requests before a new one would start
+        return (ahead // self.max_concurrency + 1) * self.service_time
+
+    def _can_run(self, user_id: str) -> bool:
+        return self.running < self.max_concurrency and self.in_flight.get(user_id, 0) < self.per_user
+
+    def _start(self, user_id: str, waited: float) -> None:
+        self.running += 1
+        self.in_flight[user_id] = self.in_flight.get(user_id, 0) + 1
+        self.stats["admitted"] += 1
+        self.stats["wait_total"] += waited
+        self.stats["max_wait"] = max(self.stats["max_wait"], waited)
+        self.waits.append(waited)
+
+    def _dequeued(self, user_id: str) -> None:
+        self.queued[user_id] -= 1
+        if not self.queued[user_id]:
+            # Nothing of the user is waiting, its next tag starts from the virtual time
+            del self.queued[user_id]
+            self.last_tag.pop(user_id, None)
+
+    def _dispatch(self) -> None:
+        while self.running < self.max_concurrency:
+            eligible = [entry for entry in self.waiting if self.in_flight.get(entry[2], 0) < self.per_user]
+            if not eligible:
+                return
+            entry = min(eligible, key=lambda item: (item[0], item[1]))
+            self.waiting.remove(entry)
+            tag, _, user_id, future, queued_at = entry
+            self._dequeued(user_id)
+            self.virtual_time = max(self.virtual_time, tag)
+            self._start(user_id, self.clock() - queued_at)
+            future.set_result(None)
+
+    def _release(self, user_id: str, elapsed: float) -> None:
+        self.running -= 1
+        self.in_flight[user_id] -= 1
+        if not self.in_flight[user_id]:
+            del self.in_flight[user_id]
+        self.stats["completed"] += 1
+        # Moving average of the run time, for the retry-after hints
+        self.service_time = 0.8 * self.service_time + 0.2 * elapsed
+        self._dispatch()
+
+    async def acquire(self, user_id: str, cost: float = 1.0) -> None:
+        """Wait for a slot, or raise AdmissionRejected when the queue is full."""
+        if not self.waiting and self._can_run(user_id):
+            self._start(user_id, 0.0)
+            return
+        if self.queued.get(user_id, 0) >= self.per_user_queue:
+            self.stats["rejected"] += 1
+            raise AdmissionRejected(self.retry_after(self.queued[user_id]), "You have too many requests in progress")
+        if len(self.waiting) >= self.max_queue:
+            self.stats["rejected"] += 1
+            raise AdmissionRejected(self.retry_after(len(self.waiting)))
+
+        weight = self.weights.get(user_id, 1.0)
+        tag = max(self.virtual_time, self.last_tag.get(user_id, 0.0)) + cost / weight
+        self.last_tag[user_id] = tag
+        future = asyncio.get_running_loop().create_future()
+        entry = [tag, next(self._order), user_id, future, self.clock()]
+        self.waiting.append(entry)
+        self.queued[user_id] = self.queued.get(user_id, 0) + 1
+        self.stats["queued"] += 1
+        # A slot may be free for this user even if others are waiting
+        self._dispatch()
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                # The slot was given just before the cancellation
+                self._release(user_id, 0.0)
+            elif entry in self.waiting:
+                self.waiting.remove(entry)
+                self._dequeued(user_id)
+            raise
+
+    @asynccontextmanager
+    async def admit(self, user_id, cost: float = 1.0) -> AsyncIterator[None]:
+        """Run the body once the request is admitted.
+
+        Raises:
+            AdmissionRejected: The queue is full, with the seconds to wait.
+        """
+        user_id = str(user_id)
+        await self.acquire(user_id, cost)
+        started = self.clock()
+        try:
+            yield
+        finally:
+            self._release(user_id, self.clock() - started)
@@ -0,0 +1,157 @@
+import hashlib
+from collections import OrderedDict
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+
+# Tokens OpenAI adds around every chat message (role, separators)
+MESSAGE_OVERHEAD_TOKENS = 4
+
+
+class ContextWindow:
+    """Fit a conversation into a token budget before it is sent to the model.
+
+    The first ``pinned_messages`` messages (the assistant prompt) are always
+    kept, then the most recent turns that fit in ``max_tokens``. Older turns are
+    folded into a rolling summary by ``summarize`` so their content is not lost,
+    or on a later turn when it raises; without a summarizer they are simply
+    dropped. Token counts are cached per
+    message so every turn only encodes the messages it has not seen before.
+    """
+
+    def __init__(
+        self,
+        max_tokens: int = 6000,
+        pinned_messages: int = 1,
+        summarize: Optional[Callable[[str, List[Dict]], Awaitable[str]]] = None,
+        encoding_name: str = "cl100k_base",
+        token_counter: Optional[Callable[[str], int]] = None,
+        cache_size: int = 10000,
+    ):
+        if max_tokens <= 0:
+            raise ValueError("max_tokens should be greater than 0.")
+
+        self.max_tokens = max_tokens
+        self.pinned_messages = pinned_messages
+        self.summarize = summarize
+        self.encoding_name = encoding_name
+        self.cache_size = cache_size
+        self._token_counter = token_counter
+        self._token_cache: "OrderedDict[str, int]" = OrderedDict()
+
+    def __str__(self) -> str:
+        mode = "summarizing older turns" if self.summarize else "dropping older turns"
+        return f"Context: {self.max_tokens} tokens budget, {mode}."
+
+    def _load_token_counter(self) -> Callable[[str], int]:
+        try:
+            import tiktoken
+
+            encoding = tiktoken.get_encoding(self.encoding_name)
+            return lambda text: len(encoding.encode(text, disallowed_special=()))
+        except Exception as e:
+            # Roughly four characters per token for english text
+            print(f"Warning: tiktoken unavailable ({e}). Using an approximate token count.")
+            return lambda text: len(text) // 4 + 1
+
+    def count_text(self, text: str) -> int:
+        if self._token_counter is None:
+            self._token_counter = self._load_token_counter()
+        return self._token_counter(text)
+
+    def count(self, message: Dict) -> int:
+        """Count the tokens of a chat message, using the per-message cache."""
+        role = message.get("role", "")
+        content = message.get("content") or ""
+        key = hashlib.sha1(f"{role}\0{content}".encode("utf-8")).hexdigest()
+        tokens = self._token_cache.get(key)
+        if tokens is not None:
+            self._token_cache.move_to_end(key)
+            return tokens
+
+        tokens = self.count_text(role) + self.count_text(content) + MESSAGE_OVERHEAD_TOKENS
+        self._token_cache[key] = tokens
+        if len(self._token_cache) > self.cache_size:
+            self._token_cache.popitem(last=False)
+        return tokens
+
+    def count_all(self, messages: List[Dict]) -> int:
+        return sum(self.count(message) for message in messages)
+
+    @staticmethod
+    def _summary_message(summary: str) -> Dict:
+        return {
+            "role": "system",
+            "content": f"Summary of the earlier conversation: {summary}",
+        }
+
+    @staticmethod
+    def _clean(message: Dict) -> Dict:
+        # Only role and content are part of the chat completion schema
+        return {"role": message["role"], "content": message["content"]}
+
+    async def build(
+        self, messages: List[Dict], summary: Optional[Dict] = None
+    ) -> Tuple[List[Dict], Dict, Dict]:
+        """Build the messages to send for this turn.
+
+        Args:
+            messages (List[Dict]): Full session history, assistant prompt first.
+            summary (Dict, optional): Rolling summary stored with the session,
+                with the 'summary' text and the 'summarized_count' of history
+                messages it already covers.
+
+        Returns:
+            Tuple[List[Dict], Dict, Dict]: The messages to send, the updated
+            summary to store with the session, and the token stats of the turn.
+        """
+        pinned = messages[: self.pinned_messages]
+        history = messages[self.pinned_messages:]
+
+        summary = dict(summary or {})
+        summary_text = summary.get("summary", "")
+        summarized_count = summary.get("summarized_count", 0)
+        if summarized_count > len(history):
+            # The history was replaced, the summary no longer applies
+            summary_text, summarized_count = "", 0
+
+        budget = self.max_tokens - self.count_all(pinned)
+        if summary_text:
+            budget -= self.count(self._summary_message(summary_text))
+
+        # Keep the newest turns that fit, the last message is always sent
+        start = len(history)
+        used = 0
+        while start > summarized_count:
+            tokens = self.count(history[start - 1])
+            if start < len(history) and used + tokens > budget:
+                break
+            used += tokens
+            start -= 1
+
+        folded = history[summarized_count:start]
+        if folded and self.summarize is not None:
+            try:
+                summary_text = await self.summarize(summary_text, folded)
+                summarized_count = start
+            except Exception as e:
+                # Keep the window in budget, the turns are folded again on a later turn
+                print(f"Error summarizing context: {e}")
+                folded = []
+        elif folded:
+            summarized_count = start
+
+        window = [self._clean(message) for message in pinned]
+        if summary_text and self.summarize is not None:
+            window.append(self._summary_message(summary_text))
+        window.extend(self._clean(message) for message in history[start:])
+
+        total_tokens = self.count_all(messages)
+        sent_tokens = self.count_all(window)
+        stats = {
+            "total_tokens": total_tokens,
+            "sent_tokens": sent_tokens,
+            "saved_tokens": max(total_tokens - sent_tokens, 0),
+            "folded_messages": len(folded),
+            "summarized_count": summarized_count,
+        }
+        summary = {"summary": summary_text, "summarized_count": summarized_count}
+        return window, summary, stats
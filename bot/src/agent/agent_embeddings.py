@@ -0,0 +1,80 @@
+import hashlib
+import re
+from typing import List
+
+import numpy as np
+
+from bot.src.api.api_podcast_agent_bot import ServerlessInterface
+
+
+class EmbeddingInterface:
+    dimensions: int = 0
+
+    async def embed(self, texts: List[str]) -> np.ndarray:
+        """Embed texts into L2 normalized vectors.
+
+        Args:
+            texts (List[str]): Texts to embed.
+
+        Returns:
+            np.ndarray: Float32 matrix with one row per text.
+        """
+        raise NotImplementedError("This method should be overridden by subclasses")
+
+
+def normalize(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return (vectors / norms).astype(np.float32)
+
+
+class HashingEmbedding(EmbeddingInterface):
+    """Offline stand-in embedding based on hashed word unigrams and bigrams.
+
+    It needs no network or model weights, which makes it suitable for tests and
+    local development. Similarity reflects word overlap, not meaning.
+    """
+
+    def __init__(self, dimensions: int = 512):
+        self.dimensions = dimensions
+
+    def __str__(self) -> str:
+        return f"Embeddings: offline hashing ({self.dimensions} dimensions)."
+
+    def _bucket(self, feature: str) -> int:
+        digest = hashlib.blake2b(feature.encode("utf-8"), digest_size=8).digest()
+        return int.from_bytes(digest, "little") % self.dimensions
+
+    def embed_sync(self, texts: List[str]) -> np.ndarray:
+        vectors = np.zeros((len(texts), self.dimensions), dtype=np.float32)
+        for row, text in enumerate(texts):
+            words = re.findall(r"\w+", text.lower())
+            features = words + [f"{a} {b}" for a, b in zip(words, words[1:])]
+            for feature in features:
+                vectors[row, self._bucket(feature)] += 1.0
+        return normalize(vectors)
+
+    async def embed(self, texts: List[str]) -> np.ndarray:
+        return self.embed_sync(texts)
+
+
+class ServerlessEmbedding(EmbeddingInterface):
+    """Embeddings computed by the serverless /gpt/embeddings endpoint."""
+
+    def __init__(self, serverless_api: ServerlessInterface, batch_size: int = 128):
+        self.serverless_api = serverless_api
+        self.batch_size = batch_size
+
+    def __str__(self) -> str:
+        return "Embeddings: OpenAI through the serverless API."
+
+    async def embed(self, texts: List[str]) -> np.ndarray:
+        rows = []
+        for start in range(0, len(texts), self.batch_size):
+            res = await self.serverless_api.embeddings(texts[start:start + self.batch_size])
+            if res.get("status") == "error" or "embeddings" not in res:
+                raise Exception(res.get("message", "Error computing embeddings."))
+            rows.extend(res["embeddings"])
+        vectors = normalize(np.asarray(rows, dtype=np.float32))
+        self.dimensions = vectors.shape[1]
+        return vectors
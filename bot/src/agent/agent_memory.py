@@ -1,19 +1,26 @@
-from typing import Dict, List, Optional, Union
+import asyncio
+import copy
+import time
+from collections import OrderedDict
+from typing import Awaitable, Callable, Dict, List, Optional, Union
 # uuid is used to generate a unique session id
 import uuid
 
 
 class MemoryInterface:
-    def append(self, user_id: str, message: Dict) -> None:
+    def append(self, user_id: str, message: Dict, channel_id: Optional[str] = None) -> None:
         """Append a message to the session.
 
         Args:
             user_id (str): User ID to identify the user.
             message (Dict): Message and content to append.
+            channel_id (str, optional): Channel ID for channel scoped sessions.
         """
         raise NotImplementedError("This method should be overridden by subclasses")
 
-    def get(self) -> Dict[str, Union[str, List[Dict]]]:
+    def get(
+        self, user_id: Optional[str] = None, channel_id: Optional[str] = None
+    ) -> Dict[str, Union[str, List[Dict]]]:
         """Get the session.
 
         Returns:
@@ -21,24 +28,50 @@ class MemoryInterface:
         """
         raise NotImplementedError("This method should be overridden by subclasses")
 
-    def remove(self) -> None:
+    def remove(self, user_id: Optional[str] = None, channel_id: Optional[str] = None) -> None:
         """Remove or clear the session."""
         raise NotImplementedError("This method should be overridden by subclasses")
 
-    def restore(self, messages: List[dict]) -> None:
+    def restore(
+        self,
+        messages: List[dict],
+        user_id: Optional[str] = None,
+        channel_id: Optional[str] = None,
+        session_id: Optional[str] = None,
+    ) -> None:
         """Restore the session.
 
         Args:
-            session_id (str): Session ID to restore.
+            messages (List[dict]): Messages of the session to restore.
+            session_id (str, optional): Keep this session ID instead of a new one.
         """
         raise NotImplementedError("This method should be overridden by subclasses")
 
+    def set_summary(
+        self,
+        summary: Dict,
+        user_id: Optional[str] = None,
+        channel_id: Optional[str] = None,
+    ) -> None:
+        """Store the rolling summary of the older turns with the session.
+
+        Args:
+            summary (Dict): Summary text and the number of messages it covers.
+        """
+        raise NotImplementedError("This method should be overridden by subclasses")
+
+    def lock(self, user_id: Optional[str] = None, channel_id: Optional[str] = None) -> asyncio.Lock:
+        """Get the lock guarding a session while a turn is in progress."""
+        raise NotImplementedError("This method should be overridden by subclasses")
+
 
 class InMemoryDB(MemoryInterface):
     def __init__(self, assistant_prompt: Optional[List[Dict]] = None):
         self.session_id = "default"
         self.storage: List[Dict] = []
+        self.summary: Dict = {}
         self.assistant_prompt = assistant_prompt or []
+        self._lock = asyncio.Lock()
         self._generate_session()
 
     def __str__(self) -> str:
@@ -47,11 +80,13 @@ class InMemoryDB(MemoryInterface):
     def _generate_session(self) -> None:
         id = uuid.uuid4()
         self.session_id = str(id)
+        self.summary = {}
         self._initialize()
 
     def _initialize(self) -> None:
         if self.assistant_prompt is not []:
-            self.storage = self.assistant_prompt
+            # Copy the prompt so appending or clearing never mutates the config
+            self.storage = copy.deepcopy(self.assistant_prompt)
         else:
             print("Warning: No assistant prompt provided. Session will be empty.")
             self.storage = []
@@ -59,24 +94,215 @@ class InMemoryDB(MemoryInterface):
     def _get_session(self) -> List[Dict]:
         return self.storage
 
-    def append(self, user_id: str, message: Dict) -> None:
+    def append(self, user_id: str, message: Dict, channel_id: Optional[str] = None) -> None:
         if not isinstance(message, dict):
             raise ValueError("Message should be a dictionary.")
 
         message.update({"user_id": user_id})
         self._get_session().append(message)
 
-    def get(self) -> Dict[str, Union[str, List[Dict]]]:
+    def get(self, user_id: Optional[str] = None, channel_id: Optional[str] = None) -> Dict[str, Union[str, List[Dict]]]:
         session = {
             "session_id": self.session_id,
             "messages": self._get_session(),
+            "summary": self.summary,
         }
         return session
 
-    def remove(self) -> None:
+    def remove(self, user_id: Optional[str] = None, channel_id: Optional[str] = None) -> None:
         self.storage.clear()
         self._generate_session()
-        
-    def restore(self, messages: List[dict]) -> None:
+
+    def restore(
+        self,
+        messages: List[dict],
+        user_id: Optional[str] = None,
+        channel_id: Optional[str] = None,
+        session_id: Optional[str] = None,
+    ) -> None:
         self.remove()
         self.storage = messages
+        if session_id:
+            self.session_id = session_id
+
+    def set_summary(self, summary: Dict, user_id: Optional[str] = None, channel_id: Optional[str] = None) -> None:
+        self.summary = summary
+
+    def lock(self, user_id: Optional[str] = None, channel_id: Optional[str] = None) -> asyncio.Lock:
+        return self._lock
+
+
+class ShardedMemoryDB(MemoryInterface):
+    """In-memory sessions keyed by user, and optionally by channel.
+
+    Each session has its own asyncio lock so concurrent users never share or
+    interleave history. The number of live sessions is capped with LRU
+    eviction and sessions idle for longer than ``idle_ttl`` seconds expire.
+    Evicted sessions are handed to ``flush_session`` (usually the serverless
+    ``save_session``) so no conversation is silently dropped. A restored session
+    is only flushed when turns were added since, as a new session.
+    """
+
+    def __init__(
+        self,
+        assistant_prompt: Optional[List[Dict]] = None,
+        max_sessions: int = 1000,
+        idle_ttl: float = 3600,
+        per_channel: bool = False,
+        flush_session: Optional[Callable[[str, List[Dict], Dict], Awaitable]] = None,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        if max_sessions < 1:
+            raise ValueError("max_sessions should be greater than 0.")
+
+        self.assistant_prompt = assistant_prompt or []
+        self.max_sessions = max_sessions
+        self.idle_ttl = idle_ttl
+        self.per_channel = per_channel
+        self.flush_session = flush_session
+        self.clock = clock
+        self.sessions: "OrderedDict[str, Dict]" = OrderedDict()
+        self.evictions = 0
+        self._pending_flushes = set()
+
+    def __str__(self) -> str:
+        scope = "user and channel" if self.per_channel else "user"
+        return (
+            f"Storage: InMemory sharded by {scope}. Up to {self.max_sessions} sessions, "
+            f"idle sessions expire after {int(self.idle_ttl)}s and are saved to the memory API."
+        )
+
+    def _key(self, user_id: Optional[str], channel_id: Optional[str]) -> str:
+        if self.per_channel and channel_id is not None:
+            return f"{user_id}:{channel_id}"
+        return str(user_id)
+
+    def _new_session(self, user_id: Optional[str]) -> Dict:
+        return {
+            "session_id": str(uuid.uuid4()),
+            "user_id": user_id,
+            "messages": copy.deepcopy(self.assistant_prompt),
+            "summary": {},
+            # Messages already stored by the memory API, not flushed again
+            "saved": len(self.assistant_prompt),
+            "last_access": self.clock(),
+            "lock": asyncio.Lock(),
+        }
+
+    def _get_session(self, user_id: Optional[str], channel_id: Optional[str]) -> Dict:
+        self.sweep()
+        key = self._key(user_id, channel_id)
+        session = self.sessions.get(key)
+        if session is None:
+            session = self._new_session(user_id)
+            self.sessions[key] = session
+            self._evict_overflow(keep=key)
+        else:
+            self.sessions.move_to_end(key)
+        session["last_access"] = self.clock()
+        return session
+
+    def _evict_overflow(self, keep: str) -> None:
+        # Least recently used first, skipping sessions with a turn in flight
+        for key in list(self.sessions.keys()):
+            if len(self.sessions) <= self.max_sessions:
+                break
+            if key == keep or self.sessions[key]["lock"].locked():
+                continue
+            self._evict(key)
+
+    def _evict(self, key: str) -> None:
+        session = self.sessions.pop(key)
+        self.evictions += 1
+        if len(session["messages"]) <= session["saved"]:
+            # Nothing new since it was created or restored
+            return
+        if self.flush_session is None:
+            # Nothing to flush to, e.g. the history is already stored server-side
+            return
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            print(f"Warning: Session {session['session_id']} evicted outside the event loop.")
+            return
+        task = loop.create_task(self._flush(session))
+        self._pending_flushes.add(task)
+        task.add_done_callback(self._pending_flushes.discard)
+
+    async def _flush(self, session: Dict) -> None:
+        metadata = {
+            "title": "Podcast Agent GPT",
+            "user_id": session["user_id"],
+            "context_summary": session["summary"],
+        }
+        try:
+            res = await self.flush_session(session["session_id"], session["messages"], metadata)
+            if isinstance(res, dict) and res.get("status") == "error":
+                print(f"Error flushing session {session['session_id']}: {res.get('message')}")
+        except Exception as e:
+            print(f"Error flushing session {session['session_id']}: {e}")
+
+    def sweep(self) -> int:
+        """Evict every session idle for longer than the TTL.
+
+        Returns:
+            int: Number of sessions evicted.
+        """
+        deadline = self.clock() - self.idle_ttl
+        expired = [
+            key
+            for key, session in self.sessions.items()
+            if session["last_access"] < deadline and not session["lock"].locked()
+        ]
+        for key in expired:
+            self._evict(key)
+        return len(expired)
+
+    async def flush_all(self) -> None:
+        """Flush every live session and wait for pending flushes, e.g. on shutdown."""
+        for key in list(self.sessions.keys()):
+            self._evict(key)
+        if self._pending_flushes:
+            await asyncio.gather(*self._pending_flushes, return_exceptions=True)
+
+    def append(self, user_id: str, message: Dict, channel_id: Optional[str] = None) -> None:
+        if not isinstance(message, dict):
+            raise ValueError("Message should be a dictionary.")
+
+        message.update({"user_id": user_id})
+        self._get_session(user_id, channel_id)["messages"].append(message)
+
+    def get(self, user_id: Optional[str] = None, channel_id: Optional[str] = None) -> Dict[str, Union[str, List[Dict]]]:
+        session = self._get_session(user_id, channel_id)
+        return {
+            "session_id": session["session_id"],
+            "messages": session["messages"],
+            "summary": session["summary"],
+        }
+
+    def remove(self, user_id: Optional[str] = None, channel_id: Optional[str] = None) -> None:
+        session = self._get_session(user_id, channel_id)
+        session["session_id"] = str(uuid.uuid4())
+        session["messages"] = copy.deepcopy(self.assistant_prompt)
+        session["summary"] = {}
+        session["saved"] = len(self.assistant_prompt)
+
+    def restore(
+        self,
+        messages: List[dict],
+        user_id: Optional[str] = None,
+        channel_id: Optional[str] = None,
+        session_id: Optional[str] = None,
+    ) -> None:
+        self.remove(user_id, channel_id)
+        session = self._get_session(user_id, channel_id)
+        session["messages"] = messages
+        session["saved"] = len(messages)
+        if session_id:
+            session["session_id"] = session_id
+
+    def set_summary(self, summary: Dict, user_id: Optional[str] = None, channel_id: Optional[str] = None) -> None:
+        self._get_session(user_id, channel_id)["summary"] = summary
+
+    def lock(self, user_id: Optional[str] = None, channel_id: Optional[str] = None) -> asyncio.Lock:
+        return self._get_session(user_id, channel_id)["lock"]
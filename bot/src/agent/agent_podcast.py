@@ -1,7 +1,21 @@
+import asyncio
 import os
+import re
+from datetime import datetime
+from typing import AsyncIterator, Dict, List, Optional, Tuple
 
 from src.agent.agent_memory import MemoryInterface
+from src.agent.agent_context import ContextWindow
+from src.agent.agent_semantic_cache import SemanticCache
+from src.agent.agent_summarizer import TranscriptSummarizer
+from src.agent.agent_retrieval import TranscriptIndex
+from src.agent.agent_search import SessionSearch
+from src.audio.audio_cache import TranscriptionCache, cache_key
+from src.audio.audio_transcriber import AudioTranscriber
 from bot.src.api.api_podcast_agent_bot import ServerlessInterface
+from data.prompts import context_summary_prompt, pre_transcription_prompt, retrieval_transcription_prompt
+
+TRANSCRIPTION_ID = re.compile(r"Transcription id: ([0-9a-f]+)")
 
 class PodcastAgent:
     def __init__(
@@ -9,10 +23,29 @@ class PodcastAgent:
         serverless_api: ServerlessInterface,
         memory: MemoryInterface,
         base_path: str,
+        context_window: Optional[ContextWindow] = None,
+        semantic_cache: Optional[SemanticCache] = None,
+        server_history: bool = False,
+        audio: Optional[AudioTranscriber] = None,
+        transcription_cache: Optional[TranscriptionCache] = None,
+        summarizer: Optional[TranscriptSummarizer] = None,
+        retrieval: Optional[TranscriptIndex] = None,
+        search: Optional[SessionSearch] = None,
     ):
         self.serverless_api = serverless_api
         self.memory = memory
         self.base_path = base_path
+        self.context_window = context_window
+        self.semantic_cache = semantic_cache
+        # Send only the new message, the history is kept by the serverless API
+        self.server_history = server_history
+        self.audio = audio
+        self.transcription_cache = transcription_cache
+        self.summarizer = summarizer
+        # Send the relevant excerpts with each question instead of the whole transcription
+        self.retrieval = retrieval
+        # Full-text index of the saved sessions, kept up to date by save and delete
+        self.search = search
 
         self.audio_base_path = os.path.join(base_path, "audio")
         self.transcription_base_path = os.path.join(base_path, "transcriptions")
@@ -23,53 +56,298 @@ class PodcastAgent:
     def __str__(self) -> str:
         message = [
             self.memory.__str__(),
-            self.audio.__str__(),
         ]
+        if self.audio is not None:
+            message.append(self.audio.__str__())
+        if self.transcription_cache is not None:
+            message.append(self.transcription_cache.__str__())
+        if self.retrieval is not None:
+            message.append(self.retrieval.__str__())
+        if self.search is not None:
+            message.append(self.search.__str__())
         return "\n".join(message)
 
-    async def get_response(self, user_id: str, text: str) -> str:
-        # Appending the role and content to memory
-        self.memory.append(user_id, {"role": "user", "content": text})
+    async def get_response(self, user_id: str, text: str, channel_id: str = None) -> str:
+        # Hold the session lock so turns of the same session never interleave
+        async with self.memory.lock(user_id, channel_id):
+            # Appending the role and content to memory
+            self.memory.append(user_id, {"role": "user", "content": text}, channel_id)
+
+            # Generate AI Response
+            session = self.memory.get(user_id, channel_id)
+            cached, fingerprint, vector = await self._lookup_answer(session, text)
+            if cached is not None:
+                last_message = {"role": "assistant", "content": cached}
+                self.memory.append(user_id, last_message, channel_id)
+                messages = session["messages"]
+                return last_message, str(self.semantic_cache), messages, len(messages)
 
-        # Generate AI Response
-        session = self.memory.get()
-        messages = session["messages"]
-        response = await self.serverless_api.chat_completion(messages)
+            response = await self._chat_completion(user_id, channel_id, session, text)
 
-        last_message = response["last_message"]
-        context = response["context"]
-        memory = response["memory"]
-        memory_count = response["memory_count"]
+            last_message = response["last_message"]
+            context = response["context"]
+            memory = response.get("memory", session["messages"])
+            memory_count = response["memory_count"]
 
-        self.memory.append(user_id, last_message)
+            self.memory.append(user_id, last_message, channel_id)
+            self._store_answer(fingerprint, vector, last_message)
         return last_message, context, memory, memory_count
-    
-    async def save_session(self) -> dict:
+
+    async def get_response_stream(
+        self, user_id: str, text: str, channel_id: str = None
+    ) -> AsyncIterator[str]:
+        """Same as get_response, but yields the answer while it is generated."""
+        async with self.memory.lock(user_id, channel_id):
+            self.memory.append(user_id, {"role": "user", "content": text}, channel_id)
+
+            session = self.memory.get(user_id, channel_id)
+            cached, fingerprint, vector = await self._lookup_answer(session, text)
+            if cached is not None:
+                self.memory.append(user_id, {"role": "assistant", "content": cached}, channel_id)
+                yield cached
+                return
+
+            if self.server_history:
+                # The session endpoint is not streamed, send the answer at once
+                response = await self._chat_completion(user_id, channel_id, session, text)
+                self.memory.append(user_id, response["last_message"], channel_id)
+                self._store_answer(fingerprint, vector, response["last_message"])
+                yield response["last_message"]["content"]
+                return
+
+            messages = session["messages"]
+            if self.context_window is not None:
+                messages, _ = await self._fit_context(user_id, channel_id, session)
+            messages = await self._ask_with_excerpts(session, messages, text)
+
+            async for event in self.serverless_api.chat_completion_stream(messages):
+                if event["type"] == "delta":
+                    yield event["content"]
+                elif event["type"] == "done":
+                    self.memory.append(user_id, event["last_message"], channel_id)
+                    self._store_answer(fingerprint, vector, event["last_message"])
+                elif event["type"] == "error":
+                    raise Exception(event.get("message", "Internal server error."))
+
+    @property
+    def pinned_messages(self) -> int:
+        return self.context_window.pinned_messages if self.context_window else 1
+
+    async def _chat_completion(self, user_id: str, channel_id: str, session: Dict, text: str) -> Dict:
+        if self.server_history:
+            messages = session["messages"]
+            # Turns added by the bot itself, such as a transcription, are stored
+            # before the question, and the assistant prompt opens a new session
+            pending = [msg for msg in messages[:-1] if msg.get("pending")]
+            is_new = all(msg.get("pending") for msg in messages[self.pinned_messages:-1])
+            prefix = messages[: self.pinned_messages] + pending if is_new else pending
+            # The excerpts are only part of the prompt, the stored question stays short
+            content = await self._with_excerpts(session, text)
+            response = await self.serverless_api.chat_completion_session(
+                session["session_id"],
+                {"role": "user", "content": text},
+                [{"role": msg["role"], "content": msg["content"]} for msg in prefix] or None,
+                prompt_content=content if content != text else None,
+            )
+            if response.get("status") != "error":
+                for msg in pending:
+                    del msg["pending"]
+        else:
+            messages = session["messages"]
+            if self.context_window is not None:
+                messages, _ = await self._fit_context(user_id, channel_id, session)
+            messages = await self._ask_with_excerpts(session, messages, text)
+            response = await self.serverless_api.chat_completion(messages)
+
+        if response.get("status") == "error":
+            raise Exception(response.get("message", "Internal server error."))
+        return response
+
+    def _transcription_id(self, messages: List[Dict]) -> Optional[str]:
+        prefix = retrieval_transcription_prompt.strip()
+        for message in reversed(messages):
+            if message["role"] == "user" and message["content"].startswith(prefix):
+                match = TRANSCRIPTION_ID.search(message["content"])
+                return match.group(1) if match else None
+        return None
+
+    async def _with_excerpts(self, session: Dict, text: str) -> str:
+        if self.retrieval is None:
+            return text
+        transcription_id = self._transcription_id(session["messages"])
+        if transcription_id is None:
+            return text
+        try:
+            excerpts = await self.retrieval.search(transcription_id, text)
+        except Exception as e:
+            print(f"Error searching the transcription: {e}")
+            return text
+        body = "\n---\n".join(chunk for chunk, _ in excerpts)
+        return f"Excerpts of the transcription:\n{body}\n\nQuestion: {text}"
+
+    async def _ask_with_excerpts(self, session: Dict, messages: List[Dict], text: str) -> List[Dict]:
+        # Only the request carries the excerpts, the stored question stays short
+        content = await self._with_excerpts(session, text)
+        if content == text:
+            return messages
+        return messages[:-1] + [{"role": "user", "content": content}]
+
+    async def _lookup_answer(self, session: Dict, text: str):
+        # A cached answer would never reach the server-side history
+        if self.semantic_cache is None or self.server_history:
+            return None, None, None
+        # A follow-up is neither looked up nor stored, nor embedded for nothing
+        if not self.semantic_cache.is_standalone(text):
+            return None, None, None
+        # The question was just appended, the context is everything before it
+        messages = session["messages"][:-1]
+        fingerprint = self.semantic_cache.fingerprint(
+            messages, self.pinned_messages, context_id=self._transcription_id(messages)
+        )
+        try:
+            answer, vector = await self.semantic_cache.lookup(text, fingerprint)
+        except Exception as e:
+            print(f"Error looking up the semantic cache: {e}")
+            return None, None, None
+        return answer, fingerprint, vector
+
+    def _store_answer(self, fingerprint: str, vector, last_message: Dict) -> None:
+        if self.semantic_cache is None or vector is None:
+            return
+        self.semantic_cache.store(fingerprint, last_message["content"], vector)
+
+    async def _fit_context(self, user_id: str, channel_id: str, session: Dict) -> Tuple[List[Dict], Dict]:
+        """The messages to send for this turn and the token stats of the turn."""
+        messages, summary, stats = await self.context_window.build(
+            session["messages"], session.get("summary")
+        )
+        self.memory.set_summary(summary, user_id, channel_id)
+        print(
+            f"{user_id} context: sent {stats['sent_tokens']} of {stats['total_tokens']} tokens, "
+            f"saved {stats['saved_tokens']} tokens."
+        )
+        return messages, stats
+
+    async def summarize_turns(self, summary: str, messages: List[Dict]) -> str:
+        conversation = "\n".join(f"{msg['role']}: {msg['content']}" for msg in messages)
+        prompt = [
+            {"role": "system", "content": context_summary_prompt},
+            {
+                "role": "user",
+                "content": f"Current summary:\n{summary or '(empty)'}\n\nOlder messages:\n{conversation}",
+            },
+        ]
+        response = await self.serverless_api.chat_completion(prompt)
+        if response.get("status") == "error":
+            # The context window keeps the previous summary and the turns
+            raise Exception(response.get("message", "Internal server error."))
+        return response["last_message"]["content"]
+
+    async def save_session(self, user_id: str, channel_id: str = None) -> dict:
         # Save the session
-        session = self.memory.get()
-        messages = session["messages"]
-        session_id = session["session_id"]
-        metadata = {
-            "title": "Podcast Agent GPT",
-        }
-        res = await self.serverless_api.save_session(session_id, messages, metadata)
-        self.memory.remove()
+        async with self.memory.lock(user_id, channel_id):
+            session = self.memory.get(user_id, channel_id)
+            messages = session["messages"]
+            session_id = session["session_id"]
+            metadata = {
+                "title": "Podcast Agent GPT",
+                "user_id": user_id,
+                "context_summary": session.get("summary", {}),
+            }
+            if self.server_history:
+                # The turns are already stored, only the metadata is missing
+                res = await self.serverless_api.update_session_metadata(session_id, metadata)
+                if res.get("status") == "error":
+                    res = await self.serverless_api.save_session(session_id, messages, metadata)
+            else:
+                res = await self.serverless_api.save_session(session_id, messages, metadata)
+            self.memory.remove(user_id, channel_id)
+        if res.get("status") != "error":
+            await self.index_session(session_id, messages, metadata)
         return res
-    
+
+    async def index_session(self, session_id: str, messages: List[Dict], metadata: Dict) -> None:
+        """Add a saved session to the search index, without the assistant prompt."""
+        if self.search is None:
+            return
+        self.search.add(session_id, metadata.get("user_id", ""), messages[self.pinned_messages:], metadata)
+        await self.search.flush()
+
     async def delete_session(self, session_id: str) -> dict:
-        return await self.serverless_api.delete_session(session_id)
-    
-    async def get_all_sessions(self) -> list:
-        return await self.serverless_api.get_all_session()
-    
-    async def restore_session(self, session_id: str) -> list:
+        res = await self.serverless_api.delete_session(session_id)
+        if self.search is not None and res.get("status") != "error" and self.search.remove(session_id):
+            await self.search.flush()
+        return res
+
+    async def delete_sessions(self, session_ids: List[str]) -> dict:
+        res = await self.serverless_api.delete_sessions(session_ids)
+        if self.search is not None and res.get("status") != "error":
+            # Ids that are not found anymore are stale in the index as well
+            removed = [self.search.remove(session_id) for session_id in res.get("deleted", []) + res.get("not_found", [])]
+            if any(removed):
+                await self.search.flush()
+        return res
+
+    async def clear_sessions(self, session_ids: List[str]) -> dict:
+        res = await self.serverless_api.clear_sessions(session_ids)
+        if self.search is not None and res.get("status") != "error":
+            for session_id in res.get("cleared", []):
+                self.search.clear(session_id)
+            await self.search.flush()
+        return res
+
+    async def _backfill_search(self, user_id: str) -> None:
+        # Sessions saved before the index existed are read once per user
+        async for page in self.iter_sessions(user_id):
+            session_ids = [session.get("pk", "").replace("SESSION#", "") for session in page.get("sessions", [])]
+            sessions = await asyncio.gather(*[self.serverless_api.get_session(session_id) for session_id in session_ids])
+            for session_id, session in zip(session_ids, sessions):
+                if session.get("status") != "error" and session_id not in self.search.docs:
+                    metadata = {**session.get("metadata", {}), "user_id": str(user_id)}
+                    self.search.add(session_id, user_id, session.get("messages", [])[self.pinned_messages:], metadata)
+        self.search.backfilled.add(str(user_id))
+        await self.search.flush()
+
+    async def search_sessions(self, user_id: str, query: str, limit: int = 5) -> List[Dict]:
+        """The saved sessions of the user that best match the query, with a snippet each."""
+        if self.search is None:
+            raise Exception("Session search is not enabled.")
+        if str(user_id) not in self.search.backfilled:
+            await self._backfill_search(user_id)
+        return self.search.search(user_id, query, limit)
+
+    async def get_all_sessions(self, user_id: str, cursor: str = None, limit: int = None) -> dict:
+        return await self.serverless_api.get_all_session(user_id, cursor, limit)
+
+    async def iter_sessions(self, user_id: str, page_size: int = 10) -> AsyncIterator[Dict]:
+        """Yield the pages of the sessions of a user, newest first.
+
+        Each page is only requested when the previous one was consumed. A page is
+        a dict with the 'sessions' and the 'cursor' of the next page, if any.
+        """
+        cursor = None
+        while True:
+            res = await self.serverless_api.get_all_session(user_id, cursor, page_size)
+            if res.get("status") == "error":
+                raise Exception(res.get("message", "Internal server error."))
+            yield res
+            cursor = res.get("cursor")
+            if not cursor:
+                return
+
+    async def restore_session(self, session_id: str, user_id: str, channel_id: str = None) -> list:
         res = await self.serverless_api.get_session(session_id)
         messages = res.get("messages", [])
-        self.memory.restore(messages)
+        summary = res.get("metadata", {}).get("context_summary", {})
+        async with self.memory.lock(user_id, channel_id):
+            # With server-side history the restored session keeps growing in place
+            restored_id = session_id if self.server_history else None
+            self.memory.restore(messages, user_id, channel_id, restored_id)
+            self.memory.set_summary(summary, user_id, channel_id)
         return messages
-        
-    def clear_memory(self):
-        self.memory.remove()
+
+    def clear_memory(self, user_id: str, channel_id: str = None):
+        self.memory.remove(user_id, channel_id)
 
     # async def save_session(self, user_id: str) -> None:
     #     """Using the memory interface to save the session of a user.
@@ -87,47 +365,119 @@ class PodcastAgent:
     #     """
     #     self.memory.remove(user_id)
 
-    # async def get_transcriptions_async(
-    #     self, file_name: str, language: str, fp16: bool
-    # ) -> str:
-    #     """Get transcriptions from an audio file asynchronously
+    async def get_transcriptions_async(
+        self,
+        file_name: str,
+        language: Optional[str] = None,
+        fp16: bool = False,
+        audio_hash: Optional[str] = None,
+        audio_bytes: int = 0,
+    ) -> Dict:
+        """Get transcriptions from an audio file asynchronously
+
+        Args:
+            file_name (str): File name of the audio file in the audio folder.
+            audio_hash (str): SHA-256 of the audio, to reuse a cached transcription.
+            audio_bytes (int): Size of the audio file.
 
-    #     Args:
-    #         file_name (str): File name of the audio file ending with .mp3, .wav, or .flac
+        Returns:
+            Dict: The timestamped 'text', its 'segments' and the 'duration' of the
+            audio. 'cached' is True when the transcription was skipped.
+        """
+        if self.audio is None:
+            raise ValueError("Audio transcription is not enabled.")
+        key = None
+        if self.transcription_cache is not None and audio_hash:
+            key = cache_key(audio_hash, self.audio.model_name, language)
+            cached = await self.transcription_cache.get(key, audio_bytes)
+            if cached is not None:
+                return {**cached, "cached": True}
 
-    #     Returns:
-    #         str: _description_
-    #     """
-    #     audio_path = os.path.join(self.audio_base_path, file_name)
-    #     transcriptions = await self.audio.transcript_async(audio_path, language, fp16)
-    #     return transcriptions
+        audio_path = os.path.join(self.audio_base_path, file_name)
+        result = await self.audio.transcript_async(audio_path, language, fp16)
+        if key is not None and result["text"]:
+            await self.transcription_cache.put(key, result)
+        return {**result, "cached": False}
 
-    # def save_transcription(self, transcriptions: str, name: str) -> str:
-    #     """Save transcriptions to a file
+    def save_transcription(self, transcriptions: str, name: str) -> str:
+        """Save transcriptions to a file
 
-    #     Args:
-    #         transcriptions (str): Transcriptions string to save
-    #         file_name (str): File name ending with .txt
+        Args:
+            transcriptions (str): Transcriptions string to save
+            name (str): Name of the file, without extension
 
-    #     Raises:
-    #         ValueError: File name cannot be empty
-    #         ValueError: Transcriptions cannot be empty
+        Raises:
+            ValueError: File name cannot be empty
+            ValueError: Transcriptions cannot be empty
 
-    #     Returns:
-    #         str: Returns the name of the file saved
-    #     """
-    #     if not name:
-    #         raise ValueError("File name cannot be empty")
-    #     if not transcriptions:
-    #         raise ValueError("Transcriptions cannot be empty")
+        Returns:
+            str: Returns the name of the file saved
+        """
+        if not name:
+            raise ValueError("File name cannot be empty")
+        if not transcriptions:
+            raise ValueError("Transcriptions cannot be empty")
+
+        file_name = f"{datetime.now().strftime('%Y%m%d%H%M%S')}_{name}.txt"
+        transcriptions_path = os.path.join(self.transcription_base_path, file_name)
+
+        with open(transcriptions_path, "w") as f:
+            f.write(transcriptions)
+
+        return file_name
+
+    def last_transcription(self, user_id: str, channel_id: str = None) -> Optional[str]:
+        """The last transcription shared with the conversation, if any."""
+        prefix = pre_transcription_prompt.strip()
+        messages = self.memory.get(user_id, channel_id)["messages"]
+        for message in reversed(messages):
+            if message["role"] == "user" and message["content"].startswith(prefix):
+                return message["content"][len(prefix):].strip()
+            if self.retrieval is not None and message["content"].startswith(retrieval_transcription_prompt.strip()):
+                index = self.retrieval.load(self._transcription_id([message]) or "")
+                return index["text"] if index else None
+        return None
+
+    async def summarize_transcription(self, user_id: str, channel_id: str = None) -> Tuple[str, Dict]:
+        """Summarize the last transcription of the conversation and add the summary to it.
+
+        Returns:
+            Tuple[str, Dict]: The summary and the stats of this summary.
+        """
+        if self.summarizer is None:
+            raise ValueError("Summaries are not enabled.")
+        transcription = self.last_transcription(user_id, channel_id)
+        if not transcription:
+            raise ValueError("There is no transcription to summarize, upload an audio with /upload_audio first.")
 
-    #     file_name = f"{datetime.now().strftime('%Y%m%d%H%M%S')}_{name}.txt"
-    #     transcriptions_path = os.path.join(self.transcription_base_path, file_name)
+        summary, stats = await self.summarizer.summarize(transcription)
+        async with self.memory.lock(user_id, channel_id):
+            self._append_turn(user_id, {"role": "user", "content": "Summarize the podcast."}, channel_id)
+            self._append_turn(user_id, {"role": "assistant", "content": summary}, channel_id)
+        return summary, stats
 
-    #     with open(transcriptions_path, "w") as f:
-    #         f.write(transcriptions)
+    def _append_turn(self, user_id: str, message: Dict, channel_id: str = None) -> None:
+        """Append a turn that did not go through the session endpoint."""
+        if self.server_history:
+            # Sent with the next question, the server does not have it yet
+            message["pending"] = True
+        self.memory.append(user_id, message, channel_id)
 
-    #     return file_name
+    async def add_transcription(self, user_id: str, transcriptions: str, channel_id: str = None) -> None:
+        """Share a transcription with the conversation, so /ask can analyze it."""
+        if self.retrieval is not None:
+            # Embedded once, the conversation only keeps a reference to it
+            transcription_id = await self.retrieval.add(transcriptions)
+            content = f"{retrieval_transcription_prompt.strip()}\nTranscription id: {transcription_id}"
+        else:
+            content = f"{pre_transcription_prompt.strip()}\n\n{transcriptions}"
+        async with self.memory.lock(user_id, channel_id):
+            self._append_turn(user_id, {"role": "user", "content": content}, channel_id)
+            answer = (
+                "Incredible, I just received the text of your audio. "
+                "Let's proceed to analyze the podcast together."
+            )
+            self._append_turn(user_id, {"role": "assistant", "content": answer}, channel_id)
 
     # def append(self, user_id: str, message: Dict, session_id: str) -> None:
     #     session_id = f"SESSION#{session_id}"
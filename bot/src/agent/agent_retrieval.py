@@ -0,0 +1,119 @@
+import asyncio
+import hashlib
+import os
+from collections import OrderedDict
+from typing import Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from src.agent.agent_context import ContextWindow
+from src.agent.agent_embeddings import EmbeddingInterface
+from src.agent.agent_summarizer import split_transcript
+
+
+class TranscriptIndex:
+    """Vector index of the transcripts, to send only the excerpts a question needs.
+
+    Each transcript is split into overlapping chunks of ``chunk_tokens`` that
+    are embedded once and saved as a ``.npz`` file, with the chunks and the full
+    text, in ``directory``. A question is embedded and compared by cosine
+    similarity with the chunks of its transcript, and the ``top_k`` best are
+    returned in the order of the episode, so the prompt grows with ``top_k``
+    instead of the length of the episode.
+    """
+
+    def __init__(
+        self,
+        embedding: EmbeddingInterface,
+        directory: str,
+        chunk_tokens: int = 300,
+        overlap_tokens: int = 40,
+        top_k: int = 4,
+        count_tokens: Optional[Callable[[str], int]] = None,
+        max_loaded: int = 32,
+    ):
+        if top_k < 1:
+            raise ValueError("top_k should be greater than 0.")
+        self.embedding = embedding
+        self.directory = directory
+        self.chunk_tokens = chunk_tokens
+        self.overlap_tokens = overlap_tokens
+        self.top_k = top_k
+        self.count_tokens = count_tokens or ContextWindow().count_text
+        self.max_loaded = max_loaded
+        # Indexes in memory by transcript id, least recently used first
+        self._loaded: "OrderedDict[str, Dict]" = OrderedDict()
+        os.makedirs(directory, exist_ok=True)
+
+    def __str__(self) -> str:
+        return f"Retrieval: top {self.top_k} excerpts of {self.chunk_tokens} tokens per question."
+
+    @staticmethod
+    def transcript_id(text: str) -> str:
+        return hashlib.sha256(text.encode("utf-8")).hexdigest()[:24]
+
+    def _path(self, transcript_id: str) -> str:
+        return os.path.join(self.directory, f"{transcript_id}.npz")
+
+    def _remember(self, transcript_id: str, index: Dict) -> Dict:
+        self._loaded[transcript_id] = index
+        self._loaded.move_to_end(transcript_id)
+        while len(self._loaded) > self.max_loaded:
+            self._loaded.popitem(last=False)
+        return index
+
+    def load(self, transcript_id: str) -> Optional[Dict]:
+        """The 'vectors', 'chunks' and 'text' of a transcript, None when it is not indexed."""
+        index = self._loaded.get(transcript_id)
+        if index is not None:
+            self._loaded.move_to_end(transcript_id)
+            return index
+        try:
+            with np.load(self._path(transcript_id), allow_pickle=False) as data:
+                index = {
+                    "vectors": data["vectors"],
+                    "chunks": [str(chunk) for chunk in data["chunks"]],
+                    "text": str(data["text"]),
+                }
+        except (OSError, KeyError, ValueError):
+            return None
+        # An index built with another embedding backend has to be rebuilt
+        if self.embedding.dimensions and index["vectors"].shape[1] != self.embedding.dimensions:
+            return None
+        return self._remember(transcript_id, index)
+
+    def _save(self, transcript_id: str, index: Dict) -> None:
+        path = self._path(transcript_id)
+        with open(f"{path}.tmp", "wb") as f:
+            np.savez(f, vectors=index["vectors"], chunks=np.array(index["chunks"]), text=np.array(index["text"]))
+        os.replace(f"{path}.tmp", path)
+
+    async def add(self, text: str) -> str:
+        """Index a transcript, unless it already is.
+
+        Returns:
+            str: The id of the transcript, to search it later.
+        """
+        transcript_id = self.transcript_id(text)
+        if self.load(transcript_id) is not None:
+            return transcript_id
+
+        chunks = split_transcript(text, self.chunk_tokens, self.overlap_tokens, self.count_tokens)
+        if not chunks:
+            raise ValueError("The transcription is empty.")
+        vectors = await self.embedding.embed(chunks)
+        index = {"vectors": np.asarray(vectors, dtype=np.float32), "chunks": chunks, "text": text}
+        await asyncio.to_thread(self._save, transcript_id, index)
+        self._remember(transcript_id, index)
+        return transcript_id
+
+    async def search(self, transcript_id: str, question: str, top_k: Optional[int] = None) -> List[Tuple[str, float]]:
+        """The chunks of a transcript most similar to the question, in episode order."""
+        index = self.load(transcript_id)
+        if index is None:
+            raise ValueError("The transcription is not indexed, upload the audio again.")
+        top_k = min(top_k or self.top_k, len(index["chunks"]))
+        vector = (await self.embedding.embed([question]))[0]
+        scores = index["vectors"] @ vector
+        best = np.argpartition(-scores, top_k - 1)[:top_k]
+        return [(index["chunks"][row], float(scores[row])) for row in sorted(best)]
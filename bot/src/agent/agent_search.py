@@ -0,0 +1,201 @@
+import asyncio
+import gzip
+import json
+import math
+import os
+import re
+import time
+from collections import Counter
+from typing import Dict, List, Optional
+
+TOKEN = re.compile(r"\w+", re.UNICODE)
+STOPWORDS = frozenset(
+    "a an and are as at be but by de do el en for from has have how i if in is it la los me my no not of on or "
+    "que so that the their this to un una was we what when where which who why will with y you your".split()
+)
+
+
+def tokenize(text: str) -> List[str]:
+    return [token for token in TOKEN.findall(text.lower()) if len(token) > 1 and token not in STOPWORDS]
+
+
+def _metadata_text(value) -> str:
+    # Every string of the metadata, such as the title and the context summary
+    if isinstance(value, str):
+        return value
+    if isinstance(value, dict):
+        return " ".join(_metadata_text(item) for key, item in value.items() if key != "user_id")
+    if isinstance(value, list):
+        return " ".join(_metadata_text(item) for item in value)
+    return ""
+
+
+class SessionSearch:
+    """Inverted index of the saved sessions, ranked with BM25.
+
+    A session is indexed when it is saved and removed when it is deleted, so a
+    search never reads the memory table. The postings live in memory and only
+    the term counts of each session, plus the start of its text for the
+    snippets, are written to a gzipped JSON file; the postings are rebuilt from
+    them when the bot starts.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        k1: float = 1.2,
+        b: float = 0.75,
+        title_weight: int = 3,
+        max_text_chars: int = 4000,
+        snippet_chars: int = 160,
+    ):
+        self.path = path
+        self.k1 = k1
+        self.b = b
+        self.title_weight = title_weight
+        self.max_text_chars = max_text_chars
+        self.snippet_chars = snippet_chars
+        # Session id -> user_id, title, created_at, length, terms and text
+        self.docs: Dict[str, Dict] = {}
+        # Term -> session id -> frequency
+        self.postings: Dict[str, Dict[str, int]] = {}
+        self.total_length = 0
+        # Users whose sessions saved before the index existed were added
+        self.backfilled = set()
+        self._write_lock = asyncio.Lock()
+        self.load()
+
+    def __str__(self) -> str:
+        return f"Session search: {len(self.docs)} sessions and {len(self.postings)} terms indexed."
+
+    def __len__(self) -> int:
+        return len(self.docs)
+
+    def load(self) -> None:
+        try:
+            with gzip.open(self.path, "rt", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return
+        self.backfilled = set(data.get("backfilled", []))
+        for session_id, doc in data.get("docs", {}).items():
+            self._insert(session_id, doc)
+
+    def _write(self, payload: bytes) -> None:
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        with open(f"{self.path}.tmp", "wb") as f:
+            f.write(payload)
+        os.replace(f"{self.path}.tmp", self.path)
+
+    async def flush(self) -> None:
+        """Persist the index, the serialization is done before leaving the event loop."""
+        data = {"docs": self.docs, "backfilled": sorted(self.backfilled)}
+        payload = json.dumps(data, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+        async with self._write_lock:
+            await asyncio.to_thread(self._write, gzip.compress(payload, 6))
+
+    def _insert(self, session_id: str, doc: Dict) -> None:
+        self.docs[session_id] = doc
+        self.total_length += doc["length"]
+        for term, frequency in doc["terms"].items():
+            self.postings.setdefault(term, {})[session_id] = frequency
+
+    def _discard(self, session_id: str) -> Optional[Dict]:
+        doc = self.docs.pop(session_id, None)
+        if doc is None:
+            return None
+        self.total_length -= doc["length"]
+        for term in doc["terms"]:
+            sessions = self.postings.get(term)
+            if sessions is not None:
+                sessions.pop(session_id, None)
+                if not sessions:
+                    del self.postings[term]
+        return doc
+
+    def add(self, session_id: str, user_id: str, messages: List[Dict], metadata: Optional[Dict] = None) -> None:
+        """Index a session, replacing the previous version of it."""
+        metadata = metadata or {}
+        previous = self._discard(session_id)
+        text = "\n".join(
+            message["content"] for message in messages if isinstance(message.get("content"), str)
+        )
+        title = metadata.get("title") or (previous or {}).get("title", "")
+        terms = Counter(tokenize(text))
+        for term in tokenize(_metadata_text(metadata)):
+            terms[term] += 1
+        for term in tokenize(title):
+            terms[term] += self.title_weight - 1
+        self._insert(
+            session_id,
+            {
+                "user_id": str(user_id),
+                "title": title,
+                "created_at": (previous or {}).get("created_at") or time.time(),
+                "length": sum(terms.values()),
+                "terms": dict(terms),
+                "text": text[: self.max_text_chars],
+            },
+        )
+
+    def remove(self, session_id: str) -> bool:
+        return self._discard(session_id) is not None
+
+    def clear(self, session_id: str) -> None:
+        """Forget the messages of a session that was kept, as /clear_sessions does."""
+        doc = self.docs.get(session_id)
+        if doc is not None:
+            self.add(session_id, doc["user_id"], [], {"title": doc["title"]})
+
+    def snippet(self, text: str, terms: List[str]) -> str:
+        # The line with the most query terms, cut around the first of them
+        best, best_score = "", 0
+        for line in text.splitlines():
+            words = set(tokenize(line))
+            score = sum(1 for term in terms if term in words)
+            if score > best_score:
+                best, best_score = line, score
+        if not best:
+            return ""
+        lowered = best.lower()
+        first = min((lowered.find(term) for term in terms if lowered.find(term) >= 0), default=0)
+        start = max(0, first - self.snippet_chars // 3)
+        snippet = best[start:start + self.snippet_chars].strip()
+        return ("..." if start else "") + snippet + ("..." if start + self.snippet_chars < len(best) else "")
+
+    def search(self, user_id: str, query: str, limit: int = 5) -> List[Dict]:
+        """The sessions of the user that best match the query, by BM25 score.
+
+        Returns:
+            List[Dict]: The 'session_id', 'title', 'score' and a 'snippet' of
+            each session, best first.
+        """
+        user_id = str(user_id)
+        terms = list(dict.fromkeys(tokenize(query)))
+        if not terms or not self.docs:
+            return []
+        count = len(self.docs)
+        average = self.total_length / count or 1.0
+        scores: Dict[str, float] = {}
+        for term in terms:
+            sessions = self.postings.get(term)
+            if not sessions:
+                continue
+            idf = math.log(1 + (count - len(sessions) + 0.5) / (len(sessions) + 0.5))
+            for session_id, frequency in sessions.items():
+                doc = self.docs[session_id]
+                if doc["user_id"] != user_id:
+                    continue
+                norm = self.k1 * (1 - self.b + self.b * doc["length"] / average)
+                scores[session_id] = scores.get(session_id, 0.0) + idf * frequency * (self.k1 + 1) / (frequency + norm)
+
+        best = sorted(scores.items(), key=lambda item: (-item[1], -self.docs[item[0]]["created_at"]))[:limit]
+        return [
+            {
+                "session_id": session_id,
+                "title": self.docs[session_id]["title"],
+                "score": score,
+                "snippet": self.snippet(self.docs[session_id]["text"], terms),
+            }
+            for session_id, score in best
+        ]
@@ -0,0 +1,130 @@
+import hashlib
+import re
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from src.agent.agent_embeddings import EmbeddingInterface
+
+# Words that point back to the conversation, the answer depends on the turns before
+FOLLOW_UP_WORDS = frozenset(
+    "it its they them their theirs he him his she her hers those these more else also again "
+    "elaborate expand continue previous above".split()
+)
+
+
+class SemanticCache:
+    """Answer cache that matches paraphrased questions about the same context.
+
+    Questions are embedded and compared by cosine similarity against the stored
+    questions that share the same context fingerprint, so "what were the main
+    points" can reuse the answer to "key takeaways?" for the same podcast, in
+    any conversation about it. Only standalone questions are cached: a
+    follow-up such as "tell me more about it" depends on the turns before it
+    and always goes to the model. The vectors live in one preallocated NumPy
+    matrix, capped at ``max_entries`` with least recently used eviction.
+    """
+
+    def __init__(
+        self,
+        embedding: EmbeddingInterface,
+        threshold: float = 0.92,
+        max_entries: int = 1000,
+        context_min_chars: int = 2000,
+    ):
+        if not 0 < threshold <= 1:
+            raise ValueError("threshold should be in (0, 1].")
+        if max_entries < 1:
+            raise ValueError("max_entries should be greater than 0.")
+
+        self.embedding = embedding
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.context_min_chars = context_min_chars
+
+        self.vectors: Optional[np.ndarray] = None
+        self.fingerprints: List[Optional[str]] = [None] * max_entries
+        self.answers: List[Optional[str]] = [None] * max_entries
+        self.last_used = np.zeros(max_entries, dtype=np.int64)
+        self._tick = 0
+        self.stats = {"lookups": 0, "hits": 0, "misses": 0, "stores": 0, "evictions": 0}
+
+    def __str__(self) -> str:
+        return (
+            f"Semantic cache: {len(self)} of {self.max_entries} answers, "
+            f"threshold {self.threshold}, hit rate {self.hit_rate:.0%}."
+        )
+
+    def __len__(self) -> int:
+        return sum(1 for fingerprint in self.fingerprints if fingerprint is not None)
+
+    @property
+    def hit_rate(self) -> float:
+        lookups = self.stats["lookups"]
+        return self.stats["hits"] / lookups if lookups else 0.0
+
+    @staticmethod
+    def is_standalone(question: str) -> bool:
+        """True when the question can be answered without the previous turns."""
+        return not any(word in FOLLOW_UP_WORDS for word in re.findall(r"\w+", question.lower()))
+
+    def fingerprint(self, messages: List[Dict], pinned_messages: int = 1, context_id: Optional[str] = None) -> str:
+        """Fingerprint the context an answer depends on.
+
+        The assistant prompt and transcript sized messages define the context,
+        while the short back and forth of the conversation does not, so the same
+        question about the same podcast matches across turns and users. The
+        ``context_id`` names a context that is not in the messages, such as a
+        transcription kept in a retrieval index.
+        """
+        digest = hashlib.sha256()
+        digest.update(f"{context_id or ''}\0".encode("utf-8"))
+        for index, msg in enumerate(messages):
+            content = msg.get("content") or ""
+            if index < pinned_messages or len(content) >= self.context_min_chars:
+                digest.update(f"{msg.get('role')}\0{content}\0".encode("utf-8"))
+        return digest.hexdigest()
+
+    async def lookup(self, question: str, fingerprint: str) -> Tuple[Optional[str], np.ndarray]:
+        """Find a stored answer to a similar question in the same context.
+
+        Returns:
+            Tuple[Optional[str], np.ndarray]: The answer or None on a miss, and
+            the question vector so it can be stored without embedding it again.
+        """
+        vector = (await self.embedding.embed([question]))[0]
+        self.stats["lookups"] += 1
+
+        rows = [i for i, f in enumerate(self.fingerprints) if f == fingerprint]
+        if self.vectors is not None and rows:
+            similarities = self.vectors[rows] @ vector
+            best = int(np.argmax(similarities))
+            if similarities[best] >= self.threshold:
+                row = rows[best]
+                self._touch(row)
+                self.stats["hits"] += 1
+                return self.answers[row], vector
+
+        self.stats["misses"] += 1
+        return None, vector
+
+    def store(self, fingerprint: str, answer: str, vector: np.ndarray) -> None:
+        if self.vectors is None:
+            self.vectors = np.zeros((self.max_entries, vector.shape[0]), dtype=np.float32)
+
+        free = [i for i, f in enumerate(self.fingerprints) if f is None]
+        if free:
+            row = free[0]
+        else:
+            row = int(np.argmin(self.last_used))
+            self.stats["evictions"] += 1
+
+        self.vectors[row] = vector
+        self.fingerprints[row] = fingerprint
+        self.answers[row] = answer
+        self._touch(row)
+        self.stats["stores"] += 1
+
+    def _touch(self, row: int) -> None:
+        self._tick += 1
+        self.last_used[row] = self._tick
@@ -0,0 +1,174 @@
+import asyncio
+import re
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+
+from bot.src.api.api_podcast_agent_bot import ServerlessInterface
+from src.agent.agent_context import ContextWindow
+from data.prompts import chunk_summary_prompt, reduce_summary_prompt, summarize_prompt
+
+
+def split_line(line: str, max_tokens: int, count_tokens: Callable[[str], int]) -> List[str]:
+    # A line over the budget is cut between words
+    pieces, words = [], []
+    for word in line.split(" "):
+        if words and count_tokens(" ".join(words + [word])) > max_tokens:
+            pieces.append(" ".join(words))
+            words = []
+        words.append(word)
+    if words:
+        pieces.append(" ".join(words))
+    return pieces
+
+
+def split_transcript(
+    text: str, max_tokens: int, overlap_tokens: int, count_tokens: Callable[[str], int]
+) -> List[str]:
+    """Split a transcript on its lines into chunks of at most max_tokens.
+
+    Each chunk starts with the last lines of the previous one that fit in
+    overlap_tokens, so a topic cut at a boundary is in both chunks.
+    """
+    lines = []
+    for line in text.splitlines():
+        if not line.strip():
+            continue
+        tokens = count_tokens(line) + 1
+        if tokens > max_tokens:
+            lines += [(piece, count_tokens(piece) + 1) for piece in split_line(line, max_tokens, count_tokens)]
+        else:
+            lines.append((line, tokens))
+
+    chunks = []
+    start = 0
+    while start < len(lines):
+        end, used = start, 0
+        while end < len(lines) and used + lines[end][1] <= max_tokens:
+            used += lines[end][1]
+            end += 1
+        end = max(end, start + 1)
+        chunks.append("\n".join(line for line, _ in lines[start:end]))
+        if end == len(lines):
+            break
+        overlap, used = end, 0
+        while overlap - 1 > start and used + lines[overlap - 1][1] <= overlap_tokens:
+            used += lines[overlap - 1][1]
+            overlap -= 1
+        start = overlap
+    return chunks
+
+
+class TranscriptSummarizer:
+    """Map-reduce summary of transcripts of any length.
+
+    The transcript is split on its lines into chunks of at most ``chunk_tokens``
+    that overlap by ``overlap_tokens``, so a topic cut at a boundary is seen by
+    both chunks. The chunks are summarized concurrently, at most ``concurrency``
+    requests at a time, then the partial summaries are merged in groups that fit
+    the same budget, level by level, until one summary of ``max_chars`` is left.
+    The wall time grows with the number of chunks over the concurrency, plus one
+    request per level.
+    """
+
+    def __init__(
+        self,
+        serverless_api: ServerlessInterface,
+        chunk_tokens: int = 3000,
+        overlap_tokens: int = 150,
+        concurrency: int = 4,
+        max_chars: int = 1200,
+        count_tokens: Optional[Callable[[str], int]] = None,
+    ):
+        if chunk_tokens <= 0:
+            raise ValueError("chunk_tokens should be greater than 0.")
+        if not 0 <= overlap_tokens < chunk_tokens // 2:
+            raise ValueError("overlap_tokens should be less than half of chunk_tokens.")
+        if concurrency < 1:
+            raise ValueError("concurrency should be greater than 0.")
+
+        self.serverless_api = serverless_api
+        self.chunk_tokens = chunk_tokens
+        self.overlap_tokens = overlap_tokens
+        self.concurrency = concurrency
+        self.max_chars = max_chars
+        self.count_tokens = count_tokens or ContextWindow().count_text
+
+    def __str__(self) -> str:
+        return f"Summaries: map-reduce over {self.chunk_tokens} token chunks, {self.concurrency} at a time."
+
+    def split(self, text: str) -> List[str]:
+        return split_transcript(text, self.chunk_tokens, self.overlap_tokens, self.count_tokens)
+
+    async def _complete(self, semaphore: asyncio.Semaphore, stats: Dict, prompt: str, content: str) -> str:
+        messages = [{"role": "system", "content": prompt}, {"role": "user", "content": content}]
+        async with semaphore:
+            response = await self.serverless_api.chat_completion(messages)
+        stats["requests"] += 1
+        if response.get("status") == "error":
+            raise Exception(response.get("message", "Internal server error."))
+        return response["last_message"]["content"].strip()
+
+    def _groups(self, summaries: List[str]) -> List[List[str]]:
+        # Consecutive summaries that fit in one request, at least two per group
+        groups, group, used = [], [], 0
+        for summary in summaries:
+            tokens = self.count_tokens(summary) + 1
+            if len(group) >= 2 and used + tokens > self.chunk_tokens:
+                groups.append(group)
+                group, used = [], 0
+            group.append(summary)
+            used += tokens
+        groups.append(group)
+        return groups
+
+    def _shorten(self, summary: str) -> str:
+        if len(summary) <= self.max_chars:
+            return summary
+        # Cut at the last sentence that fits
+        cut = summary[: self.max_chars]
+        end = max((match.end() for match in re.finditer(r"[.!?](\s|$)", cut)), default=0)
+        return cut[:end].strip() if end else cut.rsplit(" ", 1)[0]
+
+    async def summarize(self, text: str) -> Tuple[str, Dict]:
+        """Summarize a transcript in at most max_chars characters.
+
+        Returns:
+            Tuple[str, Dict]: The summary, and the 'chunks', reduce 'levels',
+            'requests' and 'elapsed' seconds it took.
+        """
+        started = time.perf_counter()
+        stats = {"chunks": 0, "levels": 0, "requests": 0}
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        chunks = self.split(text)
+        if not chunks:
+            raise ValueError("The transcription is empty.")
+        stats["chunks"] = len(chunks)
+        if len(chunks) == 1:
+            summary = await self._complete(semaphore, stats, summarize_prompt, chunks[0])
+        else:
+            summaries = await asyncio.gather(
+                *[
+                    self._complete(semaphore, stats, chunk_summary_prompt, f"Part {i + 1} of {len(chunks)}:\n{chunk}")
+                    for i, chunk in enumerate(chunks)
+                ]
+            )
+            groups = self._groups(summaries)
+            while len(groups) > 1:
+                stats["levels"] += 1
+                summaries = await asyncio.gather(
+                    *[self._complete(semaphore, stats, reduce_summary_prompt, "\n\n".join(group)) for group in groups]
+                )
+                groups = self._groups(summaries)
+            stats["levels"] += 1
+            summary = await self._complete(semaphore, stats, summarize_prompt, "\n\n".join(groups[0]))
+
+        if len(summary) > self.max_chars:
+            summary = await self._complete(
+                semaphore,
+                stats,
+                summarize_prompt,
+                f"Shorten this summary to at most {self.max_chars} characters:\n{summary}",
+            )
+        stats["elapsed"] = time.perf_counter() - started
+        return self._shorten(summary), stats
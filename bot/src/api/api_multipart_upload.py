@@ -0,0 +1,294 @@
+"""Parallel, resumable uploads to S3 through presigned multipart URLs.
+
+The serverless API starts the upload and presigns a PUT URL per part. Each
+part is read from the source with a ranged request, or a seek in a local file,
+and uploaded by one of ``concurrency`` workers, so at most ``concurrency``
+parts are in memory and the whole file never is.
+
+The upload id of an unfinished upload is kept in a small state file. Uploading
+the same key again, after a failure or a restart, only sends the parts that S3
+does not have yet.
+"""
+import asyncio
+import hashlib
+import json
+import os
+import random
+import time
+from typing import Dict, List, Optional
+
+import aiohttp
+
+from src.api.api_podcast_agent_bot import ServerlessInterface
+
+DEFAULT_PART_SIZE = 8 * 1024 * 1024
+
+
+class UploadError(Exception):
+    pass
+
+
+class PartSource:
+    """Where the bytes of the parts are read from."""
+
+    async def read(self, session: aiohttp.ClientSession, start: int, end: int) -> bytes:
+        raise NotImplementedError("This method should be overridden by subclasses")
+
+    def to_dict(self) -> Dict:
+        raise NotImplementedError("This method should be overridden by subclasses")
+
+    @staticmethod
+    def from_dict(data: Dict) -> "PartSource":
+        if data.get("type") == "url":
+            return UrlSource(data["url"])
+        if data.get("type") == "file":
+            return FileSource(data["path"])
+        raise ValueError(f"Unknown source {data.get('type')}")
+
+
+class UrlSource(PartSource):
+    """A file served over HTTP with range requests, such as a Discord attachment."""
+
+    def __init__(self, url: str):
+        self.url = url
+
+    async def read(self, session: aiohttp.ClientSession, start: int, end: int) -> bytes:
+        headers = {"Range": f"bytes={start}-{end - 1}"}
+        async with session.get(self.url, headers=headers) as res:
+            if res.status != 206:
+                raise UploadError(f"Range request failed with status {res.status}.")
+            return await res.read()
+
+    def to_dict(self) -> Dict:
+        return {"type": "url", "url": self.url}
+
+
+class FileSource(PartSource):
+    def __init__(self, path: str):
+        self.path = path
+
+    def _read(self, start: int, end: int) -> bytes:
+        with open(self.path, "rb") as f:
+            f.seek(start)
+            return f.read(end - start)
+
+    async def read(self, session: aiohttp.ClientSession, start: int, end: int) -> bytes:
+        return await asyncio.to_thread(self._read, start, end)
+
+    def to_dict(self) -> Dict:
+        return {"type": "file", "path": self.path}
+
+
+class MultipartUploader:
+    def __init__(
+        self,
+        serverless_api: ServerlessInterface,
+        state_path: str,
+        concurrency: int = 4,
+        part_size: int = DEFAULT_PART_SIZE,
+        max_attempts: int = 4,
+        part_timeout: float = 300.0,
+    ):
+        """
+        Args:
+            serverless_api (ServerlessInterface): API presigning the part URLs.
+            state_path (str): Folder of the state files of the unfinished uploads.
+            concurrency (int): Parts read and uploaded at the same time.
+            part_size (int): Size of the parts, at least 5 MiB.
+            max_attempts (int): Attempts to upload each part.
+        """
+        if concurrency < 1:
+            raise ValueError("concurrency should be greater than 0.")
+        self.serverless_api = serverless_api
+        self.state_path = state_path
+        self.concurrency = concurrency
+        self.part_size = part_size
+        self.max_attempts = max_attempts
+        self.timeout = aiohttp.ClientTimeout(total=part_timeout)
+        # Not the API session, presigned URLs must not receive the API key
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._resume_task: Optional[asyncio.Task] = None
+        os.makedirs(state_path, exist_ok=True)
+
+    def __str__(self) -> str:
+        return f"Uploads: S3 multipart, {self.concurrency} parts of {self.part_size // 1024 // 1024} MiB at a time."
+
+    async def _client(self) -> aiohttp.ClientSession:
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(limit=self.concurrency * 2)
+            self._session = aiohttp.ClientSession(connector=connector, timeout=self.timeout)
+        return self._session
+
+    async def close(self) -> None:
+        if self._session and not self._session.closed:
+            await self._session.close()
+        self._session = None
+
+    def _state_file(self, key: str) -> str:
+        name = hashlib.sha256(key.encode("utf-8")).hexdigest()[:32]
+        return os.path.join(self.state_path, f"{name}.json")
+
+    def _load_state(self, key: str) -> Optional[Dict]:
+        try:
+            with open(self._state_file(key), encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _save_state(self, state: Dict) -> None:
+        path = self._state_file(state["key"])
+        with open(f"{path}.tmp", "w", encoding="utf-8") as f:
+            json.dump(state, f)
+        os.replace(f"{path}.tmp", path)
+
+    def _remove_state(self, key: str) -> None:
+        try:
+            os.remove(self._state_file(key))
+        except OSError:
+            pass
+
+    def pending(self) -> List[Dict]:
+        """The state of the unfinished uploads, oldest first."""
+        states = []
+        for name in os.listdir(self.state_path):
+            if name.endswith(".json"):
+                try:
+                    with open(os.path.join(self.state_path, name), encoding="utf-8") as f:
+                        states.append(json.load(f))
+                except (OSError, ValueError):
+                    continue
+        return sorted(states, key=lambda state: state.get("created_at", 0))
+
+    async def _start(self, source: PartSource, key: str, size: int, content_type: Optional[str]) -> Dict:
+        state = self._load_state(key)
+        if state and state["size"] == size and state["source"] == source.to_dict():
+            res = await self.serverless_api.get_multipart_upload(state["upload_id"], key, state["part_count"])
+            if res.get("status") != "error":
+                etags = {part["part_number"]: part["etag"] for part in res.get("uploaded", [])}
+                urls = {part["part_number"]: part["url"] for part in res.get("parts", [])}
+                return {**state, "etags": etags, "urls": urls, "resumed": len(etags)}
+            # The upload was completed, aborted or expired, start again
+            self._remove_state(key)
+
+        res = await self.serverless_api.create_multipart_upload(key, size, self.part_size, content_type)
+        if res.get("status") == "error" or "upload_id" not in res:
+            raise UploadError(res.get("message", "Failed to start the upload."))
+        state = {
+            "key": key,
+            "upload_id": res["upload_id"],
+            "size": size,
+            "part_size": res["part_size"],
+            "part_count": res["part_count"],
+            "source": source.to_dict(),
+            "created_at": time.time(),
+        }
+        self._save_state(state)
+        urls = {part["part_number"]: part["url"] for part in res["parts"]}
+        return {**state, "etags": {}, "urls": urls, "resumed": 0}
+
+    async def _refresh_urls(self, upload: Dict) -> None:
+        res = await self.serverless_api.get_multipart_upload(upload["upload_id"], upload["key"], upload["part_count"])
+        if res.get("status") == "error":
+            raise UploadError(res.get("message", "Failed to presign the parts."))
+        upload["urls"].update({part["part_number"]: part["url"] for part in res.get("parts", [])})
+
+    async def _put_part(self, session: aiohttp.ClientSession, upload: Dict, part_number: int, data: bytes) -> str:
+        for attempt in range(self.max_attempts):
+            try:
+                async with session.put(upload["urls"][part_number], data=data) as res:
+                    if res.status == 200:
+                        return res.headers["ETag"]
+                    if res.status == 403:
+                        # The presigned URL expired while the part was waiting
+                        await self._refresh_urls(upload)
+                    elif res.status < 500:
+                        raise UploadError(f"Part {part_number} was rejected with status {res.status}.")
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                if attempt == self.max_attempts - 1:
+                    raise UploadError(f"Part {part_number} failed: {e}")
+            if attempt < self.max_attempts - 1:
+                await asyncio.sleep(random.uniform(0, min(8.0, 0.5 * 2 ** attempt)))
+        raise UploadError(f"Part {part_number} failed after {self.max_attempts} attempts.")
+
+    async def upload(
+        self, source: PartSource, key: str, size: int, content_type: Optional[str] = None
+    ) -> Dict:
+        """Upload `size` bytes of the source to the S3 key, resuming an unfinished upload.
+
+        Raises:
+            UploadError: A part could not be uploaded. The state is kept, so the
+            next upload of the key only sends the missing parts.
+
+        Returns:
+            Dict: The 'key', 'size', number of 'parts', the 'resumed' parts that
+            were already uploaded, the 'elapsed' seconds and the 'throughput' in
+            bytes per second.
+        """
+        started = time.perf_counter()
+        upload = await self._start(source, key, size, content_type)
+        session = await self._client()
+        part_size = upload["part_size"]
+        missing = asyncio.Queue()
+        for part_number in range(1, upload["part_count"] + 1):
+            if part_number not in upload["etags"]:
+                missing.put_nowait(part_number)
+        refresh_lock = asyncio.Lock()
+
+        async def worker():
+            while not missing.empty():
+                part_number = missing.get_nowait()
+                if part_number not in upload["urls"]:
+                    async with refresh_lock:
+                        if part_number not in upload["urls"]:
+                            await self._refresh_urls(upload)
+                start = (part_number - 1) * part_size
+                # One part per worker in memory at a time
+                data = await source.read(session, start, min(start + part_size, size))
+                upload["etags"][part_number] = await self._put_part(session, upload, part_number, data)
+
+        workers = [asyncio.create_task(worker()) for _ in range(self.concurrency)]
+        try:
+            await asyncio.gather(*workers)
+        except BaseException:
+            for task in workers:
+                task.cancel()
+            await asyncio.gather(*workers, return_exceptions=True)
+            raise
+
+        parts = [{"part_number": number, "etag": etag} for number, etag in sorted(upload["etags"].items())]
+        res = await self.serverless_api.complete_multipart_upload(upload["upload_id"], key, parts)
+        if res.get("status") == "error":
+            raise UploadError(res.get("message", "Failed to complete the upload."))
+        self._remove_state(key)
+
+        elapsed = time.perf_counter() - started
+        return {
+            "key": key,
+            "size": size,
+            "parts": upload["part_count"],
+            "resumed": upload["resumed"],
+            "elapsed": elapsed,
+            "throughput": size / elapsed if elapsed else 0.0,
+        }
+
+    async def resume_pending(self) -> None:
+        """Finish the uploads interrupted by a restart, in the background of the bot."""
+        if self.pending():
+            self._resume_task = asyncio.create_task(self._resume_all())
+
+    async def _resume_all(self) -> None:
+        for state in self.pending():
+            try:
+                source = PartSource.from_dict(state["source"])
+                res = await self.upload(source, state["key"], state["size"])
+                print(f"Resumed upload of {res['key']}: {res['resumed']} of {res['parts']} parts were already sent.")
+            except Exception as e:
+                print(f"Error resuming the upload of {state.get('key')}: {e}")
+
+    async def abort(self, key: str) -> Dict:
+        state = self._load_state(key)
+        if not state:
+            return {"status": "error", "message": "No unfinished upload for this key."}
+        res = await self.serverless_api.abort_multipart_upload(state["upload_id"], key)
+        self._remove_state(key)
+        return res
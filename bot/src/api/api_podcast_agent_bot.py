@@ -1,7 +1,12 @@
+import asyncio
+import json
 import aiohttp
-from typing import List, Dict
+from typing import Any, AsyncIterator, List, Dict, Optional
 from abc import ABC, abstractmethod
+from contextlib import asynccontextmanager
 from src.api.api_interface import APIInterface
+from src.api.api_session_cache import SessionCache
+from src.api.api_singleflight import SingleFlight
 
 
 class ServerlessInterface(ABC):
@@ -10,101 +15,386 @@ class ServerlessInterface(ABC):
         """Should be implemented to handle chat completion."""
         pass
 
+    @abstractmethod
+    async def chat_completion_session(
+        self,
+        session_id: str,
+        message: Dict,
+        prefix: Optional[List[Dict]] = None,
+        prompt_content: Optional[str] = None,
+    ) -> Dict:
+        """Should be implemented to ask with the history stored server-side."""
+        pass
+
+    @abstractmethod
+    def chat_completion_stream(self, session_messages: List[Dict]) -> AsyncIterator[Dict]:
+        """Should be implemented to stream the chat completion events."""
+        pass
+
+    @abstractmethod
+    async def embeddings(self, texts: List[str]) -> Dict:
+        """Should be implemented to embed texts."""
+        pass
+
     @abstractmethod
     async def save_session(
         self, session_id: str, session_messages: List[dict], session_metadata: dict
     ) -> Dict:
         """Should be implemented to save the session."""
         pass
-    
+
     @abstractmethod
-    async def get_all_session(self) -> List[dict]:
-        """Should be implemented to get all sessions."""
+    async def get_all_session(
+        self, owner_id: str, cursor: Optional[str] = None, limit: Optional[int] = None
+    ) -> Dict:
+        """Should be implemented to get a page of the sessions of an owner."""
         pass
-    
+
     @abstractmethod
-    async def get_session(self, session_id: str) -> List[dict]:
-        """Should be implemented to get a specific session."""
+    async def get_session(
+        self, session_id: str, last: Optional[int] = None, after: Optional[int] = None
+    ) -> Dict:
+        """Should be implemented to get a specific session or a range of its messages."""
         pass
-    
+
     @abstractmethod
     async def delete_session(self, session_id: str) -> Dict:
         """Should be implemented to delete a specific session."""
         pass
 
+    @abstractmethod
+    async def get_sessions(self, session_ids: List[str]) -> Dict:
+        """Should be implemented to get the metadata of many sessions."""
+        pass
+
+    @abstractmethod
+    async def delete_sessions(self, session_ids: List[str]) -> Dict:
+        """Should be implemented to delete many sessions."""
+        pass
+
+    @abstractmethod
+    async def clear_sessions(self, session_ids: List[str]) -> Dict:
+        """Should be implemented to delete the messages of many sessions."""
+        pass
+
+    @abstractmethod
+    async def update_session_metadata(self, session_id: str, session_metadata: dict) -> Dict:
+        """Should be implemented to update the metadata of a session."""
+        pass
+
+    @abstractmethod
+    async def create_multipart_upload(
+        self, key: str, size: int, part_size: Optional[int] = None, content_type: Optional[str] = None
+    ) -> Dict:
+        """Should be implemented to start a multipart upload to S3."""
+        pass
+
+    @abstractmethod
+    async def get_multipart_upload(self, upload_id: str, key: str, parts: int) -> Dict:
+        """Should be implemented to list the uploaded parts and presign the missing ones."""
+        pass
+
+    @abstractmethod
+    async def complete_multipart_upload(self, upload_id: str, key: str, parts: List[Dict]) -> Dict:
+        """Should be implemented to complete a multipart upload."""
+        pass
+
+    @abstractmethod
+    async def abort_multipart_upload(self, upload_id: str, key: str) -> Dict:
+        """Should be implemented to abort a multipart upload."""
+        pass
+
 
 class PodcastAgentBotAPI(APIInterface, ServerlessInterface):
+    """Client for the serverless API.
+
+    By default every request goes through one long-lived ``aiohttp.ClientSession``
+    so TCP and TLS connections to API Gateway are kept alive and reused between
+    slash commands. Call ``open()`` on startup and ``close()`` on shutdown. With
+    ``pooled=False`` each request opens its own session (one handshake per call).
+
+    ``stream_url`` is the base URL of the streaming ``gpt_ask_stream`` function.
+    When it is not set, streaming falls back to a single buffered completion.
+
+    Identical concurrent reads of the sessions share one request, see
+    ``SingleFlight``; ``singleflight.stats`` counts the deduplicated calls.
+    With a ``session_cache`` the reads are served from memory until the bot
+    writes the session or the TTL expires.
+    """
+
     def __init__(
-        self, api_base_url: str, api_key_value: str, api_key_header: str
+        self,
+        api_base_url: str,
+        api_key_value: str,
+        api_key_header: str,
+        pooled: bool = True,
+        connection_limit: int = 100,
+        connection_limit_per_host: int = 20,
+        keepalive_timeout: float = 60.0,
+        dns_cache_ttl: int = 300,
+        request_timeout: float = 30.0,
+        connect_timeout: float = 10.0,
+        stream_url: Optional[str] = None,
+        stream_read_timeout: float = 30.0,
+        session_cache: Optional[SessionCache] = None,
     ) -> None:
         super().__init__(api_base_url, api_key_value, api_key_header)
+        self.stream_url = stream_url.rstrip("/") if stream_url else None
+        self.stream_timeout = aiohttp.ClientTimeout(
+            total=None, connect=connect_timeout, sock_read=stream_read_timeout
+        )
+        self.pooled = pooled
+        self.connection_limit = connection_limit
+        self.connection_limit_per_host = connection_limit_per_host
+        self.keepalive_timeout = keepalive_timeout
+        self.dns_cache_ttl = dns_cache_ttl
+        self.timeout = aiohttp.ClientTimeout(
+            total=request_timeout, connect=connect_timeout
+        )
+        self._session: Optional[aiohttp.ClientSession] = None
+        self.singleflight = SingleFlight()
+        self.session_cache = session_cache
+
+    async def __aenter__(self) -> "PodcastAgentBotAPI":
+        await self.open()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb) -> None:
+        await self.close()
+
+    async def open(self) -> None:
+        """Open the shared HTTP session. It is a no-op if pooling is disabled."""
+        if not self.pooled or (self._session and not self._session.closed):
+            return
+        connector = aiohttp.TCPConnector(
+            limit=self.connection_limit,
+            limit_per_host=self.connection_limit_per_host,
+            keepalive_timeout=self.keepalive_timeout,
+            ttl_dns_cache=self.dns_cache_ttl,
+            use_dns_cache=True,
+        )
+        self._session = aiohttp.ClientSession(
+            connector=connector, timeout=self.timeout, headers=self.headers
+        )
+
+    async def close(self) -> None:
+        """Close the shared HTTP session and release its pooled connections."""
+        if self._session and not self._session.closed:
+            await self._session.close()
+        self._session = None
+
+    @asynccontextmanager
+    async def _client(self):
+        if not self.pooled:
+            async with aiohttp.ClientSession(
+                timeout=self.timeout, headers=self.headers
+            ) as session:
+                yield session
+            return
+
+        # The shared session is opened lazily in case open() was never awaited.
+        await self.open()
+        yield self._session
 
     def _build_url(self, path: str) -> str:
         return f"{self.base_url}/{path}"
 
-    async def chat_completion(self, session_messages: List[Dict]) -> Dict:
-        path = "gpt/ask"
+    async def _request(
+        self,
+        method: str,
+        path: str,
+        body: Optional[Dict] = None,
+        timeout: Optional[float] = None,
+        params: Optional[Dict] = None,
+    ) -> Any:
         url = self._build_url(path)
+        # Passing timeout=None would disable the timeout of the session
+        kwargs = {"timeout": aiohttp.ClientTimeout(total=timeout)} if timeout else {}
+        try:
+            async with self._client() as session:
+                async with session.request(method, url, json=body, params=params, **kwargs) as res:
+                    if res.status != 200:
+                        return {"status": "error", "message": "Internal server error."}
+                    try:
+                        response_json = await res.json()
+                        return response_json
+                    except Exception as e:
+                        return {"status": "error", "message": str(e)}
+        except asyncio.TimeoutError:
+            return {"status": "error", "message": "Request timed out. Please try again."}
+
+    async def chat_completion(self, session_messages: List[Dict]) -> Dict:
+        body = {"messages": session_messages}
+        return await self._request("POST", "gpt/ask", body)
+
+    async def chat_completion_session(
+        self,
+        session_id: str,
+        message: Dict,
+        prefix: Optional[List[Dict]] = None,
+        prompt_content: Optional[str] = None,
+    ) -> Dict:
+        # Only the new message travels, the history is loaded by the Lambda
+        body = {"message": message}
+        if prefix:
+            body["prefix"] = prefix
+        if prompt_content:
+            # Sent to the model in place of the message content, but not stored
+            body["prompt_content"] = prompt_content
+        res = await self._request("POST", f"gpt/sessions/{session_id}/ask", body)
+        self._invalidate(session_id)
+        return res
+
+    async def chat_completion_stream(self, session_messages: List[Dict]) -> AsyncIterator[Dict]:
+        """Yield 'delta' events while the answer is generated, then 'done' or 'error'."""
+        if not self.stream_url:
+            response = await self.chat_completion(session_messages)
+            if response.get("status") == "error" or "last_message" not in response:
+                yield {"type": "error", "message": response.get("message", "Internal server error.")}
+                return
+            yield {"type": "delta", "content": response["last_message"]["content"]}
+            yield {"type": "done", **response}
+            return
+
+        url = f"{self.stream_url}/gpt/ask/stream"
         body = {"messages": session_messages}
-        async with aiohttp.ClientSession() as session:
-            async with session.post(url, json=body, headers=self.headers) as res:
-                if res.status != 200:
-                    return {"status": "error", "message": "Internal server error."}
-                try:
-                    response_json = await res.json()
-                    return response_json
-                except Exception as e:
-                    return {"status": "error", "message": str(e)}
+        try:
+            async with self._client() as session:
+                async with session.post(url, json=body, timeout=self.stream_timeout) as res:
+                    if res.status != 200:
+                        yield {"type": "error", "message": "Internal server error."}
+                        return
+                    async for line in res.content:
+                        if not line.strip():
+                            continue
+                        try:
+                            event = json.loads(line)
+                        except ValueError as e:
+                            yield {"type": "error", "message": f"Invalid stream event: {e}"}
+                            return
+                        yield event
+        except asyncio.TimeoutError:
+            yield {"type": "error", "message": "Request timed out. Please try again."}
+
+    async def embeddings(self, texts: List[str]) -> Dict:
+        body = {"texts": texts}
+        return await self._request("POST", "gpt/embeddings", body)
 
     async def save_session(self, session_id: str, session_messages: List[dict], session_metadata: dict) -> Dict:
-        path = f"sessions/{session_id}"
-        url = self._build_url(path)
         body = {"messages": session_messages, "metadata": session_metadata}
-        async with aiohttp.ClientSession() as session:
-            async with session.post(url, json=body, headers=self.headers) as res:
-                if res.status != 200:
-                    return {"status": "error", "message": "Internal server error."}
-                try:
-                    response_json = await res.json()
-                    return response_json
-                except Exception as e:
-                    return {"status": "error", "message": str(e)}
-
-    async def get_all_session(self) -> List[dict]:
-        path = f"sessions/"
-        url = self._build_url(path)
-        async with aiohttp.ClientSession() as session:
-            async with session.get(url, headers=self.headers) as res:
-                if res.status != 200:
-                    return {"status": "error", "message": "Internal server error."}
-                try:
-                    response_json = await res.json()
-                    return response_json
-                except Exception as e:
-                    return {"status": "error", "message": str(e)}
-                
-    async def get_session(self, session_id: str) -> List[dict]:
-        path = f"sessions/{session_id}"
-        url = self._build_url(path)
-        async with aiohttp.ClientSession() as session:
-            async with session.get(url, headers=self.headers) as res:
-                if res.status != 200:
-                    return {"status": "error", "message": "Internal server error."}
-                try:
-                    response_json = await res.json()
-                    return response_json
-                except Exception as e:
-                    return {"status": "error", "message": str(e)}
-                
+        res = await self._request("POST", f"sessions/{session_id}", body)
+        self._invalidate(session_id, session_metadata.get("user_id"))
+        return res
+
+    def _invalidate(self, session_id: str, owner_id: Optional[str] = None, deleted: bool = False) -> None:
+        # After the write, also when it failed, it may have been applied
+        if not owner_id and self.session_cache is not None:
+            owner_id = self.session_cache.owners.get(session_id)
+        # Reads in flight may have been served before the write, later callers start new ones
+        for key in self.singleflight.in_flight():
+            if key[0] == "get_session" and key[1] == session_id:
+                self.singleflight.forget(key)
+            elif key[0] == "get_all_session" and (not owner_id or key[1] == str(owner_id)):
+                self.singleflight.forget(key)
+        if self.session_cache is not None:
+            self.session_cache.invalidate_session(session_id, owner_id, deleted)
+
+    async def _cached_read(self, key, fetch, session_id: Optional[str] = None, owner_id: Optional[str] = None) -> Dict:
+        if self.session_cache is None:
+            return await self.singleflight.do(key, fetch)
+        cached = self.session_cache.get(key)
+        if cached is not None:
+            return cached
+
+        async def fetch_versioned():
+            # The version when the read starts, not when a caller joins it
+            return self.session_cache.version, await fetch()
+
+        version, res = await self.singleflight.do(key, fetch_versioned)
+        if res.get("status") != "error":
+            # Pages are tagged with their owner, reads of a session only with the session
+            self.session_cache.put(key, res, session_id, owner_id, version)
+            if session_id:
+                self.session_cache.remember_owner(session_id, res.get("metadata", {}).get("user_id"))
+            for session in res.get("sessions", []):
+                self.session_cache.remember_owner(session.get("pk", "").replace("SESSION#", ""), owner_id)
+        return res
+
+    async def get_all_session(
+        self, owner_id: str, cursor: Optional[str] = None, limit: Optional[int] = None
+    ) -> Dict:
+        """Get one page of sessions, newest first. Pass the returned cursor for the next one."""
+        params = {"owner_id": str(owner_id)}
+        if cursor:
+            params["cursor"] = cursor
+        if limit:
+            params["limit"] = str(limit)
+        key = ("get_all_session", params["owner_id"], cursor, limit)
+        return await self._cached_read(
+            key, lambda: self._request("GET", "sessions/", params=params), owner_id=params["owner_id"]
+        )
+
+    async def get_session(
+        self, session_id: str, last: Optional[int] = None, after: Optional[int] = None
+    ) -> Dict:
+        """Get a session with all its messages, or only the last N / those after a seq."""
+        params = {}
+        if last is not None:
+            params["last"] = str(last)
+        if after is not None:
+            params["after"] = str(after)
+        key = ("get_session", session_id, last, after)
+        return await self._cached_read(
+            key, lambda: self._request("GET", f"sessions/{session_id}", params=params or None), session_id
+        )
+
     async def delete_session(self, session_id: str) -> Dict:
-        path = f"sessions/{session_id}"
-        url = self._build_url(path)
-        async with aiohttp.ClientSession() as session:
-            async with session.delete(url, headers=self.headers) as res:
-                if res.status != 200:
-                    return {"status": "error", "message": "Internal server error."}
-                try:
-                    response_json = await res.json()
-                    return response_json
-                except Exception as e:
-                    return {"status": "error", "message": str(e)}
\ No newline at end of file
+        res = await self._request("DELETE", f"sessions/{session_id}")
+        self._invalidate(session_id, deleted=True)
+        return res
+
+    async def update_session_metadata(self, session_id: str, session_metadata: dict) -> Dict:
+        res = await self._request("POST", f"sessions/{session_id}/metadata", session_metadata)
+        self._invalidate(session_id, session_metadata.get("user_id"))
+        return res
+
+    async def get_sessions(self, session_ids: List[str]) -> Dict:
+        """Get the metadata of up to 100 sessions in one request."""
+        return await self._request("POST", "sessions/batch/get", {"session_ids": session_ids})
+
+    async def delete_sessions(self, session_ids: List[str]) -> Dict:
+        """Delete up to 100 sessions in one request."""
+        res = await self._request("POST", "sessions/batch/delete", {"session_ids": session_ids})
+        for session_id in session_ids:
+            self._invalidate(session_id, deleted=True)
+        return res
+
+    async def clear_sessions(self, session_ids: List[str]) -> Dict:
+        """Delete the messages of up to 100 sessions in one request."""
+        res = await self._request("POST", "sessions/batch/clear", {"session_ids": session_ids})
+        for session_id in session_ids:
+            self._invalidate(session_id)
+        return res
+
+    async def create_multipart_upload(
+        self, key: str, size: int, part_size: Optional[int] = None, content_type: Optional[str] = None
+    ) -> Dict:
+        """Start a multipart upload, with presigned URLs for its first parts."""
+        body = {"key": key, "size": size}
+        if part_size:
+            body["part_size"] = part_size
+        if content_type:
+            body["content_type"] = content_type
+        return await self._request("POST", "files/multipart", body)
+
+    async def get_multipart_upload(self, upload_id: str, key: str, parts: int) -> Dict:
+        """List the uploaded parts, with fresh presigned URLs for the missing ones."""
+        params = {"key": key, "parts": str(parts)}
+        return await self._request("GET", f"files/multipart/{upload_id}", params=params)
+
+    async def complete_multipart_upload(self, upload_id: str, key: str, parts: List[Dict]) -> Dict:
+        body = {"key": key, "parts": parts}
+        return await self._request("POST", f"files/multipart/{upload_id}/complete", body)
+
+    async def abort_multipart_upload(self, upload_id: str, key: str) -> Dict:
+        return await self._request("DELETE", f"files/multipart/{upload_id}", params={"key": key})
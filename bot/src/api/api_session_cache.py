@@ -0,0 +1,113 @@
+import copy
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Optional, Set, Tuple
+
+
+class SessionCache:
+    """Read-through cache of the session reads, with LRU eviction and a TTL.
+
+    Saved sessions only change through this bot, so each entry is tagged with
+    the session and the owner it belongs to, and the writes invalidate exactly
+    those entries: a session read is dropped when the session changes, and the
+    pages of an owner when one of their sessions is saved or deleted. The TTL
+    bounds the staleness of a change made by another process.
+
+    Each read gets its own copy, the callers are free to change it.
+    """
+
+    def __init__(self, max_entries: int = 256, ttl: float = 300.0, clock: Callable[[], float] = time.monotonic):
+        if max_entries < 1:
+            raise ValueError("max_entries should be greater than 0.")
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.clock = clock
+        # Key -> (expires at, value, session id, owner id), least recently used first
+        self.entries: "OrderedDict[Hashable, Tuple[float, Any, Optional[str], Optional[str]]]" = OrderedDict()
+        self.by_session: Dict[str, Set[Hashable]] = {}
+        self.by_owner: Dict[str, Set[Hashable]] = {}
+        # Owner of each session seen in a page or a save, to drop their pages on a delete
+        self.owners: Dict[str, str] = {}
+        # Changes on every invalidation, a read that started before is not stored
+        self.version = 0
+        self.stats = {"hits": 0, "misses": 0, "expired": 0, "evictions": 0, "invalidations": 0}
+
+    def __str__(self) -> str:
+        return (
+            f"Session cache: {len(self.entries)} of {self.max_entries} reads, "
+            f"TTL {self.ttl:g}s, hit rate {self.hit_rate:.0%}."
+        )
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    @property
+    def hit_rate(self) -> float:
+        lookups = self.stats["hits"] + self.stats["misses"]
+        return self.stats["hits"] / lookups if lookups else 0.0
+
+    def _drop(self, key: Hashable) -> None:
+        _, _, session_id, owner_id = self.entries.pop(key)
+        for tags, tag in ((self.by_session, session_id), (self.by_owner, owner_id)):
+            if tag is not None and tag in tags:
+                tags[tag].discard(key)
+                if not tags[tag]:
+                    del tags[tag]
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        entry = self.entries.get(key)
+        if entry is None:
+            self.stats["misses"] += 1
+            return None
+        if entry[0] <= self.clock():
+            self._drop(key)
+            self.stats["expired"] += 1
+            self.stats["misses"] += 1
+            return None
+        self.entries.move_to_end(key)
+        self.stats["hits"] += 1
+        return copy.deepcopy(entry[1])
+
+    def put(
+        self,
+        key: Hashable,
+        value: Any,
+        session_id: Optional[str] = None,
+        owner_id: Optional[str] = None,
+        version: Optional[int] = None,
+    ) -> None:
+        if version is not None and version != self.version:
+            # A write finished while the value was read, it may be stale
+            return
+        if key in self.entries:
+            self._drop(key)
+        self.entries[key] = (self.clock() + self.ttl, copy.deepcopy(value), session_id, owner_id)
+        if session_id is not None:
+            self.by_session.setdefault(session_id, set()).add(key)
+        if owner_id is not None:
+            self.by_owner.setdefault(owner_id, set()).add(key)
+        while len(self.entries) > self.max_entries:
+            self._drop(next(iter(self.entries)))
+            self.stats["evictions"] += 1
+
+    def remember_owner(self, session_id: str, owner_id: Optional[str]) -> None:
+        if owner_id:
+            self.owners[session_id] = str(owner_id)
+
+    def invalidate_session(self, session_id: str, owner_id: Optional[str] = None, deleted: bool = False) -> None:
+        """Drop the reads of a session and the pages of its owner.
+
+        When the owner is not known every page is dropped, a page could list it.
+        """
+        self.version += 1
+        for key in list(self.by_session.get(session_id, ())):
+            self._drop(key)
+            self.stats["invalidations"] += 1
+        owner_id = str(owner_id) if owner_id else self.owners.get(session_id)
+        if deleted:
+            self.owners.pop(session_id, None)
+        owners = [owner_id] if owner_id else list(self.by_owner)
+        for owner in owners:
+            for key in list(self.by_owner.get(owner, ())):
+                self._drop(key)
+                self.stats["invalidations"] += 1
@@ -0,0 +1,59 @@
+import asyncio
+import copy
+import functools
+from typing import Any, Awaitable, Callable, Dict, Hashable, List
+
+
+class SingleFlight:
+    """Share one in-flight call between the concurrent callers with the same key.
+
+    The first caller starts the call in its own task and the others await the
+    same task, so a burst of identical reads is one request to the API. Nothing
+    is kept once the call finishes, so a later caller always gets a fresh
+    result. A caller that is cancelled does not cancel the call for the others.
+    A write forgets the calls it may have changed, so a later caller does not
+    join a call that started before the write.
+    """
+
+    def __init__(self):
+        self._calls: Dict[Hashable, Dict] = {}
+        self.stats = {"calls": 0, "executed": 0, "deduplicated": 0}
+
+    def __str__(self) -> str:
+        return (
+            f"Singleflight: {self.stats['deduplicated']} of {self.stats['calls']} calls "
+            f"deduplicated, {len(self._calls)} in flight."
+        )
+
+    def in_flight(self) -> List[Hashable]:
+        return list(self._calls)
+
+    def forget(self, key: Hashable) -> None:
+        """The call in flight for the key keeps running, but no new caller joins it."""
+        self._calls.pop(key, None)
+
+    def _done(self, key: Hashable, call: Dict, task: asyncio.Task) -> None:
+        if self._calls.get(key) is call:
+            del self._calls[key]
+        # Mark the exception as seen when every caller was cancelled
+        if not task.cancelled():
+            task.exception()
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[Any]]) -> Any:
+        """Await the result of fn(), or of the call already in flight for the key.
+
+        When the result is shared, each caller gets its own copy, so one of
+        them changing it does not change it for the others.
+        """
+        self.stats["calls"] += 1
+        call = self._calls.get(key)
+        if call is None:
+            task = asyncio.ensure_future(fn())
+            call = self._calls[key] = {"task": task, "callers": 1}
+            self.stats["executed"] += 1
+            task.add_done_callback(functools.partial(self._done, key, call))
+        else:
+            call["callers"] += 1
+            self.stats["deduplicated"] += 1
+        result = await asyncio.shield(call["task"])
+        return result if call["callers"] == 1 else copy.deepcopy(result)
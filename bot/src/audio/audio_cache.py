@@ -0,0 +1,206 @@
+"""Content addressed cache of the audio transcriptions.
+
+A transcription is keyed by the SHA-256 of the audio bytes, the Whisper model
+and the language, so the same episode uploaded twice, by anyone and under any
+file name, is only transcribed once. The hash is computed while the upload is
+streamed to disk, without reading the file again.
+
+Entries are JSON files with the transcript and its timestamped segments in
+files/transcriptions/cache, evicted least recently used above ``max_bytes``.
+With an S3 bucket the entries are also shared with the other bot instances.
+"""
+import asyncio
+import hashlib
+import json
+import os
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+import aiohttp
+
+CHUNK_SIZE = 1024 * 1024
+
+
+async def download(url: str, path: str, chunk_size: int = CHUNK_SIZE) -> Tuple[str, int]:
+    """Stream a file to disk, hashing it on the way.
+
+    Returns:
+        Tuple[str, int]: The SHA-256 hex digest and the size of the file.
+    """
+    digest = hashlib.sha256()
+    size = 0
+    async with aiohttp.ClientSession() as session:
+        async with session.get(url) as res:
+            res.raise_for_status()
+            with open(path, "wb") as f:
+                async for chunk in res.content.iter_chunked(chunk_size):
+                    digest.update(chunk)
+                    size += len(chunk)
+                    await asyncio.to_thread(f.write, chunk)
+    return digest.hexdigest(), size
+
+
+def cache_key(audio_hash: str, model_name: str, language: Optional[str] = None) -> str:
+    return f"{audio_hash}-{model_name}-{language or 'auto'}"
+
+
+class TranscriptionCache:
+    def __init__(
+        self,
+        directory: str,
+        max_bytes: int = 512 * 1024 * 1024,
+        s3_bucket: Optional[str] = None,
+        s3_prefix: str = "transcriptions/",
+        s3_client=None,
+    ):
+        """
+        Args:
+            directory (str): Folder of the cached entries.
+            max_bytes (int): Size of the local entries above which the least recently used are evicted.
+            s3_bucket (str): Bucket of the shared tier, none by default.
+            s3_prefix (str): Prefix of the shared entries in the bucket.
+        """
+        if max_bytes < 1:
+            raise ValueError("max_bytes should be greater than 0.")
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.s3_bucket = s3_bucket
+        self.s3_prefix = s3_prefix
+        self._s3 = s3_client
+        self.stats = {
+            "lookups": 0,
+            "hits": 0,
+            "shared_hits": 0,
+            "misses": 0,
+            "stores": 0,
+            "evictions": 0,
+            "bytes_saved": 0,
+            "seconds_saved": 0.0,
+        }
+
+        os.makedirs(directory, exist_ok=True)
+        # Entries by key with their size, least recently used first
+        self.entries: "OrderedDict[str, int]" = OrderedDict()
+        files = [name for name in os.listdir(directory) if name.endswith(".json")]
+        paths = [os.path.join(directory, name) for name in files]
+        for name, path in sorted(zip(files, paths), key=lambda entry: os.path.getmtime(entry[1])):
+            self.entries[name[: -len(".json")]] = os.path.getsize(path)
+        self._evict()
+
+    def __str__(self) -> str:
+        return (
+            f"Transcription cache: {len(self.entries)} transcripts, {self.size / 1024 / 1024:.1f} MB, "
+            f"hit rate {self.hit_rate:.0%}, {self.stats['bytes_saved'] / 1024 / 1024:.0f} MB of audio "
+            "not transcribed again."
+        )
+
+    @property
+    def size(self) -> int:
+        return sum(self.entries.values())
+
+    @property
+    def hit_rate(self) -> float:
+        lookups = self.stats["lookups"]
+        return (self.stats["hits"] + self.stats["shared_hits"]) / lookups if lookups else 0.0
+
+    @property
+    def s3(self):
+        if self._s3 is None:
+            import boto3
+
+            self._s3 = boto3.client("s3")
+        return self._s3
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, f"{key}.json")
+
+    def _read(self, key: str) -> Optional[Dict]:
+        try:
+            with open(self._path(key), encoding="utf-8") as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            self.entries.pop(key, None)
+            return None
+        # The modification time keeps the recency order across restarts
+        os.utime(self._path(key))
+        self.entries.move_to_end(key)
+        return entry
+
+    def _write(self, key: str, data: bytes) -> None:
+        path = self._path(key)
+        with open(f"{path}.tmp", "wb") as f:
+            f.write(data)
+        os.replace(f"{path}.tmp", path)
+        self.entries[key] = len(data)
+        self.entries.move_to_end(key)
+        self._evict(keep=key)
+
+    def _evict(self, keep: Optional[str] = None) -> None:
+        size = self.size
+        for key in list(self.entries):
+            if size <= self.max_bytes:
+                break
+            if key == keep:
+                continue
+            size -= self.entries.pop(key)
+            try:
+                os.remove(self._path(key))
+            except OSError:
+                pass
+            self.stats["evictions"] += 1
+
+    def _get_shared(self, key: str) -> Optional[bytes]:
+        try:
+            res = self.s3.get_object(Bucket=self.s3_bucket, Key=f"{self.s3_prefix}{key}.json")
+        except self.s3.exceptions.NoSuchKey:
+            return None
+        return res["Body"].read()
+
+    async def get(self, key: str, audio_bytes: int = 0) -> Optional[Dict]:
+        """Look up a transcription, locally and then in the shared tier.
+
+        Args:
+            key (str): Key from cache_key.
+            audio_bytes (int): Size of the audio, counted as saved on a hit.
+
+        Returns:
+            Optional[Dict]: The cached 'text', 'segments', 'language' and 'duration'.
+        """
+        self.stats["lookups"] += 1
+        entry = self._read(key) if key in self.entries else None
+        if entry is not None:
+            self.stats["hits"] += 1
+        elif self.s3_bucket:
+            try:
+                data = await asyncio.to_thread(self._get_shared, key)
+            except Exception as e:
+                print(f"Error reading the shared transcription cache: {e}")
+                data = None
+            if data is not None:
+                self._write(key, data)
+                entry = json.loads(data)
+                self.stats["shared_hits"] += 1
+
+        if entry is None:
+            self.stats["misses"] += 1
+            return None
+        self.stats["bytes_saved"] += audio_bytes
+        self.stats["seconds_saved"] += entry.get("duration", 0.0)
+        return entry
+
+    async def put(self, key: str, result: Dict) -> None:
+        entry = {name: result.get(name) for name in ("text", "segments", "language", "duration")}
+        data = json.dumps(entry, ensure_ascii=False).encode("utf-8")
+        await asyncio.to_thread(self._write, key, data)
+        self.stats["stores"] += 1
+        if self.s3_bucket:
+            try:
+                await asyncio.to_thread(
+                    self.s3.put_object,
+                    Bucket=self.s3_bucket,
+                    Key=f"{self.s3_prefix}{key}.json",
+                    Body=data,
+                    ContentType="application/json",
+                )
+            except Exception as e:
+                print(f"Error writing the shared transcription cache: {e}")
@@ -0,0 +1,255 @@
+"""Local Whisper transcription on CPU, in parallel over a process pool.
+
+The audio is decoded once, split at the quietest points near a target segment
+length and each segment is transcribed by a worker process with its own copy
+of the model. The segments are stitched back in order, with their timestamps
+shifted to the position of the segment in the episode.
+
+whisper and torch are only imported by the worker processes, the bot process
+decodes the audio with ffmpeg and only handles numpy arrays.
+"""
+import asyncio
+import multiprocessing
+import os
+import subprocess
+import tempfile
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+SAMPLE_RATE = 16000
+AUDIO_EXTENSIONS = (".mp3", ".wav", ".ogg", ".flac", ".m4a")
+
+# Model of the current worker process, loaded once by the pool initializer
+_model = None
+
+
+def load_audio(path: str, sample_rate: int = SAMPLE_RATE) -> np.ndarray:
+    """Decode an audio file to mono float32 samples, as whisper.load_audio does."""
+    cmd = [
+        "ffmpeg", "-nostdin", "-threads", "0", "-i", path,
+        "-f", "s16le", "-ac", "1", "-acodec", "pcm_s16le", "-ar", str(sample_rate), "-",
+    ]
+    try:
+        out = subprocess.run(cmd, capture_output=True, check=True).stdout
+    except FileNotFoundError:
+        raise RuntimeError("ffmpeg is required to decode the audio.")
+    except subprocess.CalledProcessError as e:
+        raise RuntimeError(f"Failed to load audio: {e.stderr.decode(errors='ignore')[-500:]}")
+    return np.frombuffer(out, np.int16).astype(np.float32) / 32768.0
+
+
+def frame_energy(samples: np.ndarray, frame: int) -> np.ndarray:
+    """RMS energy of consecutive frames of `frame` samples."""
+    count = len(samples) // frame
+    frames = samples[: count * frame].reshape(count, frame)
+    return np.sqrt(np.mean(frames * frames, axis=1))
+
+
+def split_on_silence(
+    samples: np.ndarray,
+    sample_rate: int = SAMPLE_RATE,
+    segment_seconds: float = 120.0,
+    search_seconds: float = 20.0,
+    frame_seconds: float = 0.03,
+    min_silence_seconds: float = 0.3,
+) -> List[Tuple[int, int]]:
+    """Split audio into segments of about `segment_seconds`, cutting in silences.
+
+    Each cut is searched within `search_seconds` around the target length: the
+    middle of the longest silence there, or the quietest frame when no silence
+    is long enough. Cutting in a pause keeps words whole at the edges.
+
+    Returns:
+        List[Tuple[int, int]]: The start and end sample of each segment, covering
+        all the audio.
+    """
+    total = len(samples)
+    segment = int(segment_seconds * sample_rate)
+    if total <= segment:
+        return [(0, total)] if total else []
+
+    frame = max(1, int(frame_seconds * sample_rate))
+    energy = frame_energy(samples, frame)
+    # Relative to the loudness of the episode, so the gain does not matter
+    threshold = max(np.percentile(energy, 10) * 2.0, 1e-4) if len(energy) else 0.0
+    silent = energy <= threshold
+    min_frames = max(1, int(min_silence_seconds / frame_seconds))
+    half = max(1, int(search_seconds * sample_rate / 2) // frame)
+
+    bounds = []
+    start = 0
+    # The last segment may run over the target as much as a cut could
+    while total - start > segment + half * frame:
+        target = (start + segment) // frame
+        lo = max(start // frame + 1, target - half)
+        hi = min(len(energy), target + half)
+        window = silent[lo:hi]
+        cut = None
+        best = 0
+        run = 0
+        for offset, is_silent in enumerate(window):
+            run = run + 1 if is_silent else 0
+            if run >= min_frames and run > best:
+                best = run
+                cut = lo + offset - run // 2
+        if cut is None:
+            cut = lo + int(np.argmin(energy[lo:hi])) if hi > lo else target
+        cut = cut * frame
+        if cut <= start:
+            cut = start + segment
+        bounds.append((start, cut))
+        start = cut
+    bounds.append((start, total))
+    return bounds
+
+
+def format_timestamp(seconds: float) -> str:
+    seconds = int(seconds)
+    return f"{seconds // 3600:02d}:{seconds // 60 % 60:02d}:{seconds % 60:02d}"
+
+
+def stitch_segments(results: List[Dict]) -> List[Dict]:
+    """Merge the transcribed segments of every part in order, with episode timestamps."""
+    segments = []
+    for result in sorted(results, key=lambda result: result["index"]):
+        offset = result["offset"]
+        for segment in result["segments"]:
+            text = segment["text"].strip()
+            if text:
+                segments.append(
+                    {"start": segment["start"] + offset, "end": segment["end"] + offset, "text": text}
+                )
+    return segments
+
+
+def format_transcription(segments: List[Dict]) -> str:
+    return "\n".join(f"[{format_timestamp(segment['start'])}] {segment['text']}" for segment in segments)
+
+
+def _init_worker(model_name: str, threads: int) -> None:
+    global _model
+    import torch
+    import whisper
+
+    # One model per process, the cores are shared between the workers
+    torch.set_num_threads(threads)
+    _model = whisper.load_model(model_name, device="cpu")
+
+
+def _transcribe_part(task: Tuple) -> Dict:
+    index, path, start, end, sample_rate, language, fp16 = task
+    # Each worker maps only its own slice of the decoded audio
+    samples = np.load(path, mmap_mode="r")[start:end]
+    result = _model.transcribe(np.ascontiguousarray(samples), language=language, fp16=fp16)
+    return {
+        "index": index,
+        "offset": start / sample_rate,
+        "language": result.get("language"),
+        "segments": [
+            {"start": float(segment["start"]), "end": float(segment["end"]), "text": segment["text"]}
+            for segment in result.get("segments", [])
+        ],
+    }
+
+
+class AudioTranscriber:
+    def __init__(
+        self,
+        model_name: str = "base",
+        workers: Optional[int] = None,
+        segment_seconds: float = 120.0,
+        executor: Optional[Executor] = None,
+    ):
+        """
+        Args:
+            model_name (str): Whisper model, e.g. tiny, base, small.
+            workers (int): Worker processes, one per core by default.
+            segment_seconds (float): Target length of the parts sent to the workers.
+            executor (Executor): Executor running the parts instead of the process pool.
+        """
+        self.model_name = model_name
+        self.workers = workers or os.cpu_count() or 1
+        self.segment_seconds = segment_seconds
+        self.executor = executor
+
+    def __str__(self) -> str:
+        return f"Audio: whisper {self.model_name} on {self.workers} CPU workers."
+
+    def _get_executor(self) -> Executor:
+        if self.executor is None:
+            threads = max(1, (os.cpu_count() or 1) // self.workers)
+            # Spawned workers, forking a process with running threads is unsafe for torch
+            self.executor = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_worker,
+                initargs=(self.model_name, threads),
+            )
+        return self.executor
+
+    def _segment_length(self, samples: np.ndarray) -> float:
+        # At least a part per worker for short audio, never below whisper's 30s window
+        duration = len(samples) / SAMPLE_RATE
+        return max(30.0, min(self.segment_seconds, duration / self.workers))
+
+    def _tasks(self, samples: np.ndarray, path: str, language: Optional[str], fp16: bool) -> List[Tuple]:
+        bounds = split_on_silence(samples, SAMPLE_RATE, self._segment_length(samples))
+        return [
+            (index, path, start, end, SAMPLE_RATE, language, fp16)
+            for index, (start, end) in enumerate(bounds)
+        ]
+
+    def _result(self, results: List[Dict], samples: np.ndarray, started: float) -> Dict:
+        segments = stitch_segments(results)
+        languages = [result["language"] for result in results if result.get("language")]
+        duration = len(samples) / SAMPLE_RATE
+        elapsed = time.perf_counter() - started
+        return {
+            "text": format_transcription(segments),
+            "segments": segments,
+            "language": max(set(languages), key=languages.count) if languages else None,
+            "duration": duration,
+            "parts": len(results),
+            "elapsed": elapsed,
+            "real_time_factor": elapsed / duration if duration else 0.0,
+        }
+
+    def transcribe_samples(self, samples: np.ndarray, language: Optional[str] = None, fp16: bool = False) -> Dict:
+        """Transcribe decoded 16kHz mono samples, blocking until every part is done.
+
+        Returns:
+            Dict: The timestamped 'text', its 'segments', the detected 'language',
+            the 'duration' of the audio and the 'elapsed' seconds.
+        """
+        started = time.perf_counter()
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "samples.npy")
+            np.save(path, samples)
+            results = list(self._get_executor().map(_transcribe_part, self._tasks(samples, path, language, fp16)))
+        return self._result(results, samples, started)
+
+    def transcribe(self, audio_path: str, language: Optional[str] = None, fp16: bool = False) -> Dict:
+        return self.transcribe_samples(load_audio(audio_path), language, fp16)
+
+    async def transcript_async(self, audio_path: str, language: Optional[str] = None, fp16: bool = False) -> Dict:
+        """Same as transcribe, without blocking the event loop."""
+        started = time.perf_counter()
+        samples = await asyncio.to_thread(load_audio, audio_path)
+        loop = asyncio.get_running_loop()
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, "samples.npy")
+            await asyncio.to_thread(np.save, path, samples)
+            tasks = await asyncio.to_thread(self._tasks, samples, path, language, fp16)
+            executor = self._get_executor()
+            results = await asyncio.gather(
+                *[loop.run_in_executor(executor, _transcribe_part, task) for task in tasks]
+            )
+        return self._result(results, samples, started)
+
+    async def close(self) -> None:
+        if self.executor is not None:
+            await asyncio.to_thread(self.executor.shutdown)
+            self.executor = None
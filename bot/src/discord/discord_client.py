@@ -1,9 +1,27 @@
+import io
+import time
 import discord
+from typing import AsyncIterator, Awaitable, Callable, Dict, List, Optional, Tuple
 from discord.ext import commands
 from discord import Interaction, Intents, Message
 
+from src.discord.discord_scheduler import OutboundScheduler, pack_messages, split_message
+
+
+def render_conversation(messages: List[Dict], title: str) -> io.BytesIO:
+    """Write the conversation as Markdown into an in-memory file, message by message."""
+    buffer = io.BytesIO()
+    buffer.write(f"# {title}\n\n".encode("utf-8"))
+    for message in messages:
+        buffer.write(f"## {message['role'].capitalize()}\n\n{message['content']}\n\n".encode("utf-8"))
+    buffer.seek(0)
+    return buffer
+
 
 class DiscordSender:
+    def __init__(self, scheduler: Optional[OutboundScheduler] = None):
+        self.scheduler = scheduler or OutboundScheduler()
+
     async def send_message(
         self, interaction: Interaction, user_id: str, receive: str, message: str
     ):
@@ -18,27 +36,199 @@ class DiscordSender:
         """
         try:
             print(f"{user_id} request: {receive}, response: {message}")
+            await self._send_chunks(interaction, split_message(message))
+        except Exception as e:
+            print(f"Error sending message: {e}")
+
+    @staticmethod
+    def _route(interaction: Interaction) -> Tuple[str, int]:
+        # The followups of an interaction share the rate limit of its webhook
+        return ("webhook", getattr(interaction, "id", id(interaction)))
+
+    async def _send_chunks(self, interaction: Interaction, chunks: List[str]) -> None:
+        async def send_chunk(chunk):
+            if interaction.response.is_done():
+                await interaction.followup.send(chunk)
+            else:
+                await interaction.response.send_message(chunk)
+                # Once the initial response is sent, further messages should be follow-ups
+                interaction.response._responded = True
+
+        await self.scheduler.send(self._route(interaction), send_chunk, chunks)
+
+    async def send_replay(
+        self,
+        interaction: Interaction,
+        user_id: str,
+        receive: str,
+        messages: List[Dict],
+        title: str,
+        max_messages: int = 5,
+    ) -> int:
+        """
+        Replay the answers of a restored conversation in as few messages as possible.
+
+        The answers are packed into messages of up to 2000 characters. When they
+        need more than `max_messages`, the whole conversation is sent instead as
+        one Markdown attachment, so a restore takes a few API calls whatever the
+        number of turns.
+
+        Args:
+            interaction (Interaction): The deferred Discord interaction object.
+            user_id (str): ID of the user who initiated the interaction.
+            receive (str): The message received from the user.
+            messages (List[Dict]): The messages of the conversation, without the prompt.
+            title (str): Title of the attachment.
+            max_messages (int): Most messages to send before switching to an attachment.
 
-            # Function to send message chunks
-            async def send_chunks(chunks):
-                for chunk in chunks:
-                    if interaction.response.is_done():
-                        await interaction.followup.send(chunk)
-                    else:
-                        await interaction.response.send_message(chunk)
-                        # Once the initial response is sent, further messages should be follow-ups
-                        interaction.response._responded = True
-
-            # Split message into chunks of 2000 characters
-            chunk_size = 2000
-            message_chunks = [
-                message[i:i + chunk_size] for i in range(0, len(message), chunk_size)
-            ]
-
-            # Send all chunks
-            await send_chunks(message_chunks)
+        Returns:
+            int: The number of messages sent.
+        """
+        answers = [m["content"] for m in messages if m["role"] == "assistant" and m.get("content")]
+        packed = pack_messages(answers)
+        try:
+            if len(packed) <= max_messages:
+                print(f"{user_id} request: {receive}, replayed {len(answers)} answers in {len(packed)} messages")
+                await self._send_chunks(interaction, packed)
+                return len(packed)
+            print(f"{user_id} request: {receive}, replayed {len(messages)} messages as an attachment")
+            filename = "".join(c if c.isalnum() else "-" for c in title).strip("-").lower() or "conversation"
+            await self.scheduler.call(
+                self._route(interaction),
+                # A new file on each attempt, a retried send would find the first one read
+                lambda: interaction.followup.send(
+                    f"The conversation has {len(messages)} messages, here it is as a file.",
+                    file=discord.File(render_conversation(messages, title), filename=f"{filename}.md"),
+                ),
+            )
+            return 1
         except Exception as e:
             print(f"Error sending message: {e}")
+            return 0
+
+    async def send_stream(
+        self,
+        interaction: Interaction,
+        user_id: str,
+        receive: str,
+        deltas: AsyncIterator[str],
+        edit_interval: float = 1.0,
+        chunk_size: int = 2000,
+    ) -> str:
+        """
+        Progressively send a streamed response by editing a followup message.
+
+        Edits are throttled to one every `edit_interval` seconds to stay within the
+        Discord rate limits. When the text grows over `chunk_size` characters the
+        message is finalized and the rest continues in a new followup message.
+
+        Args:
+            interaction (Interaction): The deferred Discord interaction object.
+            user_id (str): ID of the user who initiated the interaction.
+            receive (str): The message received from the user.
+            deltas (AsyncIterator[str]): The response text as it is generated.
+
+        Returns:
+            str: The complete response text.
+        """
+        full_text = []
+        pending = ""
+        message = None
+        published = ""
+        last_edit = 0.0
+        route = self._route(interaction)
+
+        async def publish(content: str, current):
+            nonlocal published
+            if not content or (current is not None and content == published):
+                return current
+            if current is None:
+                current = await self.scheduler.call(route, lambda: interaction.followup.send(content, wait=True))
+            else:
+                await self.scheduler.call(route, lambda: current.edit(content=content))
+            published = content
+            return current
+
+        try:
+            async for delta in deltas:
+                full_text.append(delta)
+                pending += delta
+                while len(pending) > chunk_size:
+                    # Prefer to roll over on a line break rather than mid-sentence
+                    cut = pending.rfind("\n", chunk_size // 2, chunk_size)
+                    cut = cut if cut > 0 else chunk_size
+                    await publish(pending[:cut], message)
+                    pending = pending[cut:].lstrip("\n")
+                    message = None
+                    last_edit = time.monotonic()
+                if time.monotonic() - last_edit >= edit_interval:
+                    message = await publish(pending, message)
+                    last_edit = time.monotonic()
+            await publish(pending, message)
+        finally:
+            print(f"{user_id} request: {receive}, streamed response: {''.join(full_text)}")
+        return "".join(full_text)
+
+    async def send_pages(
+        self,
+        interaction: Interaction,
+        user_id: str,
+        receive: str,
+        pages: AsyncIterator[Tuple[str, bool]],
+    ) -> None:
+        """
+        Send the next page of a paginated response, with a 'More' button if there are more.
+
+        Args:
+            interaction (Interaction): The deferred Discord interaction object.
+            user_id (str): ID of the user who initiated the interaction.
+            receive (str): The message received from the user.
+            pages (AsyncIterator[Tuple[str, bool]]): The text of each page and whether
+                another page follows. A page is only fetched when it is requested.
+        """
+        try:
+            text, has_more = await pages.__anext__()
+        except StopAsyncIteration:
+            return
+        except Exception as e:
+            return await self.send_message(interaction, user_id, receive, str(e))
+
+        if not has_more:
+            return await self.send_message(interaction, user_id, receive, text)
+        print(f"{user_id} request: {receive}, response: {text}")
+        view = DiscordPager(self, user_id, receive, pages)
+        await self.scheduler.call(self._route(interaction), lambda: interaction.followup.send(text[:2000], view=view))
+
+
+class DiscordPager(discord.ui.View):
+    """A 'More' button that sends the next page of a paginated response on demand."""
+
+    def __init__(
+        self,
+        sender: "DiscordSender",
+        user_id: str,
+        receive: str,
+        pages: AsyncIterator[Tuple[str, bool]],
+        timeout: float = 300,
+    ):
+        super().__init__(timeout=timeout)
+        self.sender = sender
+        self.user_id = user_id
+        self.receive = receive
+        self.pages = pages
+
+    async def interaction_check(self, interaction: Interaction) -> bool:
+        # Only the user who ran the command can page through the results
+        return interaction.user.id == self.user_id
+
+    @discord.ui.button(label="More", style=discord.ButtonStyle.secondary)
+    async def more(self, interaction: Interaction, button: discord.ui.Button):
+        button.disabled = True
+        self.stop()
+        await self.sender.scheduler.call(
+            self.sender._route(interaction), lambda: interaction.response.edit_message(view=self)
+        )
+        await self.sender.send_pages(interaction, self.user_id, self.receive, self.pages)
 
 
 class DiscordClient(commands.Bot):
@@ -53,6 +243,10 @@ class DiscordClient(commands.Bot):
         usage: list,
         copyright: list,
         command_prefix="!",
+        startup_hooks: Optional[List[Callable[[], Awaitable]]] = None,
+        shutdown_hooks: Optional[List[Callable[[], Awaitable]]] = None,
+        scheduler: Optional[OutboundScheduler] = None,
+        welcome_cooldown: float = 600.0,
     ) -> None:
         super().__init__(intents=intents, command_prefix=command_prefix)
         self.guild_id = guild_id
@@ -62,6 +256,11 @@ class DiscordClient(commands.Bot):
         self.name = name
         self.usage = usage
         self.copyright = copyright
+        self.startup_hooks = startup_hooks or []
+        self.shutdown_hooks = shutdown_hooks or []
+        self.scheduler = scheduler or OutboundScheduler()
+        # Seconds before the welcome text is sent again to the same channel
+        self.welcome_cooldown = welcome_cooldown
         self.activity = discord.Activity(
             type=discord.ActivityType.watching, name=self.name
         )
@@ -84,6 +283,19 @@ class DiscordClient(commands.Bot):
         ]
         return default_message
 
+    async def setup_hook(self):
+        # Runs once after login, before connecting to the websocket
+        for hook in self.startup_hooks:
+            await hook()
+
+    async def close(self):
+        for hook in self.shutdown_hooks:
+            try:
+                await hook()
+            except Exception as e:
+                print(f"Error running shutdown hook: {e}")
+        await super().close()
+
     async def on_ready(self):
         for guild in self.guilds:
             if guild.id == self.guild_id:
@@ -102,13 +314,19 @@ class DiscordClient(commands.Bot):
         if message.author == self.user:
             return
 
-        if self.is_channel_allowed(str(message.channel.id)) is False:
-            return await message.channel.send(
-                "You're not allowed to use this command in this channel."
-            )
+        channel = message.channel
+        route = ("channel", channel.id)
+        if self.is_channel_allowed(str(channel.id)) is False:
+            if self.scheduler.cooldown(("not_allowed", channel.id), self.welcome_cooldown):
+                await self.scheduler.send(
+                    route, channel.send, ["You're not allowed to use this command in this channel."]
+                )
+            return
 
-        for msg in self.get_default_message():
-            await message.channel.send(msg)
+        if self.scheduler.cooldown(("welcome", channel.id), self.welcome_cooldown):
+            # The lines are coalesced into as few messages as fit
+            lines = [piece for line in self.get_default_message() for piece in split_message(line)]
+            await self.scheduler.send(route, channel.send, lines)
 
     def is_channel_allowed(self, channel: str) -> bool:
         return channel == self.guild_channel
@@ -0,0 +1,281 @@
+import asyncio
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Dict, Hashable, List, Optional, Tuple
+
+import discord
+
+MESSAGE_LIMIT = 2000
+# Sends per period of the Discord routes: channel messages and interaction webhooks
+ROUTE_LIMITS = {"channel": (5, 5.0), "webhook": (5, 2.0)}
+
+
+def split_message(text: str, limit: int = MESSAGE_LIMIT) -> List[str]:
+    """Split a message in pieces of at most `limit` characters.
+
+    A piece ends on the last line break of its second half, or the last space,
+    so words and lines are only cut when there is no other way.
+    """
+    pieces = []
+    while len(text) > limit:
+        cut = text.rfind("\n", limit // 2, limit)
+        if cut <= 0:
+            cut = text.rfind(" ", limit // 2, limit)
+        cut = cut if cut > 0 else limit
+        pieces.append(text[:cut])
+        text = text[cut:].lstrip("\n ") if cut < limit else text[cut:]
+    if text:
+        pieces.append(text)
+    return pieces
+
+
+def pack_messages(texts: List[str], limit: int = MESSAGE_LIMIT, separator: str = "\n\n") -> List[str]:
+    """Pack the texts, in order, into as few messages of at most `limit` characters as possible."""
+    packed, current = [], ""
+    for text in texts:
+        for piece in split_message(text, limit):
+            if current and len(current) + len(separator) + len(piece) <= limit:
+                current = f"{current}{separator}{piece}"
+            else:
+                if current:
+                    packed.append(current)
+                current = piece
+    if current:
+        packed.append(current)
+    return packed
+
+
+def rate_limit_headers(headers) -> Tuple[Optional[int], Optional[float]]:
+    """The remaining sends and the seconds until the bucket resets, from Discord's headers."""
+    try:
+        remaining = int(headers["X-RateLimit-Remaining"])
+    except (KeyError, TypeError, ValueError):
+        remaining = None
+    for name in ("X-RateLimit-Reset-After", "Retry-After"):
+        try:
+            return remaining, float(headers[name])
+        except (KeyError, TypeError, ValueError):
+            continue
+    return remaining, None
+
+
+class TokenBucket:
+    """Allows `capacity` sends per `period`, refilled continuously."""
+
+    def __init__(self, capacity: int, period: float, clock: Callable[[], float] = time.monotonic):
+        self.capacity = capacity
+        self.rate = capacity / period
+        self.clock = clock
+        self.tokens = float(capacity)
+        self.updated = clock()
+        self.blocked_until = 0.0
+
+    def _refill(self) -> float:
+        now = self.clock()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        return now
+
+    def delay(self) -> float:
+        """Seconds until a send is allowed."""
+        now = self._refill()
+        wait = max(0.0, (1 - self.tokens) / self.rate)
+        return max(wait, self.blocked_until - now)
+
+    def take(self) -> None:
+        self._refill()
+        self.tokens -= 1
+
+    def idle(self) -> bool:
+        """True once the bucket is full again, it is then the same as a new one."""
+        now = self._refill()
+        return self.tokens >= self.capacity and self.blocked_until <= now
+
+    def update(self, remaining: Optional[int], reset_after: Optional[float]) -> None:
+        """Trust the server over the local estimate."""
+        now = self._refill()
+        if remaining is not None:
+            self.tokens = min(self.tokens, float(remaining))
+        if reset_after is not None and (remaining is None or remaining == 0):
+            self.tokens = min(self.tokens, 0.0)
+            self.blocked_until = max(self.blocked_until, now + reset_after)
+
+
+class OutboundScheduler:
+    """Queue of the outbound Discord messages, one token bucket per route.
+
+    Each channel and each interaction webhook is a route with its own queue,
+    drained by one task that waits for the bucket of the route instead of
+    running into a 429. Small messages that are waiting on the same route are
+    coalesced into one message of at most 2000 characters. Other calls, such
+    as edits and sends with a file, wait for the same bucket with ``call``. A
+    429 pauses the route for the time in the headers and the call is made
+    again. The routes are dropped once idle, each interaction is a new one.
+
+    discord.py does not expose the headers of successful responses, so the
+    buckets start from the documented limits of the routes and are corrected
+    by the headers of the rate limited responses.
+    """
+
+    def __init__(
+        self,
+        limits: Optional[Dict[str, Tuple[int, float]]] = None,
+        max_attempts: int = 3,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.limits = {**ROUTE_LIMITS, **(limits or {})}
+        self.max_attempts = max_attempts
+        self.clock = clock
+        self.buckets: Dict[Hashable, TokenBucket] = {}
+        self.queues: Dict[Hashable, Deque] = {}
+        self._workers: Dict[Hashable, asyncio.Task] = {}
+        # Key -> time until which the notice is skipped
+        self._cooldowns: Dict[Hashable, float] = {}
+        self.stats = {
+            "queued": 0,
+            "sent": 0,
+            "failed": 0,
+            "coalesced": 0,
+            "rate_limited": 0,
+            "suppressed": 0,
+            "max_depth": 0,
+            "wait_total": 0.0,
+            "max_wait": 0.0,
+        }
+
+    def __str__(self) -> str:
+        return (
+            f"Outbound: {self.depth} queued in {len(self.queues)} routes, {self.stats['sent']} sent, "
+            f"{self.stats['coalesced']} coalesced, {self.stats['rate_limited']} rate limited, "
+            f"average wait {self.average_wait:.2f}s."
+        )
+
+    @property
+    def depth(self) -> int:
+        return sum(len(queue) for queue in self.queues.values())
+
+    @property
+    def average_wait(self) -> float:
+        messages = self.stats["sent"] + self.stats["coalesced"]
+        return self.stats["wait_total"] / messages if messages else 0.0
+
+    def _bucket(self, route: Tuple[str, Hashable]) -> TokenBucket:
+        bucket = self.buckets.get(route)
+        if bucket is None:
+            self._prune()
+            capacity, period = self.limits[route[0]]
+            bucket = self.buckets[route] = TokenBucket(capacity, period, self.clock)
+        return bucket
+
+    def _prune(self) -> None:
+        # A route with nothing queued and a full bucket is the same as a new one
+        for route in [route for route, bucket in self.buckets.items() if route not in self.queues and bucket.idle()]:
+            del self.buckets[route]
+
+    def cooldown(self, key: Hashable, seconds: float) -> bool:
+        """True at most once every `seconds` for the key, to skip repeated notices."""
+        now = self.clock()
+        until = self._cooldowns.get(key)
+        if until is not None and now < until:
+            self.stats["suppressed"] += 1
+            return False
+        if until is None:
+            for expired in [key for key, until in self._cooldowns.items() if until <= now]:
+                del self._cooldowns[expired]
+        self._cooldowns[key] = now + seconds
+        return True
+
+    def _enqueue(self, route: Tuple[str, Hashable], entries: List[Tuple]) -> None:
+        self.queues.setdefault(route, deque()).extend(entries)
+        self.stats["queued"] += len(entries)
+        self.stats["max_depth"] = max(self.stats["max_depth"], self.depth)
+        if route not in self._workers:
+            self._workers[route] = asyncio.create_task(self._drain(route))
+
+    async def send(
+        self, route: Tuple[str, Hashable], send: Callable[[str], Awaitable], messages: List[str]
+    ) -> None:
+        """Queue the messages on the route and wait until they are sent.
+
+        Args:
+            route (Tuple[str, Hashable]): The kind of route, 'channel' or
+                'webhook', and the id of the channel or interaction.
+            send (Callable[[str], Awaitable]): Sends one message to the route.
+            messages (List[str]): Messages of at most 2000 characters.
+        """
+        loop = asyncio.get_running_loop()
+        entries = [(send, message, loop.create_future(), self.clock()) for message in messages if message]
+        self._enqueue(route, entries)
+        await asyncio.gather(*[entry[2] for entry in entries])
+
+    async def call(self, route: Tuple[str, Hashable], call: Callable[[], Awaitable]) -> Any:
+        """Make one call on the route, such as an edit, and return its result.
+
+        The call waits for the bucket of the route like the messages do, but it
+        is never coalesced with them.
+        """
+        future = asyncio.get_running_loop().create_future()
+        self._enqueue(route, [(call, None, future, self.clock())])
+        return await future
+
+    def _next_batch(self, queue: Deque) -> Tuple[Callable, Optional[str], List]:
+        send, content, future, queued_at = queue.popleft()
+        batch = [(future, queued_at)]
+        while (
+            content is not None
+            and queue
+            and queue[0][1] is not None
+            and len(content) + 1 + len(queue[0][1]) <= MESSAGE_LIMIT
+        ):
+            _, message, future, queued_at = queue.popleft()
+            content = f"{content}\n{message}"
+            batch.append((future, queued_at))
+        return send, content, batch
+
+    async def _drain(self, route: Tuple[str, Hashable]) -> None:
+        queue = self.queues[route]
+        bucket = self._bucket(route)
+        try:
+            while queue:
+                send, content, batch = self._next_batch(queue)
+                error, result = None, None
+                for _ in range(self.max_attempts):
+                    delay = bucket.delay()
+                    if delay > 0:
+                        await asyncio.sleep(delay)
+                    bucket.take()
+                    try:
+                        result = await (send() if content is None else send(content))
+                        error = None
+                        break
+                    except discord.RateLimited as e:
+                        error = e
+                        self.stats["rate_limited"] += 1
+                        bucket.update(0, e.retry_after)
+                    except discord.HTTPException as e:
+                        error = e
+                        if e.status != 429:
+                            break
+                        self.stats["rate_limited"] += 1
+                        remaining, reset_after = rate_limit_headers(getattr(e.response, "headers", {}))
+                        bucket.update(remaining, reset_after or 1.0)
+                    except Exception as e:
+                        error = e
+                        break
+
+                now = self.clock()
+                self.stats["sent" if error is None else "failed"] += 1
+                self.stats["coalesced"] += len(batch) - 1
+                for future, queued_at in batch:
+                    wait = now - queued_at
+                    self.stats["wait_total"] += wait
+                    self.stats["max_wait"] = max(self.stats["max_wait"], wait)
+                    if not future.done():
+                        if error is None:
+                            future.set_result(result)
+                        else:
+                            future.set_exception(error)
+        finally:
+            del self._workers[route]
+            if not queue:
+                del self.queues[route]
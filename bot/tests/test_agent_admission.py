@@ -0,0 +1,79 @@
+import asyncio
+
+import pytest
+
+from src.agent.agent_admission import AdmissionController, AdmissionRejected
+
+
+async def request(controller, user_id, log, seconds=0.02):
+    async with controller.admit(user_id):
+        log.append(user_id)
+        await asyncio.sleep(seconds)
+
+
+@pytest.mark.asyncio
+async def test_limits_the_requests_in_progress():
+    controller = AdmissionController(max_concurrency=3, per_user=2, per_user_queue=10)
+    running, peak, peak_user = [], [0], [0]
+
+    async def work(user_id):
+        async with controller.admit(user_id):
+            running.append(user_id)
+            peak[0] = max(peak[0], len(running))
+            peak_user[0] = max(peak_user[0], running.count("a"))
+            await asyncio.sleep(0.01)
+            running.remove(user_id)
+
+    await asyncio.gather(*[work(user) for user in "aaaaaabbcc"])
+    assert peak[0] == 3
+    assert peak_user[0] == 2
+    assert controller.running == 0 and not controller.waiting and not controller.in_flight
+    assert controller.stats["completed"] == 10
+
+
+@pytest.mark.asyncio
+async def test_a_busy_user_does_not_delay_the_others():
+    controller = AdmissionController(max_concurrency=2, per_user=2, per_user_queue=8)
+    log = []
+    spam = [asyncio.create_task(request(controller, "spammer", log)) for _ in range(8)]
+    await asyncio.sleep(0)
+    polite = asyncio.create_task(request(controller, "polite", log))
+    await asyncio.gather(*spam, polite)
+    # Two of the spammer were running, the polite user goes right after one of them
+    assert log.index("polite") <= 3
+
+
+@pytest.mark.asyncio
+async def test_overflow_is_rejected_with_a_retry_after():
+    controller = AdmissionController(max_concurrency=1, per_user=1, max_queue=3, per_user_queue=2)
+    log = []
+    tasks = [asyncio.create_task(request(controller, "a", log, 0.05)) for _ in range(3)]
+    await asyncio.sleep(0)
+    with pytest.raises(AdmissionRejected) as error:
+        await request(controller, "a", log)
+    assert error.value.retry_after > 0
+    assert "try again in" in str(error.value)
+
+    tasks.append(asyncio.create_task(request(controller, "b", log, 0.05)))
+    await asyncio.sleep(0)
+    with pytest.raises(AdmissionRejected):
+        await request(controller, "c", log)
+    assert controller.stats["rejected"] == 2
+    assert controller.queue_length == 3
+    await asyncio.gather(*tasks)
+    assert controller.wait_percentile(0.95) >= 0.05
+
+
+@pytest.mark.asyncio
+async def test_cancelled_requests_leave_the_queue():
+    controller = AdmissionController(max_concurrency=1, per_user=1)
+    log = []
+    first = asyncio.create_task(request(controller, "a", log, 0.05))
+    await asyncio.sleep(0)
+    waiting = asyncio.create_task(request(controller, "b", log))
+    await asyncio.sleep(0)
+    assert controller.queue_length == 1
+    waiting.cancel()
+    await asyncio.gather(first, waiting, return_exceptions=True)
+    assert log == ["a"]
+    assert controller.queue_length == 0 and controller.running == 0
@@ -0,0 +1,99 @@
+import pytest
+
+from src.agent.agent_context import ContextWindow, MESSAGE_OVERHEAD_TOKENS
+
+PROMPT = {"role": "assistant", "content": "prompt"}
+
+
+def word_counter(text):
+    return len(text.split())
+
+
+def build_history(turns):
+    messages = [PROMPT]
+    for i in range(turns):
+        messages.append({"role": "user", "content": f"question {i}", "user_id": "1"})
+        messages.append({"role": "assistant", "content": f"answer {i}"})
+    return messages
+
+
+@pytest.mark.asyncio
+async def test_small_history_is_sent_unchanged():
+    window = ContextWindow(max_tokens=1000, token_counter=word_counter)
+    messages = build_history(2)
+    sent, summary, stats = await window.build(messages)
+    assert sent == [{"role": m["role"], "content": m["content"]} for m in messages]
+    assert stats["saved_tokens"] == 0
+    assert summary["summarized_count"] == 0
+
+
+@pytest.mark.asyncio
+async def test_older_turns_are_dropped_without_summarizer():
+    # Every message costs 1 (role) + 2 (content) + overhead tokens
+    per_message = 3 + MESSAGE_OVERHEAD_TOKENS
+    window = ContextWindow(max_tokens=2 + MESSAGE_OVERHEAD_TOKENS + per_message * 4, token_counter=word_counter)
+    messages = build_history(5)
+    sent, summary, stats = await window.build(messages)
+    assert sent[0]["content"] == "prompt"
+    assert [m["content"] for m in sent[1:]] == ["question 3", "answer 3", "question 4", "answer 4"]
+    assert stats["saved_tokens"] == per_message * 6
+    assert summary["summarized_count"] == 6
+
+
+@pytest.mark.asyncio
+async def test_older_turns_are_folded_into_rolling_summary():
+    calls = []
+
+    async def summarize(summary, messages):
+        calls.append([m["content"] for m in messages])
+        return (summary + " " + " ".join(m["content"] for m in messages)).strip()
+
+    window = ContextWindow(max_tokens=60, token_counter=word_counter, summarize=summarize)
+    messages = build_history(6)
+    sent, summary, _ = await window.build(messages)
+    assert sent[1]["role"] == "system"
+    assert "question 0" in sent[1]["content"]
+    assert sent[-1]["content"] == "answer 5"
+
+    # The next turn only folds messages that are not in the summary yet
+    messages += [{"role": "user", "content": "question 6"}, {"role": "assistant", "content": "answer 6"}]
+    _, next_summary, _ = await window.build(messages, summary)
+    assert next_summary["summarized_count"] > summary["summarized_count"]
+    assert calls[1][0] == messages[1 + summary["summarized_count"]]["content"]
+
+
+@pytest.mark.asyncio
+async def test_failed_summary_is_retried_on_a_later_turn():
+    async def summarize(summary, messages):
+        raise Exception("Internal server error.")
+
+    window = ContextWindow(max_tokens=60, token_counter=word_counter, summarize=summarize)
+    messages = build_history(6)
+    previous = {"summary": "earlier", "summarized_count": 2}
+    sent, summary, stats = await window.build(messages, previous)
+    assert summary == previous
+    assert stats["folded_messages"] == 0
+    # The window stays in budget, the turns are not sent and not marked as summarized
+    assert stats["sent_tokens"] <= 60
+    assert sent[-1]["content"] == "answer 5" and len(sent) < len(messages)
+
+
+@pytest.mark.asyncio
+async def test_last_message_is_always_sent():
+    window = ContextWindow(max_tokens=5, token_counter=word_counter)
+    messages = [PROMPT, {"role": "user", "content": "a very long transcript " * 20}]
+    sent, _, _ = await window.build(messages)
+    assert sent[-1]["content"] == messages[-1]["content"]
+
+
+def test_token_counts_are_cached():
+    calls = []
+
+    def counter(text):
+        calls.append(text)
+        return 1
+
+    window = ContextWindow(token_counter=counter)
+    window.count({"role": "user", "content": "hello"})
+    window.count({"role": "user", "content": "hello"})
+    assert len(calls) == 2
@@ -0,0 +1,109 @@
+import asyncio
+
+import pytest
+
+from src.agent.agent_memory import InMemoryDB, ShardedMemoryDB
+
+PROMPT = [{"role": "assistant", "content": "You are a podcast assistant."}]
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_inmemory_remove_keeps_assistant_prompt():
+    memory = InMemoryDB(assistant_prompt=PROMPT)
+    memory.append("1", {"role": "user", "content": "hi"})
+    memory.remove()
+    assert memory.get()["messages"] == PROMPT
+    assert PROMPT == [{"role": "assistant", "content": "You are a podcast assistant."}]
+
+
+def test_sessions_are_isolated_per_user():
+    memory = ShardedMemoryDB(assistant_prompt=PROMPT)
+    memory.append("1", {"role": "user", "content": "from one"})
+    memory.append("2", {"role": "user", "content": "from two"})
+
+    first = memory.get("1")
+    second = memory.get("2")
+    assert first["session_id"] != second["session_id"]
+    assert [m["content"] for m in first["messages"]][1:] == ["from one"]
+    assert [m["content"] for m in second["messages"]][1:] == ["from two"]
+
+
+def test_sessions_per_channel():
+    memory = ShardedMemoryDB(assistant_prompt=PROMPT, per_channel=True)
+    memory.append("1", {"role": "user", "content": "a"}, channel_id="10")
+    memory.append("1", {"role": "user", "content": "b"}, channel_id="20")
+    assert len(memory.get("1", "10")["messages"]) == 2
+    assert len(memory.get("1", "20")["messages"]) == 2
+
+
+@pytest.mark.asyncio
+async def test_lru_eviction_flushes_session():
+    flushed = []
+
+    async def flush(session_id, messages, metadata):
+        flushed.append((session_id, [m["content"] for m in messages], metadata))
+
+    memory = ShardedMemoryDB(assistant_prompt=PROMPT, max_sessions=2, flush_session=flush)
+    memory.append("1", {"role": "user", "content": "one"})
+    evicted_id = memory.get("1")["session_id"]
+    memory.append("2", {"role": "user", "content": "two"})
+    memory.append("3", {"role": "user", "content": "three"})
+    await memory.flush_all()
+
+    assert memory.evictions == 3
+    assert flushed[0][0] == evicted_id
+    assert flushed[0][1][1:] == ["one"]
+    assert flushed[0][2]["user_id"] == "1"
+
+
+@pytest.mark.asyncio
+async def test_idle_ttl_expires_sessions():
+    clock = FakeClock()
+    flushed = []
+
+    async def flush(session_id, messages, metadata):
+        flushed.append(session_id)
+
+    memory = ShardedMemoryDB(assistant_prompt=PROMPT, idle_ttl=60, flush_session=flush, clock=clock)
+    memory.append("1", {"role": "user", "content": "hi"})
+    memory.get("2")
+    clock.now = 61
+    assert memory.sweep() == 2
+    await asyncio.sleep(0)
+    # Only sessions with messages beyond the assistant prompt are flushed
+    assert len(flushed) == 1
+    assert memory.sessions == {}
+
+
+@pytest.mark.asyncio
+async def test_locked_sessions_are_not_evicted():
+    memory = ShardedMemoryDB(assistant_prompt=PROMPT, max_sessions=1)
+    async with memory.lock("1"):
+        memory.get("2")
+        assert list(memory.sessions) == ["1", "2"]
+    memory.get("3")
+    assert list(memory.sessions) == ["3"]
+
+
+@pytest.mark.asyncio
+async def test_restored_sessions_are_only_flushed_with_new_turns():
+    flushed = []
+
+    async def flush(session_id, messages, metadata):
+        flushed.append([m["content"] for m in messages])
+
+    memory = ShardedMemoryDB(assistant_prompt=PROMPT, flush_session=flush)
+    saved = PROMPT + [{"role": "user", "content": "hi"}, {"role": "assistant", "content": "hello"}]
+    memory.restore(list(saved), "1")
+    memory.restore(list(saved), "2")
+    memory.append("2", {"role": "user", "content": "again"})
+    await memory.flush_all()
+
+    assert flushed == [[m["content"] for m in saved] + ["again"]]
@@ -0,0 +1,260 @@
+import pytest
+
+from src.agent.agent_memory import ShardedMemoryDB
+from src.agent.agent_podcast import PodcastAgent
+
+PROMPT = [{"role": "assistant", "content": "You analyze podcasts."}]
+
+
+class FakeServerless:
+    def __init__(self):
+        self.calls = []
+        self.server_sessions = {}
+
+    async def chat_completion(self, messages):
+        self.calls.append(("chat_completion", list(messages)))
+        answer = {"role": "assistant", "content": f"answer {len(messages)}"}
+        return {"context": "fake", "last_message": answer, "memory": messages + [answer], "memory_count": len(messages) + 1}
+
+    async def chat_completion_session(self, session_id, message, prefix=None, prompt_content=None):
+        self.calls.append(("chat_completion_session", session_id, message, prefix, prompt_content))
+        history = self.server_sessions.setdefault(session_id, [])
+        history += prefix or []
+        answer = {"role": "assistant", "content": f"answer {len(history) + 1}"}
+        history += [message, answer]
+        return {"context": "fake", "session_id": session_id, "last_message": answer, "memory_count": len(history)}
+
+    async def save_session(self, session_id, messages, metadata):
+        self.calls.append(("save_session", session_id))
+        return {"pk": f"SESSION#{session_id}"}
+
+    async def get_all_session(self, owner_id, cursor=None, limit=None):
+        self.calls.append(("get_all_session", owner_id, cursor, limit))
+        start = int(cursor or 0)
+        sessions = [{"pk": f"SESSION#{i}"} for i in range(start, min(start + limit, 5))]
+        next_cursor = str(start + limit) if start + limit < 5 else None
+        return {"sessions": sessions, "cursor": next_cursor}
+
+    async def update_session_metadata(self, session_id, metadata):
+        self.calls.append(("update_session_metadata", session_id))
+        if session_id not in self.server_sessions:
+            return {"status": "error", "message": "Internal server error."}
+        return {"message": "Session metadata updated successfully"}
+
+
+@pytest.fixture
+def serverless():
+    return FakeServerless()
+
+
+def build_agent(serverless, tmp_path, **kwargs):
+    return PodcastAgent(serverless, ShardedMemoryDB(assistant_prompt=PROMPT), str(tmp_path), **kwargs)
+
+
+@pytest.mark.asyncio
+async def test_full_history_mode_sends_every_message(serverless, tmp_path):
+    agent = build_agent(serverless, tmp_path)
+    await agent.get_response("1", "first")
+    await agent.get_response("1", "second")
+    assert len(serverless.calls[-1][1]) == 4
+
+
+@pytest.mark.asyncio
+async def test_server_history_mode_sends_only_the_new_message(serverless, tmp_path):
+    agent = build_agent(serverless, tmp_path, server_history=True)
+    last_message, _, _, memory_count = await agent.get_response("1", "first")
+    await agent.get_response("1", "second")
+
+    first, second = serverless.calls
+    assert first[2] == {"role": "user", "content": "first"}
+    assert first[3] == PROMPT
+    assert second[2] == {"role": "user", "content": "second"}
+    assert second[3] is None
+    assert first[1] == second[1]
+    assert memory_count == 3
+
+
+@pytest.mark.asyncio
+async def test_server_history_save_only_updates_metadata(serverless, tmp_path):
+    agent = build_agent(serverless, tmp_path, server_history=True)
+    await agent.get_response("1", "first")
+    await agent.save_session("1")
+    assert serverless.calls[-1][0] == "update_session_metadata"
+
+    # A session without turns does not exist server-side yet
+    await agent.save_session("1")
+    assert [call[0] for call in serverless.calls[-2:]] == ["update_session_metadata", "save_session"]
+
+
+@pytest.mark.asyncio
+async def test_server_history_sends_the_turns_added_by_the_bot(serverless, tmp_path):
+    agent = build_agent(serverless, tmp_path, server_history=True)
+    await agent.add_transcription("1", "[00:00:00] Welcome to the show.")
+    await agent.get_response("1", "first")
+    prefix = serverless.calls[-1][3]
+    assert prefix[0] == PROMPT[0]
+    assert prefix[1]["content"].endswith("Welcome to the show.")
+    assert len(prefix) == 3
+
+    await agent.add_transcription("1", "[00:00:00] The second episode.")
+    _, _, _, memory_count = await agent.get_response("1", "second")
+    assert [msg["role"] for msg in serverless.calls[-1][3]] == ["user", "assistant"]
+    assert serverless.calls[-1][3][0]["content"].endswith("The second episode.")
+    assert memory_count == 9
+
+    await agent.get_response("1", "third")
+    assert serverless.calls[-1][3] is None
+    session_id = serverless.calls[-1][1]
+    assert len(serverless.server_sessions[session_id]) == len(agent.memory.get("1")["messages"])
+
+
+@pytest.mark.asyncio
+async def test_semantic_cache_hits_across_turns_and_users(serverless, tmp_path):
+    from src.agent.agent_embeddings import HashingEmbedding
+    from src.agent.agent_semantic_cache import SemanticCache
+
+    cache = SemanticCache(HashingEmbedding(), threshold=0.7)
+    agent = build_agent(serverless, tmp_path, semantic_cache=cache)
+    transcript = "\n".join(f"[00:{m:02d}:00] Guest: minute {m} of the show." for m in range(60))
+
+    await agent.add_transcription("1", transcript)
+    first, _, _, _ = await agent.get_response("1", "what were the main points of the podcast")
+    await agent.get_response("1", "tell me more about it")
+    again, _, _, _ = await agent.get_response("1", "What were the main points of this podcast?")
+    await agent.add_transcription("2", transcript)
+    other, _, _, _ = await agent.get_response("2", "what were the main points of the podcast")
+
+    assert again["content"] == other["content"] == first["content"]
+    assert [call[0] for call in serverless.calls] == ["chat_completion"] * 2
+    # The follow-up is not even embedded
+    assert (cache.stats["lookups"], cache.stats["hits"]) == (3, 2)
+
+
+@pytest.mark.asyncio
+async def test_iter_sessions_fetches_pages_on_demand(serverless, tmp_path):
+    agent = build_agent(serverless, tmp_path)
+    pages = agent.iter_sessions("1", page_size=2)
+
+    first = await pages.__anext__()
+    assert [s["pk"] for s in first["sessions"]] == ["SESSION#0", "SESSION#1"]
+    assert len(serverless.calls) == 1
+
+    rest = [page async for page in pages]
+    assert [len(page["sessions"]) for page in rest] == [2, 1]
+    assert [call[2] for call in serverless.calls] == [None, "2", "4"]
+
+
+@pytest.mark.asyncio
+async def test_transcription_is_shared_with_the_conversation(serverless, tmp_path):
+    agent = build_agent(serverless, tmp_path)
+    assert "Audio" not in str(agent)
+    await agent.add_transcription("1", "[00:00:00] Welcome to the show.")
+    messages = agent.memory.get("1")["messages"]
+    assert messages[-2]["role"] == "user" and messages[-2]["content"].endswith("Welcome to the show.")
+    assert messages[-1]["role"] == "assistant"
+
+    with pytest.raises(ValueError):
+        await agent.get_transcriptions_async("episode.mp3")
+
+
+@pytest.mark.asyncio
+async def test_cached_transcription_skips_the_transcriber(serverless, tmp_path):
+    from src.audio.audio_cache import TranscriptionCache
+
+    class Transcriber:
+        model_name = "base"
+        calls = 0
+
+        async def transcript_async(self, audio_path, language=None, fp16=False):
+            self.calls += 1
+            return {"text": "[00:00:00] Hi.", "segments": [], "language": "en", "duration": 60.0, "elapsed": 9.0}
+
+    audio = Transcriber()
+    cache = TranscriptionCache(str(tmp_path / "cache"))
+    agent = build_agent(serverless, tmp_path, audio=audio, transcription_cache=cache)
+    first = await agent.get_transcriptions_async("a.mp3", audio_hash="abc", audio_bytes=10)
+    second = await agent.get_transcriptions_async("b.mp3", audio_hash="abc", audio_bytes=10)
+    assert (first["cached"], second["cached"]) == (False, True)
+    assert second["text"] == first["text"] and audio.calls == 1
+    assert cache.stats["bytes_saved"] == 10
+
+
+@pytest.mark.asyncio
+async def test_summarize_uses_the_last_transcription(serverless, tmp_path):
+    from src.agent.agent_summarizer import TranscriptSummarizer
+
+    summarizer = TranscriptSummarizer(serverless, count_tokens=lambda text: len(text.split()))
+    agent = build_agent(serverless, tmp_path, summarizer=summarizer)
+    with pytest.raises(ValueError):
+        await agent.summarize_transcription("1")
+
+    await agent.add_transcription("1", "[00:00:00] Welcome to the show.")
+    summary, stats = await agent.summarize_transcription("1")
+    assert stats["requests"] == 1
+    assert serverless.calls[-1][1][-1]["content"] == "[00:00:00] Welcome to the show."
+    assert agent.memory.get("1")["messages"][-1]["content"] == summary
+
+
+@pytest.mark.asyncio
+async def test_retrieval_sends_excerpts_instead_of_the_transcription(serverless, tmp_path):
+    from src.agent.agent_embeddings import HashingEmbedding
+    from src.agent.agent_retrieval import TranscriptIndex
+
+    def count_words(text):
+        return len(text.split())
+
+    sent = []
+    for minutes in (30, 120):
+        index = TranscriptIndex(HashingEmbedding(), str(tmp_path / "index"), chunk_tokens=50, top_k=3, count_tokens=count_words)
+        agent = build_agent(serverless, tmp_path, retrieval=index)
+        lines = [f"[00:{m:02d}:00] Guest: minute {m} talks about topic number {m % 7}" for m in range(minutes)]
+        await agent.add_transcription(str(minutes), "\n".join(lines))
+        await agent.get_response(str(minutes), "what about topic number 3")
+
+        messages = serverless.calls[-1][1]
+        assert messages[-1]["content"].startswith("Excerpts of the transcription:")
+        assert messages[-1]["content"].endswith("Question: what about topic number 3")
+        sent.append(sum(count_words(message["content"]) for message in messages))
+        # The stored question is the plain one
+        assert agent.memory.get(str(minutes))["messages"][-2]["content"] == "what about topic number 3"
+        assert agent.last_transcription(str(minutes)) == "\n".join(lines)
+    # The same input size for an episode four times longer
+    assert abs(sent[1] - sent[0]) < 20
+
+    # With the history stored server-side only the prompt carries the excerpts
+    agent = build_agent(serverless, tmp_path, retrieval=index, server_history=True)
+    await agent.add_transcription("1", "\n".join(lines))
+    await agent.get_response("1", "what about topic number 3")
+    _, session_id, message, _, prompt_content = serverless.calls[-1]
+    assert message == {"role": "user", "content": "what about topic number 3"}
+    assert prompt_content.startswith("Excerpts of the transcription:")
+    assert serverless.server_sessions[session_id][-2] == message
+
+
+@pytest.mark.asyncio
+async def test_saved_and_deleted_sessions_update_the_search_index(serverless, tmp_path):
+    from src.agent.agent_search import SessionSearch
+
+    async def get_session(session_id):
+        return {"messages": PROMPT + [{"role": "user", "content": "old talk about whales"}], "metadata": {"title": "Old"}}
+
+    async def delete_session(session_id):
+        return {"message": "Session deleted"}
+
+    serverless.get_session = get_session
+    serverless.delete_session = delete_session
+    search = SessionSearch(str(tmp_path / "search" / "sessions.json.gz"))
+    agent = build_agent(serverless, tmp_path, search=search)
+
+    await agent.get_response("1", "tell me about dolphins")
+    session_id = agent.memory.get("1")["session_id"]
+    await agent.save_session("1")
+    results = await agent.search_sessions("1", "dolphins")
+    assert [result["session_id"] for result in results] == [session_id]
+    # The sessions saved before the index were added on the first search
+    assert len(await agent.search_sessions("1", "whales")) == 5
+    assert "You analyze podcasts" not in search.docs[session_id]["text"]
+
+    await agent.delete_session(session_id)
+    assert await agent.search_sessions("1", "dolphins") == []
+    assert len(SessionSearch(search.path)) == 5
@@ -0,0 +1,58 @@
+import pytest
+
+from src.agent.agent_embeddings import HashingEmbedding
+from src.agent.agent_retrieval import TranscriptIndex
+
+TOPICS = ["bitcoin mining energy", "football world cup final", "sourdough bread baking", "mars rover landing"]
+
+
+def count_words(text: str) -> int:
+    return len(text.split())
+
+
+def transcript(minutes: int) -> str:
+    lines = []
+    for minute in range(minutes):
+        topic = TOPICS[minute * len(TOPICS) // minutes]
+        lines.append(f"[00:{minute:02d}:00] Host: today we talk about {topic} and why {topic} matters")
+    return "\n".join(lines)
+
+
+class CountingEmbedding(HashingEmbedding):
+    def __init__(self):
+        super().__init__()
+        self.texts = 0
+
+    async def embed(self, texts):
+        self.texts += len(texts)
+        return self.embed_sync(texts)
+
+
+@pytest.mark.asyncio
+async def test_transcripts_are_embedded_once_and_persisted(tmp_path):
+    embedding = CountingEmbedding()
+    index = TranscriptIndex(embedding, str(tmp_path), chunk_tokens=40, overlap_tokens=10, count_tokens=count_words)
+    text = transcript(40)
+    transcript_id = await index.add(text)
+    embedded = embedding.texts
+    assert embedded > 4
+    assert await index.add(text) == transcript_id
+    assert embedding.texts == embedded
+
+    # A new index, as after a restart, reads the saved vectors
+    reloaded = TranscriptIndex(embedding, str(tmp_path), chunk_tokens=40, count_tokens=count_words)
+    assert await reloaded.add(text) == transcript_id
+    assert embedding.texts == embedded
+    assert reloaded.load(transcript_id)["text"] == text
+
+
+@pytest.mark.asyncio
+async def test_search_returns_the_relevant_chunks_in_episode_order(tmp_path):
+    index = TranscriptIndex(HashingEmbedding(), str(tmp_path), chunk_tokens=40, overlap_tokens=0, top_k=2, count_tokens=count_words)
+    transcript_id = await index.add(transcript(40))
+    excerpts = await index.search(transcript_id, "how much energy does bitcoin mining use")
+    assert len(excerpts) == 2
+    assert all("bitcoin" in chunk for chunk, _ in excerpts)
+    assert excerpts[0][0] < excerpts[1][0]
+    with pytest.raises(ValueError):
+        await index.search("missing", "question")
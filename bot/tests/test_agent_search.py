@@ -0,0 +1,71 @@
+import time
+
+import pytest
+
+from src.agent.agent_search import SessionSearch, tokenize
+
+
+def messages(*contents):
+    return [{"role": "user" if i % 2 == 0 else "assistant", "content": content} for i, content in enumerate(contents)]
+
+
+@pytest.fixture
+def search(tmp_path):
+    index = SessionSearch(str(tmp_path / "sessions.json.gz"))
+    index.add("bitcoin", "1", messages("What did they say about bitcoin mining?", "Mining uses a lot of energy."), {"title": "Crypto episode"})
+    index.add("bread", "1", messages("How long does sourdough need?", "The dough rests overnight."), {"title": "Baking"})
+    index.add("energy", "1", messages("Is solar energy cheaper now?", "Solar energy got much cheaper."), {"title": "Energy"})
+    index.add("other", "2", messages("Bitcoin bitcoin bitcoin"), {"title": "Someone else"})
+    return index
+
+
+def test_tokenize_drops_stopwords_and_punctuation():
+    assert tokenize("What is the Energy, of Bitcoin?") == ["energy", "bitcoin"]
+
+
+def test_search_ranks_the_sessions_of_the_user(search):
+    results = search.search("1", "bitcoin energy")
+    # The energy session repeats the term and has it in the title
+    assert [result["session_id"] for result in results] == ["energy", "bitcoin"]
+    results = search.search("1", "bitcoin")
+    assert [result["session_id"] for result in results] == ["bitcoin"]
+    assert "bitcoin" in results[0]["snippet"].lower()
+    assert results[0]["title"] == "Crypto episode"
+    assert search.search("1", "the of") == []
+    assert search.search("3", "bitcoin") == []
+
+
+def test_updates_and_deletes_are_incremental(search):
+    search.add("bread", "1", messages("Bitcoin and bread"), {"title": "Baking"})
+    assert {result["session_id"] for result in search.search("1", "bitcoin")} == {"bitcoin", "bread"}
+    assert search.search("1", "sourdough") == []
+
+    assert search.remove("bitcoin")
+    assert not search.remove("bitcoin")
+    assert [result["session_id"] for result in search.search("1", "bitcoin")] == ["bread"]
+
+    search.clear("bread")
+    assert search.search("1", "bitcoin") == []
+    assert [result["session_id"] for result in search.search("1", "baking")] == ["bread"]
+    assert "mining" not in search.postings
+
+
+@pytest.mark.asyncio
+async def test_index_is_persisted_and_reloaded(search):
+    await search.flush()
+    reloaded = SessionSearch(search.path)
+    assert len(reloaded) == len(search)
+    assert reloaded.postings == search.postings
+    assert reloaded.search("1", "solar") == search.search("1", "solar")
+
+
+def test_search_takes_milliseconds(tmp_path):
+    index = SessionSearch(str(tmp_path / "sessions.json.gz"))
+    words = [f"word{i}" for i in range(2000)]
+    for i in range(1000):
+        text = " ".join(words[(i * 7 + j * 13) % len(words)] for j in range(200))
+        index.add(str(i), "1", messages(text), {"title": f"Session {i}"})
+    started = time.perf_counter()
+    results = index.search("1", "word10 word500 word1999")
+    assert results
+    assert time.perf_counter() - started < 0.1
@@ -0,0 +1,60 @@
+import pytest
+
+from src.agent.agent_embeddings import HashingEmbedding
+from src.agent.agent_semantic_cache import SemanticCache
+
+PROMPT = {"role": "assistant", "content": "You analyze podcasts."}
+TRANSCRIPT = {"role": "user", "content": "transcript " * 300}
+
+
+@pytest.fixture
+def cache():
+    return SemanticCache(HashingEmbedding(), threshold=0.7, max_entries=2)
+
+
+@pytest.mark.asyncio
+async def test_similar_question_in_same_context_hits(cache):
+    fingerprint = cache.fingerprint([PROMPT, TRANSCRIPT])
+    answer, vector = await cache.lookup("what were the main points of the podcast", fingerprint)
+    assert answer is None
+    cache.store(fingerprint, "The main points are...", vector)
+
+    answer, _ = await cache.lookup("what were the main points of this podcast?", fingerprint)
+    assert answer == "The main points are..."
+    assert cache.stats["hits"] == 1
+    assert cache.hit_rate == 0.5
+
+
+@pytest.mark.asyncio
+async def test_other_context_or_question_misses(cache):
+    fingerprint = cache.fingerprint([PROMPT, TRANSCRIPT])
+    _, vector = await cache.lookup("what were the main points of the podcast", fingerprint)
+    cache.store(fingerprint, "The main points are...", vector)
+
+    other = cache.fingerprint([PROMPT, {"role": "user", "content": "another episode " * 300}])
+    assert (await cache.lookup("what were the main points of the podcast", other))[0] is None
+    assert (await cache.lookup("who was the guest", fingerprint))[0] is None
+
+
+def test_short_dialogue_does_not_change_fingerprint(cache):
+    dialogue = [{"role": "user", "content": "hi"}, {"role": "assistant", "content": "hello"}]
+    assert cache.fingerprint([PROMPT, TRANSCRIPT]) == cache.fingerprint([PROMPT, TRANSCRIPT, *dialogue])
+    # A transcription kept in a retrieval index is not in the messages
+    assert cache.fingerprint([PROMPT], context_id="a") != cache.fingerprint([PROMPT], context_id="b")
+
+
+def test_follow_up_questions_are_not_standalone(cache):
+    assert cache.is_standalone("What were the main points of the podcast?")
+    assert not cache.is_standalone("Can you tell me more about it?")
+    assert not cache.is_standalone("what did they say about AI")
+
+
+@pytest.mark.asyncio
+async def test_least_recently_used_answer_is_evicted(cache):
+    for question in ["first question", "second question", "third question"]:
+        _, vector = await cache.lookup(question, "f")
+        cache.store("f", question, vector)
+    assert len(cache) == 2
+    assert cache.stats["evictions"] == 1
+    assert (await cache.lookup("first question", "f"))[0] is None
+    assert (await cache.lookup("third question", "f"))[0] == "third question"
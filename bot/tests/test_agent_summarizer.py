@@ -0,0 +1,69 @@
+import asyncio
+
+import pytest
+
+from src.agent.agent_summarizer import TranscriptSummarizer
+
+
+def count_words(text: str) -> int:
+    return len(text.split())
+
+
+class SummaryAPI:
+    def __init__(self, answer_chars: int = 200):
+        self.answer_chars = answer_chars
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.inputs = []
+
+    async def chat_completion(self, messages):
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        await asyncio.sleep(0.01)
+        self.in_flight -= 1
+        self.inputs.append(messages[-1]["content"])
+        return {"last_message": {"role": "assistant", "content": "Summary sentence. " * (self.answer_chars // 18)}}
+
+
+def transcript(lines: int) -> str:
+    return "\n".join(f"[00:{i // 60:02d}:{i % 60:02d}] Host: line {i} about the topic of the episode" for i in range(lines))
+
+
+def test_chunks_are_bounded_and_overlap():
+    summarizer = TranscriptSummarizer(SummaryAPI(), chunk_tokens=100, overlap_tokens=20, count_tokens=count_words)
+    chunks = summarizer.split(transcript(100))
+    assert len(chunks) > 1
+    assert all(sum(count_words(line) + 1 for line in chunk.splitlines()) <= 100 for chunk in chunks)
+    for previous, chunk in zip(chunks, chunks[1:]):
+        assert chunk.splitlines()[0] in previous.splitlines()
+    assert chunks[0].splitlines()[0].endswith("line 0 about the topic of the episode")
+    assert chunks[-1].splitlines()[-1] == transcript(100).splitlines()[-1]
+
+
+def test_line_longer_than_a_chunk_is_cut_between_words():
+    summarizer = TranscriptSummarizer(SummaryAPI(), chunk_tokens=10, overlap_tokens=2, count_tokens=count_words)
+    chunks = summarizer.split(" ".join(["word"] * 35))
+    assert all(count_words(chunk) <= 10 for chunk in chunks) and len(chunks) == 4
+
+
+@pytest.mark.asyncio
+async def test_map_reduce_respects_the_concurrency_and_the_length():
+    api = SummaryAPI(answer_chars=400)
+    summarizer = TranscriptSummarizer(api, chunk_tokens=100, overlap_tokens=10, concurrency=3, max_chars=300, count_tokens=count_words)
+    summary, stats = await summarizer.summarize(transcript(400))
+
+    assert stats["chunks"] > 20 and stats["levels"] >= 2
+    assert api.max_in_flight == 3
+    assert len(summary) <= 300 and summary.endswith(".")
+    # Every request fits the chunk budget
+    assert all(count_words(content) <= 120 for content in api.inputs)
+
+
+@pytest.mark.asyncio
+async def test_short_transcript_is_one_request():
+    api = SummaryAPI()
+    summarizer = TranscriptSummarizer(api, count_tokens=count_words)
+    _, stats = await summarizer.summarize(transcript(10))
+    assert stats == {"chunks": 1, "levels": 0, "requests": 1, "elapsed": pytest.approx(0.01, abs=0.5)}
+    with pytest.raises(ValueError):
+        await summarizer.summarize("\n\n")
@@ -0,0 +1,136 @@
+import asyncio
+import hashlib
+import os
+
+import pytest
+import pytest_asyncio
+from aiohttp import web
+
+from src.api.api_multipart_upload import FileSource, MultipartUploader, UploadError, UrlSource
+
+PART_SIZE = 5 * 1024 * 1024
+
+
+class FakeS3:
+    """Serves the presigned part URLs and a ranged source, like S3 and the Discord CDN."""
+
+    def __init__(self, source: bytes):
+        self.source = source
+        self.uploads = {}
+        self.puts = 0
+        self.fail_parts = set()
+        self.max_in_flight = 0
+        self.in_flight = 0
+        self.stored = asyncio.Condition()
+
+    async def put_part(self, request):
+        upload_id, part_number = request.match_info["upload_id"], int(request.match_info["part"])
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            data = await request.read()
+        finally:
+            self.in_flight -= 1
+        if part_number in self.fail_parts:
+            # Fail once every other part is stored, so none of them is in flight
+            parts = -(-len(self.source) // PART_SIZE)
+            async with self.stored:
+                await self.stored.wait_for(lambda: len(self.uploads[upload_id]) == parts - len(self.fail_parts))
+            return web.Response(status=400)
+        self.puts += 1
+        etag = f'"{hashlib.md5(data).hexdigest()}"'
+        self.uploads[upload_id][part_number] = (etag, data)
+        async with self.stored:
+            self.stored.notify_all()
+        return web.Response(headers={"ETag": etag})
+
+    async def get_source(self, request):
+        start, end = request.http_range.start, request.http_range.stop
+        return web.Response(status=206, body=self.source[start:end])
+
+
+class FakeServerless:
+    def __init__(self, s3: FakeS3, base_url: str):
+        self.s3 = s3
+        self.base_url = base_url
+        self.completed = {}
+
+    def urls(self, upload_id, part_numbers):
+        return [{"part_number": n, "url": f"{self.base_url}/s3/{upload_id}/{n}"} for n in part_numbers]
+
+    async def create_multipart_upload(self, key, size, part_size=None, content_type=None):
+        upload_id = f"upload-{len(self.s3.uploads)}"
+        self.s3.uploads[upload_id] = {}
+        count = -(-size // part_size)
+        # Only some of the parts are presigned upfront
+        return {"upload_id": upload_id, "part_size": part_size, "part_count": count, "parts": self.urls(upload_id, range(1, min(count, 2) + 1))}
+
+    async def get_multipart_upload(self, upload_id, key, parts):
+        if upload_id not in self.s3.uploads:
+            return {"status": "error", "message": "Internal server error."}
+        uploaded = self.s3.uploads[upload_id]
+        done = [{"part_number": n, "etag": etag, "size": len(data)} for n, (etag, data) in sorted(uploaded.items())]
+        return {"uploaded": done, "parts": self.urls(upload_id, [n for n in range(1, parts + 1) if n not in uploaded])}
+
+    async def complete_multipart_upload(self, upload_id, key, parts):
+        uploaded = self.s3.uploads.pop(upload_id)
+        assert [part["etag"] for part in parts] == [uploaded[part["part_number"]][0] for part in parts]
+        self.completed[key] = b"".join(uploaded[part["part_number"]][1] for part in parts)
+        return {"keyFile": key}
+
+    async def abort_multipart_upload(self, upload_id, key):
+        self.s3.uploads.pop(upload_id, None)
+        return {"keyFile": key, "aborted": True}
+
+
+@pytest_asyncio.fixture
+async def server():
+    s3 = FakeS3(os.urandom(PART_SIZE * 4 + 123))
+    app = web.Application(client_max_size=PART_SIZE * 2)
+    app.router.add_put("/s3/{upload_id}/{part}", s3.put_part)
+    app.router.add_get("/episode.wav", s3.get_source)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    base_url = f"http://127.0.0.1:{site._server.sockets[0].getsockname()[1]}"
+    yield s3, FakeServerless(s3, base_url), base_url
+    await runner.cleanup()
+
+
+@pytest.mark.asyncio
+async def test_parts_are_uploaded_in_parallel_from_ranged_reads(server, tmp_path):
+    s3, serverless, base_url = server
+    uploader = MultipartUploader(serverless, str(tmp_path), concurrency=3, part_size=PART_SIZE)
+    res = await uploader.upload(UrlSource(f"{base_url}/episode.wav"), "audio/episode.wav", len(s3.source))
+    await uploader.close()
+
+    assert serverless.completed["audio/episode.wav"] == s3.source
+    assert (res["parts"], res["resumed"]) == (5, 0)
+    assert 1 < s3.max_in_flight <= 3
+    assert uploader.pending() == []
+
+
+@pytest.mark.asyncio
+async def test_interrupted_upload_resumes_from_the_finished_parts(server, tmp_path):
+    s3, serverless, _ = server
+    path = tmp_path / "episode.wav"
+    path.write_bytes(s3.source)
+    uploader = MultipartUploader(serverless, str(tmp_path / "state"), concurrency=2, part_size=PART_SIZE, max_attempts=1)
+
+    s3.fail_parts = {5}
+    with pytest.raises(UploadError):
+        await uploader.upload(FileSource(str(path)), "audio/episode.wav", len(s3.source))
+    assert [state["key"] for state in uploader.pending()] == ["audio/episode.wav"]
+    assert s3.puts == 4
+    await uploader.close()
+
+    s3.fail_parts = set()
+    # A new uploader, as after a restart of the bot
+    uploader = MultipartUploader(serverless, str(tmp_path / "state"), concurrency=2, part_size=PART_SIZE)
+    res = await uploader.upload(FileSource(str(path)), "audio/episode.wav", len(s3.source))
+    await uploader.close()
+
+    assert serverless.completed["audio/episode.wav"] == s3.source
+    assert res["resumed"] == 4 and s3.puts == 5
+    assert uploader.pending() == []
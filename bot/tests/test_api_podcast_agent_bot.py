@@ -0,0 +1,243 @@
+import asyncio
+import json
+
+import pytest
+import pytest_asyncio
+from aiohttp import web
+from aiohttp.test_utils import TestServer
+
+from src.api.api_podcast_agent_bot import PodcastAgentBotAPI
+
+
+@pytest_asyncio.fixture
+async def server():
+    peers = []
+    reads = []
+
+    async def ask(request):
+        peers.append(request.transport.get_extra_info("peername"))
+        return web.json_response({"last_message": {"role": "assistant", "content": "ok"}})
+
+    async def sessions(request):
+        reads.append(request.path_qs)
+        await asyncio.sleep(0.05)
+        if request.headers.get("x-api-key") != "secret":
+            return web.json_response({}, status=403)
+        page = {"sessions": [{"pk": "SESSION#1", "owner_id": request.query["owner_id"]}], "cursor": None}
+        if request.query.get("cursor"):
+            page["sessions"][0]["pk"] = f"SESSION#{request.query['cursor']}"
+        return web.json_response(page)
+
+    async def session(request):
+        reads.append(request.path_qs)
+        await asyncio.sleep(0.05)
+        if request.match_info["session_id"] == "missing":
+            return web.json_response({}, status=404)
+        return web.json_response({"messages": [{"role": "user", "content": "hi"}], "metadata": {"read": len(reads)}})
+
+    async def ask_stream(request):
+        response = web.StreamResponse(headers={"Content-Type": "application/x-ndjson"})
+        await response.prepare(request)
+        for delta in ["Hel", "lo"]:
+            await response.write((json.dumps({"type": "delta", "content": delta}) + "\n").encode())
+        if (await request.json())["messages"][-1]["content"] == "truncated":
+            await response.write(b'{"type": "delta", "cont\n')
+        done = {"type": "done", "last_message": {"role": "assistant", "content": "Hello"}}
+        await response.write((json.dumps(done) + "\n").encode())
+        await response.write_eof()
+        return response
+
+    async def batch(request):
+        body = await request.json()
+        action = request.match_info["action"]
+        return web.json_response({action: body["session_ids"], "not_found": [], "failed": []})
+
+    app = web.Application()
+    app.router.add_post("/sessions/batch/{action}", batch)
+    app.router.add_post("/gpt/ask", ask)
+    app.router.add_post("/gpt/ask/stream", ask_stream)
+    app.router.add_get("/sessions/", sessions)
+    app.router.add_get("/sessions/{session_id}", session)
+    server = TestServer(app)
+    await server.start_server()
+    server.peers = peers
+    server.reads = reads
+    yield server
+    await server.close()
+
+
+def build_api(server, pooled, stream=False):
+    base_url = str(server.make_url("")).rstrip("/")
+    return PodcastAgentBotAPI(
+        api_base_url=base_url,
+        api_key_value="secret",
+        api_key_header="x-api-key",
+        pooled=pooled,
+        stream_url=base_url if stream else None,
+    )
+
+
+@pytest.mark.asyncio
+async def test_pooled_session_reuses_connection(server):
+    async with build_api(server, pooled=True) as api:
+        for _ in range(3):
+            res = await api.chat_completion([{"role": "user", "content": "hi"}])
+            assert res["last_message"]["content"] == "ok"
+    assert len(set(server.peers)) == 1
+
+
+@pytest.mark.asyncio
+async def test_per_call_session_opens_new_connections(server):
+    api = build_api(server, pooled=False)
+    for _ in range(3):
+        await api.chat_completion([{"role": "user", "content": "hi"}])
+    assert len(set(server.peers)) == 3
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("pooled", [True, False])
+async def test_request_timeout_of_the_session_applies(server, pooled):
+    api = PodcastAgentBotAPI(
+        api_base_url=str(server.make_url("")).rstrip("/"),
+        api_key_value="secret",
+        api_key_header="x-api-key",
+        pooled=pooled,
+        request_timeout=0.01,
+    )
+    try:
+        res = await asyncio.wait_for(api.get_session("1"), timeout=1)
+    finally:
+        await api.close()
+    assert res == {"status": "error", "message": "Request timed out. Please try again."}
+
+
+@pytest.mark.asyncio
+async def test_api_key_header_is_sent(server):
+    async with build_api(server, pooled=True) as api:
+        page = await api.get_all_session(42)
+        assert page == {"sessions": [{"pk": "SESSION#1", "owner_id": "42"}], "cursor": None}
+
+
+@pytest.mark.asyncio
+async def test_get_all_session_sends_the_cursor(server):
+    async with build_api(server, pooled=True) as api:
+        page = await api.get_all_session("42", cursor="abc", limit=5)
+        assert page["sessions"][0]["pk"] == "SESSION#abc"
+
+
+@pytest.mark.asyncio
+async def test_close_is_idempotent(server):
+    api = build_api(server, pooled=True)
+    await api.open()
+    await api.close()
+    await api.close()
+    assert api._session is None
+
+
+@pytest.mark.asyncio
+async def test_chat_completion_stream_yields_events(server):
+    async with build_api(server, pooled=True, stream=True) as api:
+        events = [e async for e in api.chat_completion_stream([{"role": "user", "content": "hi"}])]
+    assert [e["content"] for e in events if e["type"] == "delta"] == ["Hel", "lo"]
+    assert events[-1]["last_message"]["content"] == "Hello"
+
+
+@pytest.mark.asyncio
+async def test_chat_completion_stream_ends_with_an_error_on_a_malformed_line(server):
+    async with build_api(server, pooled=True, stream=True) as api:
+        events = [e async for e in api.chat_completion_stream([{"role": "user", "content": "truncated"}])]
+    assert [e["type"] for e in events] == ["delta", "delta", "error"]
+    assert events[-1]["message"].startswith("Invalid stream event")
+
+
+@pytest.mark.asyncio
+async def test_chat_completion_stream_falls_back_to_buffered(server):
+    async with build_api(server, pooled=True) as api:
+        events = [e async for e in api.chat_completion_stream([{"role": "user", "content": "hi"}])]
+    assert [e["type"] for e in events] == ["delta", "done"]
+    assert events[0]["content"] == "ok"
+
+
+@pytest.mark.asyncio
+async def test_batch_session_methods(server):
+    async with build_api(server, pooled=True) as api:
+        assert (await api.delete_sessions(["a", "b"]))["delete"] == ["a", "b"]
+        assert (await api.clear_sessions(["a"]))["clear"] == ["a"]
+        assert (await api.get_sessions(["c"]))["get"] == ["c"]
+
+
+@pytest.mark.asyncio
+async def test_concurrent_identical_reads_share_one_request(server):
+    async with build_api(server, pooled=True) as api:
+        results = await asyncio.gather(
+            *[api.get_session("1") for _ in range(5)],
+            *[api.get_all_session("7", limit=10) for _ in range(5)],
+            api.get_session("1", last=2),
+        )
+        assert server.reads.count("/sessions/1") == 1
+        assert server.reads.count("/sessions/?owner_id=7&limit=10") == 1
+        assert len(server.reads) == 3
+        assert api.singleflight.stats == {"calls": 11, "executed": 3, "deduplicated": 8}
+
+        # Each caller has its own copy of a shared result
+        results[0]["messages"].append({"role": "assistant", "content": "changed"})
+        assert len(results[1]["messages"]) == 1
+
+        # Nothing is cached after the call
+        await api.get_session("1")
+        assert server.reads.count("/sessions/1") == 2
+
+
+@pytest.mark.asyncio
+async def test_a_cancelled_caller_does_not_cancel_the_shared_read(server):
+    async with build_api(server, pooled=True) as api:
+        first = asyncio.create_task(api.get_session("missing"))
+        second = asyncio.create_task(api.get_session("missing"))
+        await asyncio.sleep(0.01)
+        first.cancel()
+        assert (await second)["status"] == "error"
+        assert len(server.reads) == 1
+
+
+@pytest.mark.asyncio
+async def test_session_cache_serves_reads_until_the_bot_writes(server):
+    from src.api.api_session_cache import SessionCache
+
+    async with build_api(server, pooled=True) as api:
+        api.session_cache = SessionCache()
+        await api.get_session("1")
+        await api.get_session("1")
+        await api.get_all_session("7", limit=10)
+        await api.get_all_session("7", limit=10)
+        assert len(server.reads) == 2
+        assert api.session_cache.stats["hits"] == 2
+
+        # The batch endpoint answers for the writes, the cache is invalidated either way
+        await api.clear_sessions(["1"])
+        await api.get_session("1")
+        await api.get_all_session("7", limit=10)
+        assert len(server.reads) == 4
+
+        await api.get_session("missing")
+        await api.get_session("missing")
+        assert server.reads.count("/sessions/missing") == 2
+
+
+@pytest.mark.asyncio
+async def test_a_read_after_a_write_does_not_join_an_older_read(server):
+    from src.api.api_session_cache import SessionCache
+
+    async with build_api(server, pooled=True) as api:
+        api.session_cache = SessionCache()
+        before = asyncio.create_task(api.get_session("1"))
+        await asyncio.sleep(0.01)
+        # The write lands while the first read is in flight
+        await api.clear_sessions(["1"])
+        after = await api.get_session("1")
+        await before
+
+        assert server.reads.count("/sessions/1") == 2
+        assert after["metadata"]["read"] == 2
+        # Only the read that started after the write is cached
+        assert (await api.get_session("1"))["metadata"]["read"] == 2
+        assert server.reads.count("/sessions/1") == 2
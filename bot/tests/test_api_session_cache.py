@@ -0,0 +1,62 @@
+import time
+
+from src.api.api_session_cache import SessionCache
+
+
+def test_entries_expire_and_are_evicted_least_recently_used_first():
+    now = [0.0]
+    cache = SessionCache(max_entries=2, ttl=10, clock=lambda: now[0])
+    cache.put("a", {"n": 1}, session_id="a")
+    cache.put("b", {"n": 2}, session_id="b")
+    assert cache.get("a") == {"n": 1}
+    cache.put("c", {"n": 3}, session_id="c")
+    assert cache.get("b") is None
+    assert cache.stats["evictions"] == 1
+    now[0] = 10
+    assert cache.get("a") is None
+    assert cache.stats["expired"] == 1
+    assert "b" not in cache.by_session and "a" not in cache.by_session
+
+
+def test_reads_are_copies():
+    cache = SessionCache()
+    value = {"messages": [{"role": "user", "content": "hi"}]}
+    cache.put("a", value)
+    value["messages"].append({"role": "assistant", "content": "changed"})
+    read = cache.get("a")
+    read["messages"].clear()
+    assert len(cache.get("a")["messages"]) == 1
+
+
+def test_invalidation_drops_the_session_and_the_pages_of_its_owner():
+    cache = SessionCache()
+    cache.put(("get_session", "s1"), {}, session_id="s1")
+    cache.put(("get_session", "s2"), {}, session_id="s2")
+    cache.put(("get_all_session", "u1"), {}, owner_id="u1")
+    cache.put(("get_all_session", "u2"), {}, owner_id="u2")
+    cache.remember_owner("s1", "u1")
+
+    cache.invalidate_session("s1")
+    assert set(cache.entries) == {("get_session", "s2"), ("get_all_session", "u2")}
+    # Without a known owner every page could list the session
+    cache.invalidate_session("s3", deleted=True)
+    assert set(cache.entries) == {("get_session", "s2")}
+
+
+def test_reads_that_raced_a_write_are_not_stored():
+    cache = SessionCache()
+    version = cache.version
+    cache.invalidate_session("s1", "u1")
+    cache.put(("get_session", "s1"), {}, session_id="s1", version=version)
+    assert len(cache) == 0
+
+
+def test_hits_take_microseconds():
+    cache = SessionCache()
+    session = {"messages": [{"role": "user", "content": "x" * 200} for _ in range(200)], "metadata": {}}
+    cache.put("s", session, session_id="s")
+    started = time.perf_counter()
+    for _ in range(100):
+        cache.get("s")
+    assert (time.perf_counter() - started) / 100 < 0.005
+    assert cache.hit_rate == 1.0
@@ -0,0 +1,102 @@
+import hashlib
+import io
+
+import pytest
+from aiohttp import web
+
+from src.audio.audio_cache import TranscriptionCache, cache_key, download
+
+
+def result(text: str, duration: float = 60.0):
+    return {"text": text, "segments": [{"start": 0.0, "end": duration, "text": text}], "language": "en", "duration": duration}
+
+
+@pytest.mark.asyncio
+async def test_hit_after_put_counts_the_saved_audio(tmp_path):
+    cache = TranscriptionCache(str(tmp_path))
+    key = cache_key("abc", "base", None)
+    assert key == "abc-base-auto"
+    assert await cache.get(key, 1000) is None
+
+    await cache.put(key, {**result("hello"), "elapsed": 12.0})
+    entry = await cache.get(key, 1000)
+    assert entry["text"] == "hello" and "elapsed" not in entry
+    assert cache.stats["bytes_saved"] == 1000
+    assert cache.hit_rate == 0.5
+    assert await cache.get(cache_key("abc", "base", "es")) is None
+
+
+@pytest.mark.asyncio
+async def test_least_recently_used_entries_are_evicted_by_size(tmp_path):
+    probe = TranscriptionCache(str(tmp_path / "probe"))
+    await probe.put("probe", result("x" * 100))
+    entry_size = probe.size
+
+    cache = TranscriptionCache(str(tmp_path / "cache"), max_bytes=entry_size * 2)
+    await cache.put("a", result("x" * 100))
+    await cache.put("b", result("y" * 100))
+    await cache.get("a")
+    await cache.put("c", result("z" * 100))
+    assert list(cache.entries) == ["a", "c"]
+    assert cache.stats["evictions"] == 1
+    assert not (tmp_path / "cache" / "b.json").exists()
+
+    # The recency order survives a restart
+    reloaded = TranscriptionCache(str(tmp_path / "cache"), max_bytes=entry_size * 2)
+    assert set(reloaded.entries) == {"a", "c"}
+    assert (await reloaded.get("c"))["text"] == "z" * 100
+
+
+class FakeS3:
+    class exceptions:
+        class NoSuchKey(Exception):
+            pass
+
+    def __init__(self):
+        self.objects = {}
+
+    def put_object(self, Bucket, Key, Body, ContentType):
+        self.objects[Key] = Body
+
+    def get_object(self, Bucket, Key):
+        if Key not in self.objects:
+            raise self.exceptions.NoSuchKey()
+        return {"Body": io.BytesIO(self.objects[Key])}
+
+
+@pytest.mark.asyncio
+async def test_shared_tier_fills_the_local_cache(tmp_path):
+    s3 = FakeS3()
+    first = TranscriptionCache(str(tmp_path / "one"), s3_bucket="bucket", s3_client=s3)
+    await first.put("episode", result("shared"))
+    assert list(s3.objects) == ["transcriptions/episode.json"]
+
+    second = TranscriptionCache(str(tmp_path / "two"), s3_bucket="bucket", s3_client=s3)
+    assert (await second.get("episode"))["text"] == "shared"
+    assert second.stats["shared_hits"] == 1
+    assert (await second.get("episode"))["text"] == "shared"
+    assert second.stats["hits"] == 1
+    assert await second.get("missing") is None
+
+
+@pytest.mark.asyncio
+async def test_download_hashes_while_streaming(tmp_path):
+    data = bytes(range(256)) * 5000
+
+    async def audio(request):
+        return web.Response(body=data)
+
+    app = web.Application()
+    app.router.add_get("/episode.mp3", audio)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+    try:
+        path = tmp_path / "episode.mp3"
+        digest, size = await download(f"http://127.0.0.1:{port}/episode.mp3", str(path), chunk_size=4096)
+    finally:
+        await runner.cleanup()
+    assert digest == hashlib.sha256(data).hexdigest()
+    assert size == len(data) and path.read_bytes() == data
@@ -0,0 +1,86 @@
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pytest
+
+from src.audio import audio_transcriber
+from src.audio.audio_transcriber import (
+    SAMPLE_RATE,
+    AudioTranscriber,
+    format_timestamp,
+    split_on_silence,
+)
+
+
+def speech_like(minutes: float, seed: int = 1):
+    """Bursts of noise of 2 to 6 seconds separated by pauses of half a second."""
+    rnd = np.random.default_rng(seed)
+    samples, speech = [], []
+    total = 0
+    while total < minutes * 60 * SAMPLE_RATE:
+        burst = int(rnd.uniform(2, 6) * SAMPLE_RATE)
+        pause = int(0.5 * SAMPLE_RATE)
+        samples += [rnd.normal(0, 0.2, burst).astype(np.float32), np.zeros(pause, np.float32)]
+        speech.append((total, total + burst))
+        total += burst + pause
+    return np.concatenate(samples), speech
+
+
+def test_cuts_fall_in_pauses_and_cover_the_audio():
+    samples, speech = speech_like(10)
+    bounds = split_on_silence(samples, segment_seconds=60)
+    assert bounds[0][0] == 0 and bounds[-1][1] == len(samples)
+    assert all(end == start for (_, end), (start, _) in zip(bounds, bounds[1:]))
+    assert all(50 * SAMPLE_RATE <= end - start <= 70 * SAMPLE_RATE for start, end in bounds[:-1])
+    for _, cut in bounds[:-1]:
+        assert not any(start < cut < end for start, end in speech)
+
+
+def test_short_audio_is_one_segment():
+    assert split_on_silence(np.zeros(SAMPLE_RATE, np.float32)) == [(0, SAMPLE_RATE)]
+    assert split_on_silence(np.zeros(0, np.float32)) == []
+
+
+class FakeModel:
+    def transcribe(self, samples, language=None, fp16=False):
+        duration = len(samples) / SAMPLE_RATE
+        return {
+            "language": language or "en",
+            "segments": [
+                {"start": 0.0, "end": duration / 2, "text": " first half "},
+                {"start": duration / 2, "end": duration, "text": " second half"},
+                {"start": duration, "end": duration, "text": " "},
+            ],
+        }
+
+
+def test_parts_are_stitched_in_order_with_episode_timestamps(monkeypatch):
+    monkeypatch.setattr(audio_transcriber, "_model", FakeModel())
+    samples, _ = speech_like(5)
+    transcriber = AudioTranscriber(workers=4, segment_seconds=60, executor=ThreadPoolExecutor(4))
+    result = transcriber.transcribe_samples(samples)
+
+    assert result["parts"] == len(split_on_silence(samples, segment_seconds=60)) > 4
+    assert result["language"] == "en"
+    assert result["duration"] == pytest.approx(len(samples) / SAMPLE_RATE)
+    starts = [segment["start"] for segment in result["segments"]]
+    assert starts == sorted(starts) and len(starts) == 2 * result["parts"]
+    assert result["segments"][-1]["end"] == pytest.approx(result["duration"])
+    assert result["text"].splitlines()[0] == "[00:00:00] first half"
+
+
+@pytest.mark.asyncio
+async def test_async_transcription_runs_in_the_executor(monkeypatch, tmp_path):
+    monkeypatch.setattr(audio_transcriber, "_model", FakeModel())
+    samples, _ = speech_like(2)
+    monkeypatch.setattr(audio_transcriber, "load_audio", lambda path: samples)
+    transcriber = AudioTranscriber(workers=2, executor=ThreadPoolExecutor(2))
+
+    result = await transcriber.transcript_async(str(tmp_path / "episode.mp3"), "es")
+    assert result["parts"] == 2 and result["language"] == "es"
+    await transcriber.close()
+    assert transcriber.executor is None
+
+
+def test_format_timestamp():
+    assert format_timestamp(3723.9) == "01:02:03"
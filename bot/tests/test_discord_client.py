@@ -0,0 +1,139 @@
+import pytest
+
+from src.discord.discord_client import DiscordSender
+from src.discord.discord_scheduler import pack_messages
+
+
+class FakeMessage:
+    def __init__(self, content):
+        self.content = content
+        self.edits = 0
+
+    async def edit(self, content):
+        self.content = content
+        self.edits += 1
+
+
+class FakeFollowup:
+    def __init__(self):
+        self.messages = []
+
+    async def send(self, content, wait=False, view=None, file=None):
+        message = FakeMessage(content)
+        message.view = view
+        message.file = file
+        self.messages.append(message)
+        return message
+
+
+class FakeResponse:
+    def is_done(self):
+        return True
+
+
+class FakeInteraction:
+    def __init__(self):
+        self.followup = FakeFollowup()
+        self.response = FakeResponse()
+
+
+async def deltas(parts):
+    for part in parts:
+        yield part
+
+
+@pytest.mark.asyncio
+async def test_send_stream_edits_a_single_message():
+    interaction = FakeInteraction()
+    sender = DiscordSender()
+    text = await sender.send_stream(
+        interaction, "1", "hi", deltas(["Hello", " ", "world"]), edit_interval=0
+    )
+    assert text == "Hello world"
+    assert [m.content for m in interaction.followup.messages] == ["Hello world"]
+    assert interaction.followup.messages[0].edits == 2
+    # The followup and its edits are paced by the scheduler
+    assert sender.scheduler.stats["sent"] == 3
+
+
+@pytest.mark.asyncio
+async def test_send_stream_rolls_over_at_chunk_size():
+    interaction = FakeInteraction()
+    parts = ["a" * 30 + "\n", "b" * 30, "c" * 30]
+    text = await DiscordSender().send_stream(
+        interaction, "1", "hi", deltas(parts), edit_interval=0, chunk_size=50
+    )
+    contents = [m.content for m in interaction.followup.messages]
+    assert all(len(c) <= 50 for c in contents)
+    assert contents[0] == "a" * 30
+    assert "".join(contents) == text.replace("\n", "")
+
+
+@pytest.mark.asyncio
+async def test_send_stream_throttles_edits():
+    interaction = FakeInteraction()
+    await DiscordSender().send_stream(
+        interaction, "1", "hi", deltas(["x"] * 100), edit_interval=60
+    )
+    message = interaction.followup.messages[0]
+    # One message for the first delta, one final edit with the complete text
+    assert message.content == "x" * 100
+    assert message.edits == 1
+
+
+async def pages(texts):
+    for index, text in enumerate(texts):
+        yield text, index < len(texts) - 1
+
+
+@pytest.mark.asyncio
+async def test_send_pages_adds_a_more_button_only_when_more_pages_follow():
+    interaction = FakeInteraction()
+    sender = DiscordSender()
+    iterator = pages(["page 1", "page 2"])
+
+    await sender.send_pages(interaction, 1, "/get_all_sessions", iterator)
+    first = interaction.followup.messages[0]
+    assert first.content == "page 1"
+    assert first.view is not None and first.view.pages is iterator
+
+    await sender.send_pages(interaction, 1, "/get_all_sessions", iterator)
+    assert interaction.followup.messages[1].content == "page 2"
+    assert interaction.followup.messages[1].view is None
+
+
+def conversation(turns, answer_size):
+    messages = []
+    for turn in range(turns):
+        messages.append({"role": "user", "content": f"question {turn}"})
+        messages.append({"role": "assistant", "content": f"answer {turn} " + "a" * answer_size})
+    return messages
+
+
+def test_pack_messages_fills_each_message():
+    packed = pack_messages(["a" * 900, "b" * 900, "c" * 900, "d" * 2500])
+    assert [len(message) for message in packed] == [1802, 900, 2000, 500]
+    assert packed[0] == "a" * 900 + "\n\n" + "b" * 900
+
+
+@pytest.mark.asyncio
+async def test_send_replay_packs_short_sessions():
+    interaction = FakeInteraction()
+    sent = await DiscordSender().send_replay(interaction, 1, "/restore", conversation(20, 50), "Session 1")
+    contents = [message.content for message in interaction.followup.messages]
+    assert sent == len(contents) == 1
+    assert "question" not in contents[0]
+    assert contents[0].count("answer") == 20
+
+
+@pytest.mark.asyncio
+async def test_send_replay_attaches_long_sessions():
+    interaction = FakeInteraction()
+    messages = conversation(100, 400)
+    sent = await DiscordSender().send_replay(interaction, 1, "/restore", messages, "Session 1", max_messages=5)
+    assert sent == 1
+    [message] = interaction.followup.messages
+    assert message.file.filename == "session-1.md"
+    text = message.file.fp.read().decode("utf-8")
+    assert text.startswith("# Session 1")
+    assert text.count("## User") == 100 and text.count("## Assistant") == 100
@@ -0,0 +1,172 @@
+import asyncio
+import time
+
+import discord
+import pytest
+
+from src.discord.discord_client import DiscordClient, DiscordSender
+from src.discord.discord_scheduler import OutboundScheduler, TokenBucket, rate_limit_headers, split_message
+
+
+class FakeChannel:
+    def __init__(self, channel_id=1, fail=0, headers=None):
+        self.id = channel_id
+        self.sent = []
+        self.times = []
+        self.fail = fail
+        self.headers = headers or {}
+
+    async def send(self, content):
+        if self.fail:
+            self.fail -= 1
+            response = type("Response", (), {"status": 429, "reason": "Too Many Requests", "headers": self.headers})
+            raise discord.HTTPException(response, "rate limited")
+        self.sent.append(content)
+        self.times.append(time.monotonic())
+
+
+def test_split_message_prefers_line_breaks():
+    text = "\n".join(["a" * 30] * 5)
+    pieces = split_message(text, limit=70)
+    assert pieces == ["a" * 30 + "\n" + "a" * 30] * 2 + ["a" * 30]
+    assert split_message("x" * 25, limit=10) == ["x" * 10, "x" * 10, "x" * 5]
+    assert split_message("") == []
+
+
+def test_rate_limit_headers():
+    assert rate_limit_headers({"X-RateLimit-Remaining": "0", "X-RateLimit-Reset-After": "1.5"}) == (0, 1.5)
+    assert rate_limit_headers({"Retry-After": "2"}) == (None, 2.0)
+    assert rate_limit_headers({}) == (None, None)
+
+
+def test_token_bucket_waits_for_the_reset():
+    now = [0.0]
+    bucket = TokenBucket(2, 1.0, clock=lambda: now[0])
+    bucket.take()
+    bucket.take()
+    assert bucket.delay() == pytest.approx(0.5)
+    bucket.update(0, 3.0)
+    assert bucket.delay() == pytest.approx(3.0)
+    now[0] = 3.0
+    assert bucket.delay() == 0
+
+
+@pytest.mark.asyncio
+async def test_small_messages_are_coalesced():
+    scheduler = OutboundScheduler()
+    channel = FakeChannel()
+    await scheduler.send(("channel", 1), channel.send, [f"line {i}" for i in range(10)])
+    assert channel.sent == ["\n".join(f"line {i}" for i in range(10))]
+    assert scheduler.stats["coalesced"] == 9
+    assert scheduler.depth == 0 and not scheduler.queues
+
+
+@pytest.mark.asyncio
+async def test_sends_are_paced_by_the_bucket_of_the_route():
+    scheduler = OutboundScheduler(limits={"channel": (2, 0.2)})
+    first, second = FakeChannel(1), FakeChannel(2)
+    started = time.monotonic()
+    await asyncio.gather(
+        scheduler.send(("channel", 1), first.send, ["x" * 1500] * 4),
+        scheduler.send(("channel", 2), second.send, ["y" * 1500] * 2),
+    )
+    # Two of the four are sent at once, the others one per 0.1 seconds
+    assert len(first.sent) == 4 and len(second.sent) == 2
+    assert first.times[-1] - started >= 0.19
+    assert second.times[-1] - started < 0.1
+    assert scheduler.stats["max_depth"] == 6
+    assert scheduler.stats["max_wait"] >= 0.19
+
+
+@pytest.mark.asyncio
+async def test_rate_limited_sends_are_retried_after_the_reset():
+    scheduler = OutboundScheduler()
+    channel = FakeChannel(fail=1, headers={"X-RateLimit-Remaining": "0", "X-RateLimit-Reset-After": "0.1"})
+    started = time.monotonic()
+    await scheduler.send(("channel", 1), channel.send, ["hello"])
+    assert channel.sent == ["hello"]
+    assert channel.times[0] - started >= 0.09
+    assert scheduler.stats["rate_limited"] == 1
+
+
+@pytest.mark.asyncio
+async def test_send_errors_reach_the_caller():
+    scheduler = OutboundScheduler(max_attempts=2)
+    channel = FakeChannel(fail=5, headers={"Retry-After": "0.01"})
+    with pytest.raises(discord.HTTPException):
+        await scheduler.send(("channel", 1), channel.send, ["hello"])
+    assert scheduler.stats["failed"] == 1
+
+
+@pytest.mark.asyncio
+async def test_calls_share_the_bucket_but_are_not_coalesced():
+    scheduler = OutboundScheduler(limits={"channel": (2, 0.2)})
+    channel = FakeChannel()
+
+    async def edit():
+        channel.times.append(time.monotonic())
+        return "edited"
+
+    results = await asyncio.gather(
+        scheduler.send(("channel", 1), channel.send, ["a", "b"]), scheduler.call(("channel", 1), edit)
+    )
+    assert results[1] == "edited"
+    assert channel.sent == ["a\nb"]
+    # The call waited for the bucket the coalesced message used
+    assert scheduler.stats["sent"] == 2 and scheduler.stats["coalesced"] == 1
+
+
+@pytest.mark.asyncio
+async def test_idle_routes_and_cooldowns_are_dropped():
+    now = [0.0]
+    scheduler = OutboundScheduler(clock=lambda: now[0])
+    channel = FakeChannel()
+    for interaction_id in range(3):
+        await scheduler.send(("webhook", interaction_id), channel.send, ["hi"])
+    scheduler.cooldown(("welcome", 1), 5)
+    assert len(scheduler.buckets) == 3
+
+    # Once their buckets are full again the routes are the same as new ones
+    now[0] = 10.0
+    await scheduler.send(("webhook", 3), channel.send, ["hi"])
+    assert list(scheduler.buckets) == [("webhook", 3)]
+    assert scheduler.cooldown(("welcome", 2), 5)
+    assert list(scheduler._cooldowns) == [("welcome", 2)]
+
+
+@pytest.mark.asyncio
+async def test_welcome_text_is_sent_once_per_cooldown():
+    scheduler = OutboundScheduler()
+    client = DiscordClient(
+        intents=discord.Intents.default(),
+        guild_id=1,
+        guild_channel="1",
+        commands_list=["`/ask`"],
+        name="Bot",
+        context="Context",
+        usage=["Usage"],
+        copyright=["Legal"],
+        scheduler=scheduler,
+    )
+    channel = FakeChannel(1)
+    message = type("Message", (), {"author": "someone", "channel": channel})
+    await client.on_message(message)
+    await client.on_message(message)
+    # Every line of the welcome text in a single message, and only once
+    assert len(channel.sent) == 1
+    assert channel.sent[0].splitlines() == client.get_default_message()
+    assert scheduler.stats["suppressed"] == 1
+
+
+@pytest.mark.asyncio
+async def test_sender_splits_long_messages_on_lines():
+    from tests.test_discord_client import FakeInteraction
+
+    interaction = FakeInteraction()
+    interaction.id = 1
+    text = "\n".join(f"line {i} " + "z" * 90 for i in range(60))
+    await DiscordSender().send_message(interaction, 1, "/ask", text)
+    contents = [message.content for message in interaction.followup.messages]
+    assert len(contents) == 3
+    assert all(len(content) <= 2000 for content in contents)
+    assert "\n".join(contents) == text
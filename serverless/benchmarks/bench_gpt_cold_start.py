@@ -0,0 +1,158 @@
+"""Local cold start harness for the gpt_ask function.
+
+Every run starts a fresh Python process, like a new Lambda container, imports
+services.gpt.ask and invokes the handler against a local stand-in for the OpenAI
+API. It reports the import (init) time, the first and warm invocation latency,
+the peak RSS and the slowest imports, to tune the 128MB/10s function.
+
+Run it from the serverless directory:
+
+    python -m benchmarks.bench_gpt_cold_start --runs 5
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+SERVERLESS_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+CHILD = """
+import json, resource, sys, time
+
+started = time.perf_counter()
+from services.gpt import ask
+init_ms = (time.perf_counter() - started) * 1000
+
+event = {"body": json.dumps({"messages": [{"role": "user", "content": "Hello"}]})}
+durations = []
+for _ in range(%(invokes)d):
+    started = time.perf_counter()
+    response = ask.lambda_handler(event, None)
+    durations.append((time.perf_counter() - started) * 1000)
+    assert response["statusCode"] == 200, response
+
+print(json.dumps({
+    "init_ms": init_ms,
+    "first_ms": durations[0],
+    "warm_ms": durations[1:],
+    "max_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+}), file=sys.stderr)
+"""
+
+
+class FakeOpenAIHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    # Headers and body are separate writes, avoid the delayed ACK stall on keep-alive
+    disable_nagle_algorithm = True
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        body = json.loads(self.rfile.read(length))
+        data = json.dumps(
+            {
+                "id": "chatcmpl-bench",
+                "object": "chat.completion",
+                "created": 0,
+                "model": body["model"],
+                "choices": [
+                    {
+                        "index": 0,
+                        "message": {"role": "assistant", "content": "Hello from the bench."},
+                        "finish_reason": "stop",
+                    }
+                ],
+            }
+        ).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def child_env(base_url: str) -> dict:
+    env = dict(os.environ)
+    env.update(
+        {
+            "PYTHONPATH": SERVERLESS_DIR,
+            "PYTHONDONTWRITEBYTECODE": "0",
+            "OPENAI_API_KEY": "sk-bench",
+            "OPENAI_GPTMODEL": "gpt-3.5-turbo-1106",
+            "OPENAI_TEMPERATURE": "1",
+            "OPENAI_TOKENS": "64",
+            "OPENAI_BASE_URL": base_url,
+        }
+    )
+    # The cache tiers are out of scope, every call reaches the stand-in API
+    env.pop("COMPLETION_CACHE_TABLE_NAME", None)
+    return env
+
+
+def run_once(env: dict, invokes: int, importtime: bool = False):
+    command = [sys.executable]
+    if importtime:
+        command += ["-X", "importtime"]
+    command += ["-c", CHILD % {"invokes": invokes}]
+    proc = subprocess.run(command, cwd=SERVERLESS_DIR, env=env, capture_output=True, text=True)
+    if proc.returncode != 0:
+        raise RuntimeError(proc.stderr)
+    lines = proc.stderr.strip().splitlines()
+    return json.loads(lines[-1]), lines[:-1]
+
+
+def slowest_imports(lines, top: int, depth: int = 3):
+    # "import time: self [us] | cumulative | imported package", nested imports are
+    # indented by two spaces per level
+    packages = []
+    for line in lines:
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line.split("|", 2)
+        level = (len(name) - len(name.lstrip())) // 2
+        if level <= depth and cumulative.strip().isdigit():
+            packages.append((int(cumulative) / 1000, "  " * level + name.strip()))
+    return sorted(packages, reverse=True)[:top]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5, help="Cold starts to measure.")
+    parser.add_argument("--invokes", type=int, default=5, help="Invocations per cold start.")
+    parser.add_argument("--top", type=int, default=10, help="Slowest imports to list.")
+    args = parser.parse_args()
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), FakeOpenAIHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    env = child_env(f"http://127.0.0.1:{server.server_port}/v1")
+
+    try:
+        # Warm the bytecode cache, a deployed package ships compiled modules
+        run_once(env, 1)
+        results = [run_once(env, max(args.invokes, 2))[0] for _ in range(args.runs)]
+        _, import_lines = run_once(env, 2, importtime=True)
+    finally:
+        server.shutdown()
+
+    def median(key):
+        return statistics.median(result[key] for result in results)
+
+    warm = [ms for result in results for ms in result["warm_ms"]]
+    print(f"runs: {args.runs}, invocations per run: {max(args.invokes, 2)}")
+    print(f"init (imports and module setup): {median('init_ms'):.1f} ms")
+    print(f"first invocation: {median('first_ms'):.1f} ms")
+    print(f"warm invocation: {statistics.median(warm):.1f} ms (p95 {sorted(warm)[int(len(warm) * 0.95)]:.1f} ms)")
+    print(f"peak RSS: {max(result['max_rss_mb'] for result in results):.1f} MB of 128 MB")
+    print("slowest imports (cumulative):")
+    for ms, name in slowest_imports(import_lines, args.top):
+        print(f"  {ms:8.1f} ms  {name}")
+
+
+if __name__ == "__main__":
+    main()
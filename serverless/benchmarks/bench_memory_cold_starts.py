@@ -0,0 +1,140 @@
+"""Cold starts of the memory API: one Lambda per endpoint vs the memory service.
+
+First it measures the init duration of both deployments, importing a single
+endpoint handler or the memory_service router in fresh processes. Then it
+replays the same simulated mixed workload against both: requests arrive at
+random over the endpoints, every function keeps a pool of containers and a
+container that stayed idle longer than --keep-alive is reclaimed. A request
+that finds no idle warm container of its function pays a cold start.
+
+Run it from the serverless directory:
+
+    python -m benchmarks.bench_memory_cold_starts --rate 2 --hours 24
+"""
+import argparse
+import heapq
+import os
+import random
+import statistics
+import subprocess
+import sys
+
+SERVERLESS_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Share of the requests that goes to each endpoint
+WORKLOAD = {
+    "get_all_sessions": 0.20,
+    "get_session": 0.25,
+    "save_session": 0.15,
+    "update_session_metadata": 0.15,
+    "delete_session": 0.10,
+    "clear_messages": 0.05,
+    "batch_get_sessions": 0.04,
+    "batch_delete_sessions": 0.04,
+    "batch_clear_messages": 0.02,
+}
+
+CHILD = """
+import time
+started = time.perf_counter()
+import {module}
+print((time.perf_counter() - started) * 1000)
+"""
+
+
+def measure_init(module: str, runs: int) -> float:
+    env = dict(os.environ, PYTHONPATH=SERVERLESS_DIR, MEMORY_TABLE_NAME="memory", AWS_DEFAULT_REGION="us-east-2")
+    durations = []
+    for _ in range(runs + 1):
+        proc = subprocess.run(
+            [sys.executable, "-c", CHILD.format(module=module)],
+            cwd=SERVERLESS_DIR,
+            env=env,
+            capture_output=True,
+            text=True,
+            check=True,
+        )
+        durations.append(float(proc.stdout.strip().splitlines()[-1]))
+    # The first run only warms the bytecode cache
+    return statistics.median(durations[1:])
+
+
+def simulate(requests, function_of, init_ms: float, keep_alive_s: float):
+    """Replay the requests, returning the number of cold starts and the latencies."""
+    idle = {}  # function -> heap of (-last_used, container) of idle containers
+    busy = []  # heap of (free_at, function, container)
+    cold_starts = 0
+    latencies = []
+    containers = 0
+    for arrival, endpoint, duration_ms in requests:
+        function = function_of(endpoint)
+        while busy and busy[0][0] <= arrival:
+            free_at, name, container = heapq.heappop(busy)
+            heapq.heappush(idle.setdefault(name, []), (-free_at, container))
+
+        pool = idle.setdefault(function, [])
+        # The most recently used container is picked first, older ones expire
+        warm = None
+        while pool:
+            last_used, container = heapq.heappop(pool)
+            if arrival + last_used <= keep_alive_s:
+                warm = container
+                break
+        latency = duration_ms
+        if warm is None:
+            cold_starts += 1
+            containers += 1
+            warm = containers
+            latency += init_ms
+        latencies.append(latency)
+        heapq.heappush(busy, (arrival + latency / 1000, function, warm))
+    return cold_starts, latencies
+
+
+def percentile(values, q):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * q))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rate", type=float, default=2.0, help="Requests per minute on average.")
+    parser.add_argument("--hours", type=float, default=24.0, help="Simulated duration.")
+    parser.add_argument("--keep-alive", type=float, default=420.0, help="Seconds an idle container is kept.")
+    parser.add_argument("--burst", type=float, default=0.3, help="Share of the requests sent in bursts of a session.")
+    parser.add_argument("--runs", type=int, default=5, help="Fresh processes to measure each init duration.")
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    split_init = measure_init("services.memory.get_session", args.runs)
+    service_init = measure_init("services.memory.memory_service", args.runs)
+
+    rnd = random.Random(args.seed)
+    endpoints, weights = zip(*WORKLOAD.items())
+    requests = []
+    now, end = 0.0, args.hours * 3600
+    while now < end:
+        now += rnd.expovariate(args.rate / 60)
+        count = rnd.randint(2, 6) if rnd.random() < args.burst else 1
+        at = now
+        # A user interaction often hits several endpoints within seconds
+        for endpoint in rnd.choices(endpoints, weights, k=count):
+            requests.append((at, endpoint, rnd.lognormvariate(3.4, 0.5)))
+            at += rnd.uniform(0.5, 5)
+    requests.sort()
+
+    results = [
+        ("split", split_init, simulate(requests, lambda endpoint: endpoint, split_init, args.keep_alive)),
+        ("service", service_init, simulate(requests, lambda endpoint: "memory_service", service_init, args.keep_alive)),
+    ]
+    print(f"{len(requests)} requests over {args.hours:g} h, {args.rate:g}/min, keep-alive {args.keep_alive:g} s")
+    print(f"{'deployment':<11} {'init ms':>8} {'cold starts':>12} {'cold %':>7} {'p50 ms':>8} {'p99 ms':>8}")
+    for name, init_ms, (cold_starts, latencies) in results:
+        print(
+            f"{name:<11} {init_ms:>8.0f} {cold_starts:>12} {cold_starts / len(requests):>7.1%} "
+            f"{percentile(latencies, 0.5):>8.0f} {percentile(latencies, 0.99):>8.0f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
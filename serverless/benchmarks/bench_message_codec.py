@@ -0,0 +1,177 @@
+"""Benchmark of the message content codec on transcript heavy sessions.
+
+Each session has the assistant prompt, one or more podcast transcripts shared
+as messages and a back and forth of questions and answers about them. For the
+plain, zlib and (when zstandard is installed) zstd encodings it reports:
+
+- the compression ratio of the stored message contents,
+- the encode and decode CPU time per session,
+- the write capacity units to save the sessions (one item per message),
+- the read capacity units of a full, strongly consistent session read.
+
+Capacity units follow the DynamoDB rules: a write costs 1 WCU per started KB of
+each item, a Query costs 1 RCU per started 4KB of the items it returns.
+
+The transcripts are generated, pass real ones with --transcript to compare:
+
+    python -m benchmarks.bench_message_codec --sessions 50
+    python -m benchmarks.bench_message_codec --transcript path/to/transcription.txt
+"""
+import argparse
+import json
+import math
+import random
+import time
+import zlib
+from decimal import Decimal
+
+from common.utils import codec
+
+SPEAKERS = ["Host", "Guest"]
+
+
+def build_vocabulary(rnd: random.Random, size: int = 6000):
+    letters = "etaoinshrdlcumwfgypbvkjxqz"
+    weights = [12.7, 9.1, 8.2, 7.5, 7.0, 6.7, 6.3, 6.1, 6.0, 4.3, 4.0, 2.8, 2.8, 2.4, 2.4, 2.2, 2.0, 2.0, 1.9, 1.5, 1.0, 0.8, 0.2, 0.2, 0.1, 0.1]
+    common = "the of and to a in that is was he for it with as his on be at by i you this have we they".split()
+    words = list(common)
+    while len(words) < size:
+        length = max(2, min(12, int(rnd.gauss(6, 2.5))))
+        words.append("".join(rnd.choices(letters, weights, k=length)))
+    # Zipf: the n-th most frequent word appears with a probability close to 1/n
+    return words, [1 / (rank + 1) for rank in range(len(words))]
+
+
+def generate_transcript(rnd: random.Random, vocabulary, minutes: int) -> str:
+    words, weights = vocabulary
+    lines = []
+    seconds = 0
+    while seconds < minutes * 60:
+        sentence = " ".join(rnd.choices(words, weights, k=rnd.randint(6, 28)))
+        speaker = SPEAKERS[len(lines) % 2 if rnd.random() < 0.8 else rnd.randint(0, 1)]
+        lines.append(f"[{seconds // 3600:02d}:{seconds // 60 % 60:02d}:{seconds % 60:02d}] {speaker}: {sentence.capitalize()}.")
+        seconds += rnd.randint(3, 15)
+    return "\n".join(lines)
+
+
+def generate_session(rnd: random.Random, vocabulary, transcripts, turns: int):
+    words, weights = vocabulary
+    messages = [{"role": "system", "content": "You are a podcast agent. Answer questions about the transcripts. " * 4}]
+    for transcript in transcripts:
+        messages.append({"role": "user", "content": f"Here is the transcription of the episode:\n{transcript}"})
+        messages.append({"role": "assistant", "content": "Thanks, I read the transcription. What do you want to know?"})
+    for _ in range(turns):
+        question = " ".join(rnd.choices(words, weights, k=rnd.randint(8, 30)))
+        answer = " ".join(rnd.choices(words, weights, k=rnd.randint(60, 300)))
+        messages.append({"role": "user", "content": f"{question.capitalize()}?"})
+        messages.append({"role": "assistant", "content": f"{answer.capitalize()}."})
+    return messages
+
+
+def value_size(value) -> int:
+    if isinstance(value, str):
+        return len(value.encode("utf-8"))
+    if isinstance(value, (bytes, bytearray)):
+        return len(value)
+    if isinstance(value, bool):
+        return 1
+    if isinstance(value, (int, Decimal)):
+        return math.ceil(len(str(value).lstrip("-")) / 2) + 1
+    raise TypeError(f"Unsupported value {type(value)}")
+
+
+def item_size(item: dict) -> int:
+    return sum(len(name.encode("utf-8")) + value_size(value) for name, value in item.items())
+
+
+def message_items(messages, encode):
+    items = []
+    for seq, message in enumerate(messages):
+        items.append(
+            {
+                "pk": "SESSION#0123456789abcdef",
+                "sk": f"MSG#{seq:010d}",
+                "seq": seq,
+                "role": message["role"],
+                "content": encode(message["content"]),
+            }
+        )
+    return items
+
+
+def measure(sessions, name: str, encode, decode) -> dict:
+    stats = {"name": name, "raw": 0, "stored": 0, "encode_s": 0.0, "decode_s": 0.0, "wcu": 0, "rcu": 0.0}
+    for messages in sessions:
+        started = time.process_time()
+        items = message_items(messages, encode)
+        stats["encode_s"] += time.process_time() - started
+
+        started = time.process_time()
+        decoded = [decode(item["content"]) for item in items]
+        stats["decode_s"] += time.process_time() - started
+        assert decoded == [message["content"] for message in messages]
+
+        stats["raw"] += sum(len(message["content"].encode("utf-8")) for message in messages)
+        stats["stored"] += sum(value_size(item["content"]) for item in items)
+        sizes = [item_size(item) for item in items]
+        stats["wcu"] += sum(math.ceil(size / 1024) for size in sizes)
+        stats["rcu"] += math.ceil(sum(sizes) / 4096)
+    return stats
+
+
+def api_transfer(sessions) -> tuple:
+    # The get_session response is JSON either way, API Gateway can gzip it
+    body = [json.dumps({"messages": messages}).encode("utf-8") for messages in sessions]
+    return sum(len(data) for data in body), sum(len(zlib.compress(data, 6)) for data in body)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sessions", type=int, default=50, help="Sessions to generate.")
+    parser.add_argument("--minutes", type=int, default=45, help="Length of each generated episode.")
+    parser.add_argument("--transcripts", type=int, default=1, help="Transcripts per session.")
+    parser.add_argument("--turns", type=int, default=20, help="Question and answer turns per session.")
+    parser.add_argument("--transcript", action="append", help="Real transcript file, may be repeated.")
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    rnd = random.Random(args.seed)
+    vocabulary = build_vocabulary(rnd)
+    real = []
+    for path in args.transcript or []:
+        with open(path, encoding="utf-8") as f:
+            real.append(f.read())
+
+    sessions = []
+    for _ in range(args.sessions):
+        transcripts = real or [generate_transcript(rnd, vocabulary, args.minutes) for _ in range(args.transcripts)]
+        sessions.append(generate_session(rnd, vocabulary, transcripts, args.turns))
+
+    encodings = [("plain", lambda text: text, codec.decode_content)]
+    encodings.append(("zlib", lambda text: codec.encode_content(text, codec=codec.CODEC_ZLIB), codec.decode_content))
+    if codec.zstandard is not None:
+        encodings.append(("zstd", lambda text: codec.encode_content(text, codec=codec.CODEC_ZSTD), codec.decode_content))
+
+    results = [measure(sessions, *encoding) for encoding in encodings]
+    plain = results[0]
+    count = len(sessions)
+    print(f"{count} sessions, {plain['raw'] / count / 1024:.0f} KB of message contents on average")
+    print(f"{'codec':<6} {'ratio':>6} {'encode ms':>10} {'decode ms':>10} {'WCU/save':>9} {'RCU/read':>9}")
+    for stats in results:
+        print(
+            f"{stats['name']:<6} {stats['raw'] / stats['stored']:>6.2f} "
+            f"{stats['encode_s'] / count * 1000:>10.2f} {stats['decode_s'] / count * 1000:>10.2f} "
+            f"{stats['wcu'] / count:>9.1f} {stats['rcu'] / count:>9.1f}"
+        )
+    for stats in results[1:]:
+        print(
+            f"{stats['name']}: {1 - stats['wcu'] / plain['wcu']:.0%} fewer write units, "
+            f"{1 - stats['rcu'] / plain['rcu']:.0%} fewer read units than plain"
+        )
+
+    raw, gzipped = api_transfer(sessions)
+    print(f"get_session response: {raw / count / 1024:.0f} KB, {gzipped / count / 1024:.0f} KB with API Gateway compression")
+
+
+if __name__ == "__main__":
+    main()
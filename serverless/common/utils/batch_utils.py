@@ -0,0 +1,96 @@
+"""BatchGetItem and BatchWriteItem with chunking and retries.
+
+DynamoDB takes at most 100 keys per BatchGetItem and 25 requests per
+BatchWriteItem, and may leave part of a batch unprocessed when the table is
+throttled. These helpers split the requests into chunks and send the unprocessed
+part again with exponential backoff and jitter.
+"""
+import random
+import time
+from typing import Dict, List, Optional, Tuple
+
+BATCH_GET_LIMIT = 100
+BATCH_WRITE_LIMIT = 25
+MAX_ATTEMPTS = 6
+BASE_DELAY = 0.05
+MAX_DELAY = 2.0
+
+
+def chunks(items: List, size: int) -> List[List]:
+    return [items[i:i + size] for i in range(0, len(items), size)]
+
+
+def backoff(attempt: int, base_delay: float = BASE_DELAY, sleep=time.sleep) -> None:
+    # Full jitter, so throttled callers do not retry in lockstep
+    sleep(random.uniform(0, min(MAX_DELAY, base_delay * 2 ** attempt)))
+
+
+def batch_get_items(
+    dynamodb,
+    table_name: str,
+    keys: List[Dict],
+    projection_expression: Optional[str] = None,
+    expression_attribute_names: Optional[Dict] = None,
+    consistent: bool = False,
+    max_attempts: int = MAX_ATTEMPTS,
+    sleep=time.sleep,
+) -> Tuple[List[Dict], List[Dict]]:
+    """Get many items by key.
+
+    Args:
+        dynamodb: The boto3 DynamoDB service resource.
+
+    Returns:
+        Tuple[List[Dict], List[Dict]]: The items found, in no particular order,
+        and the keys still unprocessed after the last attempt.
+    """
+    items, unprocessed = [], []
+    for chunk in chunks(keys, BATCH_GET_LIMIT):
+        request = {"Keys": chunk, "ConsistentRead": consistent}
+        if projection_expression:
+            request["ProjectionExpression"] = projection_expression
+        if expression_attribute_names:
+            request["ExpressionAttributeNames"] = expression_attribute_names
+
+        pending = {table_name: request}
+        for attempt in range(max_attempts):
+            response = dynamodb.batch_get_item(RequestItems=pending)
+            items += response.get("Responses", {}).get(table_name, [])
+            pending = response.get("UnprocessedKeys") or {}
+            if not pending:
+                break
+            if attempt < max_attempts - 1:
+                backoff(attempt, sleep=sleep)
+        if pending:
+            unprocessed += pending[table_name]["Keys"]
+    return items, unprocessed
+
+
+def batch_write_items(
+    dynamodb,
+    table_name: str,
+    requests: List[Dict],
+    max_attempts: int = MAX_ATTEMPTS,
+    sleep=time.sleep,
+) -> List[Dict]:
+    """Send many put and delete requests, e.g. {"PutRequest": {"Item": item}}.
+
+    Args:
+        dynamodb: The boto3 DynamoDB service resource.
+
+    Returns:
+        List[Dict]: The requests still unprocessed after the last attempt.
+    """
+    unprocessed = []
+    for chunk in chunks(requests, BATCH_WRITE_LIMIT):
+        pending = {table_name: chunk}
+        for attempt in range(max_attempts):
+            response = dynamodb.batch_write_item(RequestItems=pending)
+            pending = response.get("UnprocessedItems") or {}
+            if not pending:
+                break
+            if attempt < max_attempts - 1:
+                backoff(attempt, sleep=sleep)
+        if pending:
+            unprocessed += pending[table_name]
+    return unprocessed
@@ -0,0 +1,89 @@
+"""Compression of the message contents stored in the memory table.
+
+Large contents, like podcast transcripts, are stored as a binary attribute:
+
+    b"PA" | version (1 byte) | codec (1 byte) | compressed UTF-8 text
+
+zstd is used when the zstandard package is available, zlib otherwise. Contents
+below COMPRESS_MIN_BYTES stay plain strings, where the header and the codec
+would cost more than they save. Plain strings are also how the items written
+before this codec look, so both kinds are read the same way.
+"""
+import os
+import zlib
+from typing import Union
+
+try:
+    import zstandard
+except ImportError:  # pragma: no cover - depends on the deployment package
+    zstandard = None
+
+MAGIC = b"PA"
+VERSION = 1
+CODEC_ZLIB = 1
+CODEC_ZSTD = 2
+CODEC_NAMES = {"zlib": CODEC_ZLIB, "zstd": CODEC_ZSTD}
+
+COMPRESS_MIN_BYTES = int(os.getenv("MESSAGE_COMPRESS_MIN_BYTES", 1024))
+ZLIB_LEVEL = 6
+ZSTD_LEVEL = 3
+
+
+def default_codec() -> int:
+    name = os.getenv("MESSAGE_CODEC")
+    if name:
+        if name not in CODEC_NAMES:
+            raise ValueError(f"Unknown message codec '{name}'.")
+        return CODEC_NAMES[name]
+    return CODEC_ZSTD if zstandard is not None else CODEC_ZLIB
+
+
+def compress(data: bytes, codec: int) -> bytes:
+    if codec == CODEC_ZSTD:
+        if zstandard is None:
+            raise ValueError("The zstd codec needs the zstandard package.")
+        return zstandard.ZstdCompressor(level=ZSTD_LEVEL).compress(data)
+    if codec == CODEC_ZLIB:
+        return zlib.compress(data, ZLIB_LEVEL)
+    raise ValueError(f"Unknown codec {codec}.")
+
+
+def decompress(data: bytes, codec: int) -> bytes:
+    if codec == CODEC_ZSTD:
+        if zstandard is None:
+            raise ValueError("The zstd codec needs the zstandard package.")
+        return zstandard.ZstdDecompressor().decompress(data)
+    if codec == CODEC_ZLIB:
+        return zlib.decompress(data)
+    raise ValueError(f"Unknown codec {codec}.")
+
+
+def encode_content(
+    text: str, codec: int = None, min_bytes: int = None
+) -> Union[str, bytes]:
+    """Encode a message content for storage.
+
+    Returns:
+        Union[str, bytes]: The text itself when it is small or does not compress,
+        otherwise the header followed by the compressed text.
+    """
+    data = text.encode("utf-8")
+    if len(data) < (COMPRESS_MIN_BYTES if min_bytes is None else min_bytes):
+        return text
+    codec = default_codec() if codec is None else codec
+    payload = MAGIC + bytes([VERSION, codec]) + compress(data, codec)
+    return payload if len(payload) < len(data) else text
+
+
+def decode_content(value) -> str:
+    """Decode a stored message content, compressed or a legacy plain string."""
+    if isinstance(value, str):
+        return value
+    # boto3 returns binary attributes wrapped in a Binary object
+    data = bytes(getattr(value, "value", value))
+    if data[:2] != MAGIC:
+        raise ValueError("Unknown message content format.")
+    version, codec = data[2], data[3]
+    if version != VERSION:
+        raise ValueError(f"Unsupported message content version {version}.")
+    return decompress(data[4:], codec).decode("utf-8")
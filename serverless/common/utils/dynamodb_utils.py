@@ -0,0 +1,16 @@
+import functools
+import os
+
+import boto3
+
+
+@functools.lru_cache(maxsize=None)
+def get_dynamodb():
+    # One resource per container, so every handler in it shares the client and
+    # its connection pool
+    return boto3.resource("dynamodb")
+
+
+@functools.lru_cache(maxsize=None)
+def get_memory_table(table_name: str = None):
+    return get_dynamodb().Table(table_name or os.getenv("MEMORY_TABLE_NAME"))
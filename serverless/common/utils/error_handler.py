@@ -18,5 +18,9 @@ def not_found_error():
     return error_response("The specified resource was not found.", 404)
 
 
+def conflict_error(message="The resource already exists."):
+    return error_response(message, 409)
+
+
 def internal_server_error():
     return error_response("Internal server error.", 500)
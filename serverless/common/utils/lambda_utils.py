@@ -15,3 +15,8 @@ def load_body_from_event(event):
 def load_path_parameter_from_event(event, param_name):
     # Extract a path parameter from the event
     return event.get("pathParameters", {}).get(param_name)
+
+
+def load_query_parameter_from_event(event, param_name, default=None):
+    # API Gateway sends None instead of {} when there is no query string
+    return (event.get("queryStringParameters") or {}).get(param_name, default)
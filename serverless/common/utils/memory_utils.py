@@ -0,0 +1,370 @@
+"""Helpers for the session storage layout of the memory table.
+
+A session is stored as one item per message under the same partition key, next
+to a metadata item:
+
+    pk=SESSION#<id>  sk=META                metadata, is_deleted, created_at,
+                                            owner_id, message_count, next_seq
+    pk=SESSION#<id>  sk=MSG#<seq>           role, content, seq
+
+The sequence number is zero padded so the messages sort in order, which makes
+"the last N messages" or "the messages after seq X" a single Query. Appending
+writes only the new messages and no item grows with the conversation. Large
+contents are stored compressed, see common.utils.codec.
+"""
+import base64
+import datetime
+import json
+from concurrent.futures import ThreadPoolExecutor
+from typing import Container, Dict, List, Optional, Tuple
+
+from boto3.dynamodb.conditions import Key
+from botocore.exceptions import ClientError
+
+from common.utils.batch_utils import batch_get_items, batch_write_items
+from common.utils.codec import decode_content, encode_content
+
+SESSION_PREFIX = "SESSION#"
+META_SK = "META"
+MESSAGE_PREFIX = "MSG#"
+# Sparse index of the live sessions by owner_id and created_at. Only live sessions
+# carry owner_id, deleting a session removes it and drops it from the index.
+LIVE_SESSIONS_INDEX = "LiveSessionsIndex"
+ANONYMOUS_OWNER = "anonymous"
+# Condition of the writes to an existing session, bind ":false" to False
+LIVE_SESSION_CONDITION = "attribute_exists(pk) AND is_deleted = :false"
+
+
+def session_key(session_id: str) -> str:
+    return f"{SESSION_PREFIX}{session_id}"
+
+
+def meta_key(pk: str) -> Dict:
+    return {"pk": pk, "sk": META_SK}
+
+
+def message_sk(seq: int) -> str:
+    return f"{MESSAGE_PREFIX}{seq:010d}"
+
+
+def clean_message(message: Dict) -> Dict:
+    # Only role and content are stored and sent to the model
+    return {"role": message["role"], "content": message["content"]}
+
+
+def session_owner(metadata: Optional[Dict]) -> str:
+    user_id = (metadata or {}).get("user_id")
+    return str(user_id) if user_id not in (None, "") else ANONYMOUS_OWNER
+
+
+def encode_cursor(last_evaluated_key: Optional[Dict]) -> Optional[str]:
+    if not last_evaluated_key:
+        return None
+    data = json.dumps(last_evaluated_key, separators=(",", ":")).encode("utf-8")
+    return base64.urlsafe_b64encode(data).decode("ascii")
+
+
+def decode_cursor(cursor: Optional[str]) -> Optional[Dict]:
+    if not cursor:
+        return None
+    try:
+        key = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+    except (ValueError, UnicodeError):
+        raise ValueError("Invalid cursor.")
+    if not isinstance(key, dict):
+        raise ValueError("Invalid cursor.")
+    return key
+
+
+def get_session_meta(memory_table, pk: str) -> Optional[Dict]:
+    # Strongly consistent so a turn always sees the previous one
+    return memory_table.get_item(Key=meta_key(pk), ConsistentRead=True).get("Item")
+
+
+def query_messages(
+    memory_table,
+    pk: str,
+    last: Optional[int] = None,
+    after: Optional[int] = None,
+    first: Optional[int] = None,
+    consistent: bool = False,
+) -> List[Dict]:
+    """Read a range of the messages of a session, in order.
+
+    Args:
+        last (int): Only the last N messages.
+        after (int): Only the messages with a seq greater than this one.
+        first (int): Only the first N messages.
+        consistent (bool): Strongly consistent read.
+
+    Returns:
+        List[Dict]: The message items, with their role, content and seq.
+    """
+    if after is not None:
+        condition = Key("pk").eq(pk) & Key("sk").between(message_sk(after + 1), message_sk(10**10 - 1))
+    else:
+        condition = Key("pk").eq(pk) & Key("sk").begins_with(MESSAGE_PREFIX)
+
+    query = {
+        "KeyConditionExpression": condition,
+        "ConsistentRead": consistent,
+        # Newest first when only the tail is needed, so it stops after N items
+        "ScanIndexForward": last is None,
+    }
+    limit = last if last is not None else first
+    items = []
+    while True:
+        if limit is not None:
+            query["Limit"] = limit - len(items)
+        response = memory_table.query(**query)
+        items += response.get("Items", [])
+        if "LastEvaluatedKey" not in response or (limit is not None and len(items) >= limit):
+            break
+        query["ExclusiveStartKey"] = response["LastEvaluatedKey"]
+
+    if last is not None:
+        items.reverse()
+    return [
+        {"role": item["role"], "content": decode_content(item["content"]), "seq": int(item["seq"])}
+        for item in items
+    ]
+
+
+def get_session(
+    memory_table, pk: str, last: Optional[int] = None, after: Optional[int] = None
+) -> Optional[Dict]:
+    """Read the metadata item of a session and a range of its messages.
+
+    Returns None when the session does not exist. The messages only have their
+    role and content, 'first_seq' and 'last_seq' give the range that was read.
+    """
+    meta = get_session_meta(memory_table, pk)
+    if not meta:
+        return None
+    messages = query_messages(memory_table, pk, last=last, after=after)
+    session = {key: val for key, val in meta.items() if key != "sk"}
+    session["messages"] = [clean_message(message) for message in messages]
+    session["first_seq"] = messages[0]["seq"] if messages else None
+    session["last_seq"] = messages[-1]["seq"] if messages else None
+    return session
+
+
+def put_messages(memory_table, pk: str, messages: List[Dict], first_seq: int) -> None:
+    # The batch writer sends chunks of 25 items and retries the unprocessed ones
+    with memory_table.batch_writer() as batch:
+        for offset, message in enumerate(messages):
+            seq = first_seq + offset
+            item = {"pk": pk, "sk": message_sk(seq), "seq": seq, "role": message["role"]}
+            item["content"] = encode_content(message["content"])
+            batch.put_item(Item=item)
+
+
+def create_session(memory_table, pk: str, messages: List[Dict], metadata: Optional[Dict] = None) -> Dict:
+    """Create a session with its messages.
+
+    Raises ConditionalCheckFailedException when the session already exists.
+    """
+    item = {
+        **meta_key(pk),
+        "metadata": metadata or {},
+        "is_deleted": False,
+        "created_at": datetime.datetime.now().isoformat(),
+        "owner_id": session_owner(metadata),
+        "message_count": len(messages),
+        "next_seq": len(messages),
+    }
+    memory_table.put_item(Item=item, ConditionExpression="attribute_not_exists(pk)")
+    put_messages(memory_table, pk, messages, 0)
+    return item
+
+
+def append_session_messages(
+    memory_table, pk: str, messages: List[Dict], metadata: Optional[Dict] = None
+) -> int:
+    """Append messages to a session, creating it on the first turn.
+
+    The sequence numbers are reserved on the metadata item first, so concurrent
+    appends never overwrite each other, then only the new messages are written.
+
+    Raises ConditionalCheckFailedException when the session was deleted.
+
+    Returns:
+        int: The seq of the first appended message.
+    """
+    res = memory_table.update_item(
+        Key=meta_key(pk),
+        UpdateExpression=(
+            "SET metadata = if_not_exists(metadata, :metadata), "
+            "is_deleted = if_not_exists(is_deleted, :false), "
+            "created_at = if_not_exists(created_at, :now), "
+            "owner_id = if_not_exists(owner_id, :owner) "
+            "ADD message_count :count, next_seq :count"
+        ),
+        ConditionExpression="attribute_not_exists(pk) OR is_deleted = :false",
+        ExpressionAttributeValues={
+            ":metadata": metadata or {},
+            ":false": False,
+            ":now": datetime.datetime.now().isoformat(),
+            ":owner": session_owner(metadata),
+            ":count": len(messages),
+        },
+        ReturnValues="UPDATED_NEW",
+    )
+    first_seq = int(res["Attributes"]["next_seq"]) - len(messages)
+    put_messages(memory_table, pk, messages, first_seq)
+    return first_seq
+
+
+def delete_messages(memory_table, pk: str) -> int:
+    """Delete every message item of a session with batch deletes.
+
+    Returns:
+        int: The number of deleted messages.
+    """
+    query = {
+        "KeyConditionExpression": Key("pk").eq(pk) & Key("sk").begins_with(MESSAGE_PREFIX),
+        "ProjectionExpression": "pk, sk",
+    }
+    deleted = 0
+    with memory_table.batch_writer() as batch:
+        while True:
+            response = memory_table.query(**query)
+            for item in response.get("Items", []):
+                batch.delete_item(Key={"pk": item["pk"], "sk": item["sk"]})
+                deleted += 1
+            if "LastEvaluatedKey" not in response:
+                break
+            query["ExclusiveStartKey"] = response["LastEvaluatedKey"]
+    return deleted
+
+
+MAX_BATCH_SESSIONS = 100
+# Conditional updates in flight at a time, the default connection pool of a client
+MAX_CONCURRENT_UPDATES = 10
+
+
+def load_session_ids(body: Dict) -> List[str]:
+    """Validate the 'session_ids' of a batch request and return their keys."""
+    session_ids = body.get("session_ids") if isinstance(body, dict) else None
+    if not session_ids or not isinstance(session_ids, list):
+        raise ValueError("Body 'session_ids' must be a non empty list.")
+    if not all(isinstance(session_id, str) and session_id for session_id in session_ids):
+        raise ValueError("Each session_id should be a non empty string.")
+    # Duplicated keys are rejected by BatchGetItem
+    session_ids = list(dict.fromkeys(session_ids))
+    if len(session_ids) > MAX_BATCH_SESSIONS:
+        raise ValueError(f"At most {MAX_BATCH_SESSIONS} session_ids per request.")
+    return [session_key(session_id) for session_id in session_ids]
+
+
+def session_id_of(pk: str) -> str:
+    return pk[len(SESSION_PREFIX):]
+
+
+def get_live_session_metas(dynamodb, memory_table, pks: List[str]) -> Tuple[Dict[str, Dict], List[str]]:
+    """Read the metadata items of many sessions with BatchGetItem.
+
+    Returns:
+        Tuple[Dict[str, Dict], List[str]]: The live sessions by pk, and the pks
+        that could not be read because of throttling.
+    """
+    items, unprocessed = batch_get_items(
+        dynamodb, memory_table.name, [meta_key(pk) for pk in pks], consistent=True
+    )
+    metas = {item["pk"]: item for item in items if not item.get("is_deleted")}
+    return metas, [key["pk"] for key in unprocessed]
+
+
+def update_live_sessions(memory_table, pks: List[str], update: Dict) -> Tuple[List[str], List[str], List[str]]:
+    """Apply a conditional UpdateItem to the metadata item of each live session.
+
+    Each write is conditioned on the session being live, as for a single
+    session, so it never undoes a concurrent delete, message reservation or
+    metadata update the way a read and a BatchWriteItem put would. The writes
+    run concurrently, a batch takes about as long as the slowest of them.
+
+    Returns:
+        Tuple[List[str], List[str], List[str]]: The updated, not found and
+        failed pks.
+    """
+    client = memory_table.meta.client
+
+    def update_one(pk: str) -> str:
+        try:
+            client.update_item(
+                TableName=memory_table.name,
+                Key=meta_key(pk),
+                ConditionExpression=LIVE_SESSION_CONDITION,
+                **update,
+            )
+            return "updated"
+        except client.exceptions.ConditionalCheckFailedException:
+            return "not_found"
+        except ClientError:
+            # Throttled or failed, the caller can retry these sessions
+            return "failed"
+
+    results = {"updated": [], "not_found": [], "failed": []}
+    if pks:
+        with ThreadPoolExecutor(max_workers=min(MAX_CONCURRENT_UPDATES, len(pks))) as pool:
+            for pk, outcome in zip(pks, pool.map(update_one, pks)):
+                results[outcome].append(pk)
+    return results["updated"], results["not_found"], results["failed"]
+
+
+def delete_sessions(memory_table, pks: List[str]) -> Dict[str, List[str]]:
+    """Soft delete many sessions with one conditional update each."""
+    deleted, _, failed = update_live_sessions(
+        memory_table,
+        pks,
+        {
+            # Removing owner_id drops the session from the live sessions index
+            "UpdateExpression": "SET is_deleted = :true REMOVE owner_id",
+            "ExpressionAttributeValues": {":true": True, ":false": False},
+        },
+    )
+    return batch_result(pks, set(deleted), failed, "deleted")
+
+
+def clear_sessions(dynamodb, memory_table, pks: List[str]) -> Dict[str, List[str]]:
+    """Delete the messages of many sessions, keeping the sessions.
+
+    The messages of the live sessions are deleted with BatchWriteItem first,
+    then message_count is reset with a conditional update, as clear_messages
+    does, only for the sessions whose messages are all gone.
+    """
+    metas, failed = get_live_session_metas(dynamodb, memory_table, pks)
+    requests = []
+    for pk in metas:
+        query = {
+            "KeyConditionExpression": Key("pk").eq(pk) & Key("sk").begins_with(MESSAGE_PREFIX),
+            "ProjectionExpression": "pk, sk",
+        }
+        while True:
+            response = memory_table.query(**query)
+            for item in response.get("Items", []):
+                requests.append({"DeleteRequest": {"Key": {"pk": pk, "sk": item["sk"]}}})
+            if "LastEvaluatedKey" not in response:
+                break
+            query["ExclusiveStartKey"] = response["LastEvaluatedKey"]
+
+    unprocessed = batch_write_items(dynamodb, memory_table.name, requests)
+    failed += list(dict.fromkeys(request["DeleteRequest"]["Key"]["pk"] for request in unprocessed))
+    cleared, _, update_failed = update_live_sessions(
+        memory_table,
+        [pk for pk in metas if pk not in failed],
+        {
+            "UpdateExpression": "SET message_count = :count",
+            "ExpressionAttributeValues": {":count": 0, ":false": False},
+        },
+    )
+    return batch_result(pks, set(cleared), failed + update_failed, "cleared")
+
+
+def batch_result(pks: List[str], metas: Container[str], failed: List[str], done: str) -> Dict[str, List[str]]:
+    failed = set(failed)
+    return {
+        done: [session_id_of(pk) for pk in pks if pk in metas and pk not in failed],
+        "not_found": [session_id_of(pk) for pk in pks if pk not in metas and pk not in failed],
+        "failed": [session_id_of(pk) for pk in pks if pk in failed],
+    }
@@ -0,0 +1,63 @@
+import functools
+import json
+import time
+
+METRICS_NAMESPACE = "PodcastAgentGPT"
+
+
+def emit_metrics(function_name: str, metrics: dict, unit: str = "Milliseconds", **properties) -> None:
+    # CloudWatch Embedded Metric Format, the log line becomes a metric without API calls
+    print(
+        json.dumps(
+            {
+                "_aws": {
+                    "Timestamp": int(time.time() * 1000),
+                    "CloudWatchMetrics": [
+                        {
+                            "Namespace": METRICS_NAMESPACE,
+                            "Dimensions": [["function"]],
+                            "Metrics": [{"Name": name, "Unit": unit} for name in metrics],
+                        }
+                    ],
+                },
+                "function": function_name,
+                **properties,
+                **metrics,
+            }
+        )
+    )
+
+
+class ColdStartTracker:
+    """Measure the module init duration and report it with the first invocation.
+
+    Create it at the top of a handler module, call ``init_done()`` once the
+    module level setup is finished and decorate the handler with ``measure``.
+    """
+
+    def __init__(self, function_name: str):
+        self.function_name = function_name
+        self.init_started = time.perf_counter()
+        self.init_duration_ms = None
+        self.cold_start = True
+
+    def init_done(self) -> None:
+        self.init_duration_ms = (time.perf_counter() - self.init_started) * 1000
+
+    def measure(self, handler):
+        @functools.wraps(handler)
+        def wrapper(event, context):
+            started = time.perf_counter()
+            try:
+                return handler(event, context)
+            finally:
+                if self.cold_start:
+                    self.cold_start = False
+                    handler_duration_ms = (time.perf_counter() - started) * 1000
+                    emit_metrics(
+                        self.function_name,
+                        {"InitDuration": self.init_duration_ms or 0.0, "HandlerDuration": handler_duration_ms},
+                        cold_start=True,
+                    )
+
+        return wrapper
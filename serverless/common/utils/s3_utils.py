@@ -0,0 +1,94 @@
+"""Helpers for presigned S3 multipart uploads.
+
+The client uploads each part straight to S3 with a presigned PUT, in parallel,
+and keeps the ETag of every part to complete the upload. The API only creates,
+lists, completes and aborts uploads, the audio never goes through a Lambda.
+"""
+import math
+from typing import Dict, List, Optional
+
+MIN_PART_SIZE = 5 * 1024 * 1024
+DEFAULT_PART_SIZE = 8 * 1024 * 1024
+MAX_PARTS = 10000
+# URLs per response, the client asks for the next ones as it goes
+MAX_PRESIGNED_PARTS = 1000
+MAX_OBJECT_SIZE = 5 * 1024 ** 4
+DEFAULT_EXPIRES_IN = 3600
+MAX_EXPIRES_IN = 86400
+
+
+def load_expires_in(value, default: int = DEFAULT_EXPIRES_IN) -> int:
+    if value is None:
+        return default
+    try:
+        expires_in = int(value)
+    except (TypeError, ValueError):
+        raise ValueError("'expiresIn' must be a valid integer.")
+    if expires_in <= 0 or expires_in > MAX_EXPIRES_IN:
+        raise ValueError(f"'expiresIn' must be between 1 and {MAX_EXPIRES_IN} seconds.")
+    return expires_in
+
+
+def part_layout(size: int, part_size: Optional[int] = None) -> Dict[str, int]:
+    """Split an object of `size` bytes into parts.
+
+    Every part but the last must be at least 5 MiB and there are at most 10000,
+    so the part size grows for very large objects.
+
+    Returns:
+        Dict[str, int]: The 'part_size' and the number of 'parts'.
+    """
+    if not isinstance(size, int) or size <= 0 or size > MAX_OBJECT_SIZE:
+        raise ValueError("'size' must be a positive integer of at most 5 TiB.")
+    part_size = part_size or DEFAULT_PART_SIZE
+    if not isinstance(part_size, int) or part_size < MIN_PART_SIZE:
+        raise ValueError(f"'part_size' must be at least {MIN_PART_SIZE} bytes.")
+    part_size = max(part_size, math.ceil(size / MAX_PARTS))
+    return {"part_size": part_size, "parts": math.ceil(size / part_size)}
+
+
+def presign_parts(
+    s3_client, bucket: str, key: str, upload_id: str, part_numbers: List[int], expires_in: int
+) -> List[Dict]:
+    # Signed locally, no request is sent to S3
+    return [
+        {
+            "part_number": part_number,
+            "url": s3_client.generate_presigned_url(
+                "upload_part",
+                Params={"Bucket": bucket, "Key": key, "UploadId": upload_id, "PartNumber": part_number},
+                ExpiresIn=expires_in,
+            ),
+        }
+        for part_number in part_numbers
+    ]
+
+
+def list_uploaded_parts(s3_client, bucket: str, key: str, upload_id: str) -> List[Dict]:
+    """List the parts already uploaded, in order, with their ETag and size."""
+    parts = []
+    request = {"Bucket": bucket, "Key": key, "UploadId": upload_id}
+    while True:
+        response = s3_client.list_parts(**request)
+        parts += [
+            {"part_number": part["PartNumber"], "etag": part["ETag"], "size": part["Size"]}
+            for part in response.get("Parts", [])
+        ]
+        if not response.get("IsTruncated"):
+            return parts
+        request["PartNumberMarker"] = response["NextPartNumberMarker"]
+
+
+def load_parts(parts) -> List[Dict]:
+    """Validate the parts sent to complete an upload, as S3 expects them."""
+    if not isinstance(parts, list) or not parts:
+        raise ValueError("'parts' must be a non empty list.")
+    completed = {}
+    for part in parts:
+        if not isinstance(part, dict):
+            raise ValueError("Each part should have a 'part_number' and an 'etag'.")
+        part_number, etag = part.get("part_number"), part.get("etag")
+        if not isinstance(part_number, int) or not 1 <= part_number <= MAX_PARTS or not etag:
+            raise ValueError("Each part should have a 'part_number' and an 'etag'.")
+        completed[part_number] = etag
+    return [{"PartNumber": number, "ETag": completed[number]} for number in sorted(completed)]
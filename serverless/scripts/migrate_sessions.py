@@ -0,0 +1,85 @@
+"""Copy the single-item sessions of the previous memory table to the item per
+message layout.
+
+The previous table stores each session as one item with the whole `messages`
+list. Every session is written to the target table as a metadata item plus one
+item per message, keeping its metadata, created_at and deleted flag. Live
+sessions get owner_id and message_count, which the live sessions index needs.
+Running it again rewrites the same items, so an interrupted run can be resumed.
+
+Run it from the serverless directory with credentials for both tables:
+
+    python -m scripts.migrate_sessions --source <old table> --target <MEMORY_TABLE_NAME>
+"""
+import argparse
+import datetime
+
+import boto3
+
+from common.utils.memory_utils import META_SK, meta_key, put_messages, session_owner
+
+
+def migrate_item(target_table, item: dict) -> int:
+    """Write one single-item session to the target table.
+
+    Returns:
+        int: The number of migrated messages.
+    """
+    messages = [msg for msg in item.get("messages", []) if msg.get("role") and "content" in msg]
+    is_deleted = bool(item.get("is_deleted", False))
+    meta = {
+        **meta_key(item["pk"]),
+        "metadata": item.get("metadata", {}),
+        "is_deleted": is_deleted,
+        "created_at": item.get("created_at") or datetime.datetime.now().isoformat(),
+        "message_count": len(messages),
+        "next_seq": len(messages),
+    }
+    if not is_deleted:
+        # Deleted sessions stay out of the live sessions index
+        meta["owner_id"] = session_owner(item.get("metadata"))
+
+    put_messages(target_table, item["pk"], messages, 0)
+    # Written last, a session only shows up once all its messages are there
+    target_table.put_item(Item=meta)
+    return len(messages)
+
+
+def migrate(source_table, target_table, dry_run: bool = False) -> dict:
+    stats = {"sessions": 0, "messages": 0, "skipped": 0}
+    scan = {}
+    while True:
+        response = source_table.scan(**scan)
+        for item in response.get("Items", []):
+            if item.get("sk") == META_SK or not str(item.get("pk", "")).startswith("SESSION#"):
+                # Already in the new layout or not a session
+                stats["skipped"] += 1
+                continue
+            stats["sessions"] += 1
+            if dry_run:
+                stats["messages"] += len(item.get("messages", []))
+            else:
+                stats["messages"] += migrate_item(target_table, item)
+
+        if "LastEvaluatedKey" not in response:
+            return stats
+        scan["ExclusiveStartKey"] = response["LastEvaluatedKey"]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--source", required=True, help="Previous memory table, one item per session.")
+    parser.add_argument("--target", required=True, help="New memory table, one item per message.")
+    parser.add_argument("--dry-run", action="store_true", help="Count the sessions without writing.")
+    args = parser.parse_args()
+
+    dynamodb = boto3.resource("dynamodb")
+    stats = migrate(dynamodb.Table(args.source), dynamodb.Table(args.target), dry_run=args.dry_run)
+    print(
+        f"Migrated {stats['sessions']} sessions with {stats['messages']} messages, "
+        f"skipped {stats['skipped']} items."
+    )
+
+
+if __name__ == "__main__":
+    main()
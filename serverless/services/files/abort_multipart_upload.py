@@ -0,0 +1,34 @@
+import os
+import boto3
+
+from common.utils.lambda_utils import load_path_parameter_from_event, load_query_parameter_from_event
+from common.utils.error_handler import error_response, internal_server_error, not_found_error
+from common.utils.response_utils import success_response
+
+s3_client = boto3.client("s3")
+s3_bucket_name = os.getenv("S3_BUCKET_NAME")
+
+
+def parse_and_validate(event):
+    upload_id = load_path_parameter_from_event(event, "upload_id")
+    s3_key = load_query_parameter_from_event(event, "key")
+    if not upload_id or not s3_key:
+        raise ValueError("The 'upload_id' path parameter and the 'key' query parameter are required.")
+    return upload_id, s3_key
+
+
+def lambda_handler(event, context):
+    try:
+        upload_id, s3_key = parse_and_validate(event)
+    except ValueError as e:
+        return error_response(str(e))
+
+    try:
+        # Frees the stored parts, they are billed until the upload is completed or aborted
+        s3_client.abort_multipart_upload(Bucket=s3_bucket_name, Key=s3_key, UploadId=upload_id)
+    except s3_client.exceptions.NoSuchUpload:
+        return not_found_error()
+    except Exception as e:
+        return internal_server_error()
+
+    return success_response({"keyFile": s3_key, "upload_id": upload_id, "aborted": True})
@@ -0,0 +1,46 @@
+import os
+import boto3
+
+from common.utils.lambda_utils import load_body_from_event, load_path_parameter_from_event
+from common.utils.error_handler import error_response, internal_server_error, not_found_error
+from common.utils.response_utils import success_response
+from common.utils.s3_utils import load_parts
+
+s3_client = boto3.client("s3")
+s3_bucket_name = os.getenv("S3_BUCKET_NAME")
+
+
+def parse_and_validate(event):
+    upload_id = load_path_parameter_from_event(event, "upload_id")
+    body = load_body_from_event(event)
+    s3_key = body.get("key")
+    if not upload_id or not s3_key:
+        raise ValueError("The 'upload_id' path parameter and the body 'key' are required.")
+    return upload_id, s3_key, load_parts(body.get("parts"))
+
+
+def lambda_handler(event, context):
+    try:
+        upload_id, s3_key, parts = parse_and_validate(event)
+    except ValueError as e:
+        return error_response(str(e))
+
+    try:
+        res = s3_client.complete_multipart_upload(
+            Bucket=s3_bucket_name,
+            Key=s3_key,
+            UploadId=upload_id,
+            MultipartUpload={"Parts": parts},
+        )
+    except s3_client.exceptions.NoSuchUpload:
+        return not_found_error()
+    except s3_client.exceptions.ClientError as e:
+        # A missing part, a wrong ETag or a part under 5 MiB
+        if e.response["Error"]["Code"] in ("InvalidPart", "InvalidPartOrder", "EntityTooSmall"):
+            return error_response(e.response["Error"]["Message"])
+        return internal_server_error()
+    except Exception as e:
+        return internal_server_error()
+
+    body = {"keyFile": s3_key, "etag": res.get("ETag"), "parts": len(parts)}
+    return success_response(body)
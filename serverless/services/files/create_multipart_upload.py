@@ -0,0 +1,52 @@
+import os
+import datetime
+import boto3
+
+from common.utils.lambda_utils import load_body_from_event
+from common.utils.error_handler import error_response, internal_server_error
+from common.utils.response_utils import success_response
+from common.utils.s3_utils import MAX_PRESIGNED_PARTS, load_expires_in, part_layout, presign_parts
+
+s3_client = boto3.client("s3")
+s3_bucket_name = os.getenv("S3_BUCKET_NAME")
+
+
+def parse_and_validate(event):
+    body = load_body_from_event(event)
+    s3_key = body.get("key")
+    if not s3_key or not isinstance(s3_key, str):
+        raise ValueError("Body 'key' is required.")
+
+    layout = part_layout(body.get("size"), body.get("part_size"))
+    s3_expiresin = load_expires_in(body.get("expiresIn"))
+    content_type = body.get("content_type") or "application/octet-stream"
+    return s3_key, layout, s3_expiresin, content_type
+
+
+def lambda_handler(event, context):
+    try:
+        s3_key, layout, s3_expiresin, content_type = parse_and_validate(event)
+    except ValueError as e:
+        return error_response(str(e))
+
+    try:
+        upload = s3_client.create_multipart_upload(
+            Bucket=s3_bucket_name, Key=s3_key, ContentType=content_type
+        )
+        upload_id = upload["UploadId"]
+        # The parts are presigned upfront, the client uploads them in parallel
+        part_numbers = list(range(1, min(layout["parts"], MAX_PRESIGNED_PARTS) + 1))
+        urls = presign_parts(s3_client, s3_bucket_name, s3_key, upload_id, part_numbers, s3_expiresin)
+    except Exception as e:
+        return internal_server_error()
+
+    body = {
+        "upload_id": upload_id,
+        "keyFile": s3_key,
+        "part_size": layout["part_size"],
+        "part_count": layout["parts"],
+        "parts": urls,
+        "expiresIn": s3_expiresin,
+        "created_at": datetime.datetime.now().isoformat(),
+    }
+    return success_response(body)
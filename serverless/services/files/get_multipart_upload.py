@@ -0,0 +1,54 @@
+import os
+import boto3
+
+from common.utils.lambda_utils import load_path_parameter_from_event, load_query_parameter_from_event
+from common.utils.error_handler import error_response, internal_server_error, not_found_error
+from common.utils.response_utils import success_response
+from common.utils.s3_utils import MAX_PARTS, MAX_PRESIGNED_PARTS, list_uploaded_parts, load_expires_in, presign_parts
+
+s3_client = boto3.client("s3")
+s3_bucket_name = os.getenv("S3_BUCKET_NAME")
+
+
+def parse_and_validate(event):
+    upload_id = load_path_parameter_from_event(event, "upload_id")
+    s3_key = load_query_parameter_from_event(event, "key")
+    if not upload_id or not s3_key:
+        raise ValueError("The 'upload_id' path parameter and the 'key' query parameter are required.")
+
+    try:
+        parts = int(load_query_parameter_from_event(event, "parts", 0))
+    except ValueError:
+        raise ValueError("'parts' must be a valid integer.")
+    if parts < 0 or parts > MAX_PARTS:
+        raise ValueError(f"'parts' must be between 0 and {MAX_PARTS}.")
+
+    s3_expiresin = load_expires_in(load_query_parameter_from_event(event, "expiresIn"))
+    return upload_id, s3_key, parts, s3_expiresin
+
+
+def lambda_handler(event, context):
+    try:
+        upload_id, s3_key, parts, s3_expiresin = parse_and_validate(event)
+    except ValueError as e:
+        return error_response(str(e))
+
+    try:
+        uploaded = list_uploaded_parts(s3_client, s3_bucket_name, s3_key, upload_id)
+        # Fresh URLs for the missing parts, the first ones may have expired
+        done = {part["part_number"] for part in uploaded}
+        missing = [number for number in range(1, parts + 1) if number not in done][:MAX_PRESIGNED_PARTS]
+        urls = presign_parts(s3_client, s3_bucket_name, s3_key, upload_id, missing, s3_expiresin)
+    except s3_client.exceptions.NoSuchUpload:
+        return not_found_error()
+    except Exception as e:
+        return internal_server_error()
+
+    body = {
+        "upload_id": upload_id,
+        "keyFile": s3_key,
+        "uploaded": uploaded,
+        "parts": urls,
+        "expiresIn": s3_expiresin,
+    }
+    return success_response(body)
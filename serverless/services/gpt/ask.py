@@ -1,8 +1,14 @@
+from common.utils.metrics_utils import ColdStartTracker
+
+# Started first so the init duration covers every import below
+cold_start = ColdStartTracker("gpt_ask")
+
 import os
 import openai
 
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional, Tuple
 from .src.models import OpenAIModel
+from .src.cache import CompletionCache, DynamoDBCache, LRUCache, cache_key
 
 from common.utils.lambda_utils import load_body_from_event
 from common.utils.error_handler import error_response, internal_server_error
@@ -13,6 +19,55 @@ API_KEY = os.getenv("OPENAI_API_KEY")
 MODEL_ENGINE = os.getenv("OPENAI_GPTMODEL")
 TEMPERATURE = int(os.getenv("OPENAI_TEMPERATURE", 0))
 MAX_TOKENS = int(os.getenv("OPENAI_TOKENS", 0))
+BASE_URL = os.getenv("OPENAI_BASE_URL")
+# Every attempt, timeout * (retries + 1), has to end before the 10s function
+# timeout with time left for the memory table, so a slow call fails with a
+# clear error instead of the function being killed
+REQUEST_TIMEOUT = float(os.getenv("OPENAI_REQUEST_TIMEOUT", 8))
+MAX_RETRIES = int(os.getenv("OPENAI_MAX_RETRIES", 0))
+COMPLETION_CACHE_TABLE_NAME = os.getenv("COMPLETION_CACHE_TABLE_NAME")
+COMPLETION_CACHE_TTL = int(os.getenv("COMPLETION_CACHE_TTL", 86400))
+COMPLETION_CACHE_MAX_ENTRIES = int(os.getenv("COMPLETION_CACHE_MAX_ENTRIES", 256))
+# Sampling with a temperature above 0 is expected to vary, so it is not cached by default
+COMPLETION_CACHE_ANY_TEMPERATURE = os.getenv("COMPLETION_CACHE_ANY_TEMPERATURE", "false").lower() == "true"
+
+
+def build_model() -> OpenAIModel:
+    return OpenAIModel(
+        api_key=API_KEY,
+        model_engine=MODEL_ENGINE,
+        temperature=TEMPERATURE,
+        max_tokens=MAX_TOKENS,
+        base_url=BASE_URL,
+        request_timeout=REQUEST_TIMEOUT,
+        max_retries=MAX_RETRIES,
+    )
+
+
+def build_completion_cache() -> CompletionCache:
+    tiers = [LRUCache(max_entries=COMPLETION_CACHE_MAX_ENTRIES, ttl=COMPLETION_CACHE_TTL)]
+    if COMPLETION_CACHE_TABLE_NAME:
+        import boto3
+
+        table = boto3.resource("dynamodb").Table(COMPLETION_CACHE_TABLE_NAME)
+        tiers.append(DynamoDBCache(table, ttl=COMPLETION_CACHE_TTL))
+    return CompletionCache(tiers)
+
+
+def warm_up(model: OpenAIModel) -> None:
+    # Init runs at full CPU before any request is waiting, create the client there
+    try:
+        model.client
+    except openai.OpenAIError as e:
+        # e.g. a missing API key, the handler reports it on the first request
+        print(f"Error creating the OpenAI client: {e}")
+
+
+# Built once per container: warm invocations reuse the OpenAI client with its
+# connection pool and share the in-memory cache tier
+model = build_model()
+warm_up(model)
+completion_cache = build_completion_cache()
 
 
 def parse_and_validate(event: Dict[str, Any]) -> List[Dict[str, str]]:
@@ -32,23 +87,41 @@ def parse_and_validate(event: Dict[str, Any]) -> List[Dict[str, str]]:
     return messages
 
 
+def cached_chat_completion(
+    model: OpenAIModel, messages: List[Dict[str, str]]
+) -> Tuple[Dict[str, str], str, Optional[str]]:
+    """Chat completion through the completion cache.
+
+    Returns:
+        Tuple: The model response, the cache status ('hit', 'miss' or 'bypass')
+        and the cache tier that served a hit.
+    """
+    cacheable = COMPLETION_CACHE_ANY_TEMPERATURE or model.temperature == 0
+    key = cache_key(model.model_engine, model.temperature, model.max_tokens, messages)
+    res, cache_tier = completion_cache.get(key) if cacheable else (None, None)
+    if res is not None:
+        return res, "hit", cache_tier
+
+    res = model.chat_completion(messages)
+    if cacheable and res.get("status") == "success":
+        completion_cache.set(key, res)
+    return res, "miss" if cacheable else "bypass", None
+
+
+@cold_start.measure
 def lambda_handler(event, context):
     try:
         messages = parse_and_validate(event)
-        model = OpenAIModel(
-            api_key=os.getenv("OPENAI_API_KEY"),
-            model_engine=os.getenv("OPENAI_GPTMODEL"),
-            temperature=int(os.getenv("OPENAI_TEMPERATURE")),
-            max_tokens=int(os.getenv("OPENAI_TOKENS")),
-        )
-
-        res = model.chat_completion(messages)
+
+        res, cache_status, cache_tier = cached_chat_completion(model, messages)
         if res.get("status") != "success":
             error_content = res["content"]
             return error_response(error_content)
         else:
             messages.append({"role": res["role"], "content": res["content"]})
             body = {
+                "cache": cache_status,
+                "cache_tier": cache_tier,
                 "context": str(model),
                 "last_message": {
                     "role": res["role"],
@@ -64,3 +137,6 @@ def lambda_handler(event, context):
         return error_response(str(e))
     except Exception as e:
         return internal_server_error()
+
+
+cold_start.init_done()
@@ -0,0 +1,119 @@
+from common.utils.metrics_utils import ColdStartTracker
+
+cold_start = ColdStartTracker("gpt_ask_session")
+
+import os
+import openai
+
+from typing import Dict, Any, List, Optional, Tuple
+
+from .ask import cached_chat_completion, model
+from .src.models import OpenAIModel
+
+from common.utils.dynamodb_utils import get_memory_table
+from common.utils.lambda_utils import load_body_from_event, load_path_parameter_from_event
+from common.utils.error_handler import error_response, internal_server_error, not_found_error
+from common.utils.memory_utils import (
+    append_session_messages,
+    clean_message,
+    get_session_meta,
+    query_messages,
+    session_key,
+)
+from common.utils.response_utils import success_response
+
+memory_table = get_memory_table()
+# Only the last N turns are sent to the model, 0 sends the whole history
+MAX_HISTORY_MESSAGES = int(os.getenv("MAX_HISTORY_MESSAGES", 0))
+
+
+def validate_message(message: Any) -> None:
+    if not isinstance(message, dict) or not message.get("role") or not message.get("content"):
+        raise ValueError("Each message should have 'role' and 'content' keys.")
+
+
+def parse_and_validate(event: Dict[str, Any]) -> Tuple[str, Dict, List[Dict], Dict, Optional[str]]:
+    session_id = load_path_parameter_from_event(event, "session_id")
+    if not session_id:
+        raise ValueError("session_id is required")
+
+    body = load_body_from_event(event)
+    message = body.get("message")
+    validate_message(message)
+
+    # Messages stored before the new one: the assistant prompt that opens a new
+    # session, or turns the bot added itself such as a transcription
+    prefix = body.get("prefix", [])
+    if not isinstance(prefix, list):
+        raise ValueError("Body 'prefix' must be a list.")
+    for msg in prefix:
+        validate_message(msg)
+
+    metadata = body.get("metadata", {})
+    if not isinstance(metadata, dict):
+        raise ValueError("Body 'metadata' must be an object.")
+
+    # Sent to the model in place of the message content but not stored, e.g. the
+    # transcription excerpts retrieved for the question
+    prompt_content = body.get("prompt_content")
+    if prompt_content is not None and not isinstance(prompt_content, str):
+        raise ValueError("Body 'prompt_content' must be a string.")
+
+    return session_key(session_id), message, prefix, metadata, prompt_content
+
+
+def load_history(pk: str) -> List[Dict]:
+    if MAX_HISTORY_MESSAGES <= 0:
+        return query_messages(memory_table, pk, consistent=True)
+    # The assistant prompt that opens the session and the last turns, read as two
+    # ranges so the cost does not grow with the session
+    head = query_messages(memory_table, pk, first=1, consistent=True)
+    tail = []
+    if MAX_HISTORY_MESSAGES > 1:
+        # The new message takes the last place of the window
+        tail = query_messages(memory_table, pk, last=MAX_HISTORY_MESSAGES - 1, consistent=True)
+    return head + [msg for msg in tail if not head or msg["seq"] > head[-1]["seq"]]
+
+
+@cold_start.measure
+def lambda_handler(event, context):
+    try:
+        pk, message, prefix, metadata, prompt_content = parse_and_validate(event)
+
+        session = get_session_meta(memory_table, pk)
+        if session and session.get("is_deleted"):
+            return not_found_error()
+
+        history = (load_history(pk) if session else []) + prefix
+        prompt = [clean_message(msg) for msg in history]
+        prompt.append({"role": message["role"], "content": prompt_content or message["content"]})
+
+        res, cache_status, cache_tier = cached_chat_completion(model, prompt)
+        if res.get("status") != "success":
+            return error_response(res["content"])
+
+        last_message = {"role": res["role"], "content": res["content"]}
+        new_messages = [*prefix, message, last_message]
+        append_session_messages(memory_table, pk, new_messages, metadata)
+
+        body = {
+            "cache": cache_status,
+            "cache_tier": cache_tier,
+            "context": str(model),
+            "session_id": pk.replace("SESSION#", ""),
+            "last_message": last_message,
+            "memory_count": (int(session["message_count"]) if session else 0) + len(new_messages),
+        }
+        return success_response(body)
+    except memory_table.meta.client.exceptions.ConditionalCheckFailedException:
+        # The session was deleted while the answer was generated
+        return not_found_error()
+    except ValueError as e:
+        return error_response(str(e))
+    except openai.OpenAIError as e:
+        return error_response(OpenAIModel.error_message(e))
+    except Exception as e:
+        return internal_server_error()
+
+
+cold_start.init_done()
@@ -0,0 +1,111 @@
+"""Streaming variant of the gpt_ask function.
+
+API Gateway REST APIs buffer the whole Lambda response, so this module runs a small
+HTTP server behind the AWS Lambda Web Adapter and a RESPONSE_STREAM function URL.
+The response body is newline delimited JSON, one event per line:
+
+    {"type": "delta", "content": "..."}
+    {"type": "done", "context": "...", "last_message": {"role": "assistant", "content": "..."}}
+    {"type": "error", "message": "..."}
+
+Run it locally from the serverless directory with `python -m services.gpt.ask_stream`.
+"""
+import hmac
+import json
+import os
+import openai
+
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Iterator, List
+
+from .ask import model as default_model, parse_and_validate
+from .src.models import ModelInterface, OpenAIModel
+
+
+STREAM_API_KEY = os.getenv("STREAM_API_KEY")
+STREAM_API_KEY_HEADER = os.getenv("STREAM_API_KEY_HEADER", "x-api-key")
+STREAM_PATHS = ("", "/gpt/ask/stream")
+PORT = int(os.getenv("PORT", 8080))
+
+
+def encode_event(event: Dict) -> bytes:
+    return (json.dumps(event) + "\n").encode("utf-8")
+
+
+def stream_events(messages: List[Dict[str, str]], model: ModelInterface) -> Iterator[bytes]:
+    """Yield the NDJSON events of a streamed chat completion."""
+    parts = []
+    try:
+        for delta in model.chat_completion_stream(messages):
+            parts.append(delta)
+            yield encode_event({"type": "delta", "content": delta})
+    except ValueError as e:
+        yield encode_event({"type": "error", "message": str(e)})
+    except openai.OpenAIError as e:
+        yield encode_event({"type": "error", "message": OpenAIModel.error_message(e)})
+    except Exception:
+        yield encode_event({"type": "error", "message": "Internal server error."})
+    else:
+        last_message = {"role": "assistant", "content": "".join(parts)}
+        yield encode_event({"type": "done", "context": str(model), "last_message": last_message})
+
+
+class StreamHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def _send_json(self, status: int, body: Dict) -> None:
+        data = json.dumps(body).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _write_chunk(self, data: bytes) -> None:
+        self.wfile.write(f"{len(data):X}\r\n".encode("ascii") + data + b"\r\n")
+        self.wfile.flush()
+
+    def _is_authorized(self) -> bool:
+        if not STREAM_API_KEY:
+            return True
+        received = self.headers.get(STREAM_API_KEY_HEADER, "")
+        return hmac.compare_digest(received, STREAM_API_KEY)
+
+    def do_GET(self):
+        # Readiness check used by the Lambda Web Adapter
+        self._send_json(200, {"message": "Health check successful"})
+
+    def do_POST(self):
+        if self.path.split("?")[0].rstrip("/") not in STREAM_PATHS:
+            return self._send_json(404, {"message": "The specified resource was not found."})
+        if not self._is_authorized():
+            return self._send_json(403, {"message": "Forbidden"})
+
+        length = int(self.headers.get("Content-Length", 0))
+        body = self.rfile.read(length).decode("utf-8")
+        try:
+            messages = parse_and_validate({"body": body})
+        except ValueError as e:
+            return self._send_json(400, {"message": str(e)})
+
+        self.send_response(200)
+        self.send_header("Content-Type", "application/x-ndjson")
+        self.send_header("Cache-Control", "no-cache")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        for event in stream_events(messages, self.server.model):
+            self._write_chunk(event)
+        self._write_chunk(b"")
+
+    def log_message(self, format, *args):
+        print(f"{self.address_string()} {format % args}")
+
+
+def create_server(port: int = PORT, model: ModelInterface = None) -> ThreadingHTTPServer:
+    server = ThreadingHTTPServer(("0.0.0.0", port), StreamHandler)
+    server.model = model or default_model
+    return server
+
+
+if __name__ == "__main__":
+    create_server().serve_forever()
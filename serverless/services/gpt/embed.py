@@ -0,0 +1,55 @@
+import os
+import openai
+
+from typing import List, Dict, Any
+from .src.models import OpenAIModel
+
+from common.utils.lambda_utils import load_body_from_event
+from common.utils.error_handler import error_response, internal_server_error
+from common.utils.response_utils import success_response
+
+
+MAX_TEXTS = 256
+
+# Built once per container so warm invocations reuse the client connection pool
+model = OpenAIModel(
+    api_key=os.getenv("OPENAI_API_KEY"),
+    model_engine=os.getenv("OPENAI_GPTMODEL"),
+    temperature=int(os.getenv("OPENAI_TEMPERATURE", 0)),
+    max_tokens=int(os.getenv("OPENAI_TOKENS", 0)),
+    embedding_engine=os.getenv("OPENAI_EMBEDDING_MODEL"),
+    # A single attempt that ends before the 10s function timeout
+    request_timeout=float(os.getenv("OPENAI_REQUEST_TIMEOUT", 8)),
+    max_retries=int(os.getenv("OPENAI_MAX_RETRIES", 0)),
+)
+
+
+def parse_and_validate(event: Dict[str, Any]) -> List[str]:
+    texts = load_body_from_event(event).get("texts")
+
+    if not texts or not isinstance(texts, list):
+        raise ValueError("Body 'texts' must be a non empty list.")
+
+    if len(texts) > MAX_TEXTS:
+        raise ValueError(f"Body 'texts' must have at most {MAX_TEXTS} items.")
+
+    for text in texts:
+        if not isinstance(text, str) or not text.strip():
+            raise ValueError("Every text should be a non empty string.")
+    return texts
+
+
+def lambda_handler(event, context):
+    try:
+        texts = parse_and_validate(event)
+        body = {
+            "model": model.embedding_engine,
+            "embeddings": model.embeddings(texts),
+        }
+        return success_response(body)
+    except ValueError as e:
+        return error_response(str(e))
+    except openai.OpenAIError as e:
+        return error_response(OpenAIModel.error_message(e))
+    except Exception as e:
+        return internal_server_error()
@@ -0,0 +1,3 @@
+#!/bin/sh
+# Entry point for the Lambda Web Adapter, see services/gpt/ask_stream.py
+exec python3 -m services.gpt.ask_stream
@@ -0,0 +1,135 @@
+import hashlib
+import json
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+
+def cache_key(model_engine: str, temperature: Any, max_tokens: int, messages: List[Dict]) -> str:
+    """Canonical hash of everything that determines a chat completion.
+
+    Only the chat schema fields of the messages are hashed, so bookkeeping keys
+    such as 'user_id' do not split otherwise identical requests.
+    """
+    canonical_messages = [
+        {key: msg[key] for key in ("role", "content", "name") if key in msg}
+        for msg in messages
+    ]
+    canonical = json.dumps(
+        {
+            "model_engine": model_engine,
+            "temperature": temperature,
+            "max_tokens": max_tokens,
+            "messages": canonical_messages,
+        },
+        sort_keys=True,
+        separators=(",", ":"),
+        ensure_ascii=False,
+    )
+    return hashlib.sha256(canonical.encode("utf-8")).hexdigest()
+
+
+class CacheInterface:
+    name = "cache"
+
+    def get(self, key: str) -> Optional[Dict]:
+        """Get a cached completion or None if it is missing or expired."""
+        raise NotImplementedError("This method should be overridden by subclasses")
+
+    def set(self, key: str, value: Dict) -> None:
+        """Store a completion."""
+        raise NotImplementedError("This method should be overridden by subclasses")
+
+
+class LRUCache(CacheInterface):
+    """In-container tier. It lives as long as the warm Lambda container."""
+
+    name = "memory"
+
+    def __init__(self, max_entries: int = 256, ttl: int = 3600, clock: Callable[[], float] = time.time):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.clock = clock
+        self.items: "OrderedDict[str, Tuple[float, Dict]]" = OrderedDict()
+
+    def get(self, key: str) -> Optional[Dict]:
+        item = self.items.get(key)
+        if item is None:
+            return None
+        expires_at, value = item
+        if expires_at <= self.clock():
+            del self.items[key]
+            return None
+        self.items.move_to_end(key)
+        return value
+
+    def set(self, key: str, value: Dict) -> None:
+        self.items[key] = (self.clock() + self.ttl, value)
+        self.items.move_to_end(key)
+        while len(self.items) > self.max_entries:
+            self.items.popitem(last=False)
+
+
+class DynamoDBCache(CacheInterface):
+    """Shared tier. Items expire through the table TTL on 'expires_at'."""
+
+    name = "dynamodb"
+
+    def __init__(self, table, ttl: int = 86400, clock: Callable[[], float] = time.time):
+        self.table = table
+        self.ttl = ttl
+        self.clock = clock
+
+    @staticmethod
+    def _key(key: str) -> Dict[str, str]:
+        return {"pk": f"COMPLETION#{key}"}
+
+    def get(self, key: str) -> Optional[Dict]:
+        item = self.table.get_item(Key=self._key(key)).get("Item")
+        # DynamoDB deletes expired items lazily, so check the expiry as well
+        if not item or int(item.get("expires_at", 0)) <= self.clock():
+            return None
+        return item["response"]
+
+    def set(self, key: str, value: Dict) -> None:
+        item = {
+            **self._key(key),
+            "response": value,
+            "expires_at": int(self.clock() + self.ttl),
+        }
+        self.table.put_item(Item=item)
+
+
+class CompletionCache:
+    """Read-through lookup over the cache tiers, fastest first.
+
+    A hit in a slower tier is copied into the faster ones. Cache failures are
+    logged and treated as misses so they never fail the completion itself.
+    """
+
+    def __init__(self, tiers: List[CacheInterface]):
+        self.tiers = tiers
+
+    def get(self, key: str) -> Tuple[Optional[Dict], Optional[str]]:
+        for index, tier in enumerate(self.tiers):
+            try:
+                value = tier.get(key)
+            except Exception as e:
+                print(f"Error reading completion cache ({tier.name}): {e}")
+                continue
+            if value is not None:
+                for faster in self.tiers[:index]:
+                    self._set(faster, key, value)
+                return value, tier.name
+        return None, None
+
+    def set(self, key: str, value: Dict) -> None:
+        for tier in self.tiers:
+            self._set(tier, key, value)
+
+    @staticmethod
+    def _set(tier: CacheInterface, key: str, value: Dict) -> None:
+        try:
+            tier.set(key, value)
+        except Exception as e:
+            print(f"Error writing completion cache ({tier.name}): {e}")
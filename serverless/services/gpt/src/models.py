@@ -1,4 +1,4 @@
-from typing import List
+from typing import Iterator, List, Optional
 import openai
 import json
 
@@ -14,32 +14,113 @@ class ModelInterface:
         """
         pass
 
+    def chat_completion_stream(self, messages: List) -> Iterator[str]:
+        """Stream a chat completion as it is generated.
+        Args:
+            messages (list): List of messages with openai formatting.
+
+        Returns:
+            Iterator[str]: Content deltas in generation order.
+        """
+        raise NotImplementedError("This method should be overridden by subclasses")
+
+    def embeddings(self, texts: List[str]) -> List[List[float]]:
+        """Embed texts with the embedding model.
+        Args:
+            texts (list): Texts to embed.
+
+        Returns:
+            List[List[float]]: One embedding vector per text, in order.
+        """
+        raise NotImplementedError("This method should be overridden by subclasses")
+
 
 class OpenAIModel(ModelInterface):
     def __init__(
-        self, api_key: str, model_engine: str, temperature: str, max_tokens: int
+        self,
+        api_key: str,
+        model_engine: str,
+        temperature: str,
+        max_tokens: int,
+        base_url: Optional[str] = None,
+        embedding_engine: Optional[str] = None,
+        request_timeout: float = 60.0,
+        max_retries: int = 2,
     ):
         super().__init__()
-        openai.api_key = api_key
+        self.api_key = api_key
+        self.base_url = base_url
+        self.request_timeout = request_timeout
+        self.max_retries = max_retries
+        self.embedding_engine = embedding_engine or "text-embedding-3-small"
         self.model_engine = model_engine or "gpt-3.5-turbo-1106"
         self.temperature = temperature
         self.max_tokens = max_tokens
+        self._client = None
 
     def __str__(self) -> str:
         return f"Model: OpenAI. Engine: {self.model_engine}. Temperature: {self.temperature}. Max Tokens: {self.max_tokens}."
 
-    def chat_completion(self, messages: List):
+    @property
+    def client(self) -> "openai.OpenAI":
+        if self._client is None:
+            # The client owns an HTTP connection pool, keep one per model
+            self._client = openai.OpenAI(
+                api_key=self.api_key,
+                base_url=self.base_url,
+                timeout=self.request_timeout,
+                max_retries=self.max_retries,
+            )
+        return self._client
+
+    @staticmethod
+    def error_message(error: Exception) -> str:
+        # Convert the exception to a string to get the error message
+        error_message_str = str(error)
+        # If the error message is JSON-like, you can parse it to extract detailed information
         try:
-            if not messages:
-                raise ValueError("Messages should not be empty.")
+            error_details = json.loads(error_message_str.split(" - ", 1)[1])
+            return error_details.get("error", {}).get("message", "")
+        except (IndexError, ValueError, KeyError, AttributeError):
+            # Fallback to the entire error string if parsing fails
+            return error_message_str
+
+    @staticmethod
+    def _validate_messages(messages: List) -> None:
+        if not messages:
+            raise ValueError("Messages should not be empty.")
+
+        if not isinstance(messages, List):
+            raise ValueError("Messages should be a list.")
+
+        if not messages[0].get("content"):
+            raise ValueError("Content should not be empty.")
 
-            if not isinstance(messages, List):
-                raise ValueError("Messages should be a list.")
+    def chat_completion_stream(self, messages: List) -> Iterator[str]:
+        self._validate_messages(messages)
+        stream = self.client.chat.completions.create(
+            model=self.model_engine,
+            messages=messages,
+            temperature=self.temperature,
+            max_tokens=self.max_tokens,
+            stream=True,
+        )
+        for chunk in stream:
+            if chunk.choices and chunk.choices[0].delta.content:
+                yield chunk.choices[0].delta.content
 
-            if not messages[0].get("content"):
-                raise ValueError("Content should not be empty.")
+    def embeddings(self, texts: List[str]) -> List[List[float]]:
+        if not texts or not isinstance(texts, list):
+            raise ValueError("Texts should be a non empty list.")
 
-            chat = openai.ChatCompletion.create(
+        res = self.client.embeddings.create(model=self.embedding_engine, input=texts)
+        return [item.embedding for item in sorted(res.data, key=lambda item: item.index)]
+
+    def chat_completion(self, messages: List):
+        try:
+            self._validate_messages(messages)
+
+            chat = self.client.chat.completions.create(
                 model=self.model_engine,
                 messages=messages,
                 temperature=self.temperature,
@@ -63,20 +144,10 @@ class OpenAIModel(ModelInterface):
                     "content": "No response from model. Please try again.",
                 }
         except openai.OpenAIError as e:
-            # Convert the exception to a string to get the error message
-            error_message_str = str(e)
-            # If the error message is JSON-like, you can parse it to extract detailed information
-            try:
-                error_details = json.loads(error_message_str.split(" - ", 1)[1])
-                error_message = error_details.get("error", {}).get("message", "")
-            except (IndexError, ValueError, KeyError):
-                # Fallback to the entire error string if parsing fails
-                error_message = error_message_str
-
             return {
                 "status": "error",
                 "role": "assistant",
-                "content": error_message,
+                "content": self.error_message(e),
             }
         except ValueError as ve:
             return {
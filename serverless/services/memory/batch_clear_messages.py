@@ -0,0 +1,25 @@
+from common.utils.lambda_utils import load_body_from_event
+from common.utils.error_handler import error_response, internal_server_error
+from common.utils.memory_utils import clear_sessions, load_session_ids
+from common.utils.dynamodb_utils import get_dynamodb, get_memory_table
+from common.utils.response_utils import success_response
+
+dynamodb = get_dynamodb()
+memory_table = get_memory_table()
+
+
+def parse_and_validate(event):
+    return load_session_ids(load_body_from_event(event))
+
+
+def lambda_handler(event, context):
+    try:
+        pks = parse_and_validate(event)
+
+        # {"cleared": [...], "not_found": [...], "failed": [...]}
+        body = clear_sessions(dynamodb, memory_table, pks)
+        return success_response(body)
+    except ValueError as e:
+        return error_response(str(e))
+    except Exception as e:
+        return internal_server_error()
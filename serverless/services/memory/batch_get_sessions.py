@@ -0,0 +1,33 @@
+from common.utils.lambda_utils import load_body_from_event
+from common.utils.error_handler import error_response, internal_server_error
+from common.utils.memory_utils import get_live_session_metas, load_session_ids, session_id_of
+from common.utils.dynamodb_utils import get_dynamodb, get_memory_table
+from common.utils.response_utils import success_response
+
+dynamodb = get_dynamodb()
+memory_table = get_memory_table()
+
+
+def parse_and_validate(event):
+    return load_session_ids(load_body_from_event(event))
+
+
+def lambda_handler(event, context):
+    try:
+        pks = parse_and_validate(event)
+
+        # The metadata items only, in BatchGetItem chunks of 100 keys
+        metas, failed = get_live_session_metas(dynamodb, memory_table, pks)
+
+        body = {
+            "sessions": [
+                {key: val for key, val in metas[pk].items() if key != "sk"} for pk in pks if pk in metas
+            ],
+            "not_found": [session_id_of(pk) for pk in pks if pk not in metas and pk not in failed],
+            "failed": [session_id_of(pk) for pk in failed],
+        }
+        return success_response(body)
+    except ValueError as e:
+        return error_response(str(e))
+    except Exception as e:
+        return internal_server_error()
@@ -1,19 +1,17 @@
-import os
 import json
 import boto3
 
-from boto3.dynamodb.conditions import Key, Attr
-
 from common.utils.lambda_utils import load_path_parameter_from_event
 from common.utils.error_handler import (
     error_response,
     internal_server_error,
     not_found_error,
 )
+from common.utils.memory_utils import LIVE_SESSION_CONDITION, meta_key
+from common.utils.dynamodb_utils import get_memory_table
 from common.utils.response_utils import success_response
 
-table_name = os.getenv("MEMORY_TABLE_NAME")
-memory_table = boto3.resource("dynamodb").Table(table_name)
+memory_table = get_memory_table()
 
 
 def parse_and_validate(event):
@@ -28,25 +26,21 @@ def lambda_handler(event, context):
     try:
         session_id = parse_and_validate(event)
 
-        res_session = memory_table.query(
-            KeyConditionExpression=Key("pk").eq(session_id),
-            FilterExpression=Attr("is_deleted").eq(False),
-        )
-        session_item = res_session.get("Items", [])
-
-        if not session_item:
-            return not_found_error()
-
+        # A single conditional write, a missing or deleted session fails the condition
         res_update = memory_table.update_item(
-            Key={"pk": session_id},
-            UpdateExpression="SET is_deleted = :val",
-            ExpressionAttributeValues={":val": True},
+            Key=meta_key(session_id),
+            # Removing owner_id drops the session from the live sessions index
+            UpdateExpression="SET is_deleted = :val REMOVE owner_id",
+            ConditionExpression=LIVE_SESSION_CONDITION,
+            ExpressionAttributeValues={":val": True, ":false": False},
         )
         if res_update["ResponseMetadata"]["HTTPStatusCode"] != 200:
             raise boto3.exceptions.Boto3Error("Failed to delete session!")
         else:
             body = {"message": "Session deleted successfully"}
             return success_response(body)
+    except memory_table.meta.client.exceptions.ConditionalCheckFailedException:
+        return not_found_error()
     except boto3.exceptions.Boto3Error as e:
         return error_response(str(e))
     except ValueError as e:
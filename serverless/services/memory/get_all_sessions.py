@@ -1,31 +1,64 @@
-import os
-import boto3
-from boto3.dynamodb.conditions import Attr, Key
-from common.utils.lambda_utils import load_path_parameter_from_event
+from boto3.dynamodb.conditions import Key
+from common.utils.lambda_utils import load_query_parameter_from_event
 from common.utils.error_handler import (
     error_response,
     internal_server_error,
     not_found_error,
 )
+from common.utils.memory_utils import LIVE_SESSIONS_INDEX, decode_cursor, encode_cursor
+from common.utils.dynamodb_utils import get_memory_table
 from common.utils.response_utils import success_response
 
 
-table_name = os.getenv("MEMORY_TABLE_NAME")
-memory_table = boto3.resource("dynamodb").Table(table_name)
+memory_table = get_memory_table()
+
+DEFAULT_PAGE_SIZE = 20
+MAX_PAGE_SIZE = 100
+
+
+def parse_and_validate(event):
+    owner_id = load_query_parameter_from_event(event, "owner_id")
+    if not owner_id:
+        raise ValueError("owner_id is required")
+
+    limit = load_query_parameter_from_event(event, "limit", DEFAULT_PAGE_SIZE)
+    try:
+        limit = int(limit)
+    except (TypeError, ValueError):
+        raise ValueError("limit should be a number")
+    if not 0 < limit <= MAX_PAGE_SIZE:
+        raise ValueError(f"limit should be between 1 and {MAX_PAGE_SIZE}")
+
+    cursor = decode_cursor(load_query_parameter_from_event(event, "cursor"))
+    return owner_id, limit, cursor
 
 
 def lambda_handler(event, context):
     try:
-        # Get all sessions from the memory table with the is_deleted attribute set to False
-        response = memory_table.scan(
-            FilterExpression=Attr("is_deleted").eq(False)
-        )
-        sessions_items = response.get("Items", [])
+        owner_id, limit, cursor = parse_and_validate(event)
+
+        # Only live sessions are in the index, newest first and without the messages,
+        # so a page costs the same however large the table grows
+        query = {
+            "IndexName": LIVE_SESSIONS_INDEX,
+            "KeyConditionExpression": Key("owner_id").eq(owner_id),
+            "ScanIndexForward": False,
+            "Limit": limit,
+            "ProjectionExpression": "pk, created_at, #metadata, message_count",
+            "ExpressionAttributeNames": {"#metadata": "metadata"},
+        }
+        if cursor:
+            query["ExclusiveStartKey"] = cursor
+        response = memory_table.query(**query)
 
-        return success_response(sessions_items)
+        body = {
+            "sessions": response.get("Items", []),
+            "cursor": encode_cursor(response.get("LastEvaluatedKey")),
+        }
+        return success_response(body)
     except ValueError as e:
         return error_response(str(e))
-    except boto3.exceptions.ResourceNotFoundException as e:
+    except memory_table.meta.client.exceptions.ResourceNotFoundException as e:
         return not_found_error()
     except Exception as e:
         return internal_server_error()
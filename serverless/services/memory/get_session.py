@@ -1,18 +1,27 @@
-import os
-
-import boto3
-from boto3.dynamodb.conditions import Key, Attr
-
-from common.utils.lambda_utils import load_path_parameter_from_event
+from common.utils.lambda_utils import load_path_parameter_from_event, load_query_parameter_from_event
 from common.utils.error_handler import (
     error_response,
     internal_server_error,
     not_found_error,
 )
+from common.utils.memory_utils import get_session
+from common.utils.dynamodb_utils import get_memory_table
 from common.utils.response_utils import success_response
 
-table_name = os.getenv("MEMORY_TABLE_NAME")
-memory_table = boto3.resource("dynamodb").Table(table_name)
+memory_table = get_memory_table()
+
+
+def parse_optional_int(event, param_name):
+    value = load_query_parameter_from_event(event, param_name)
+    if value is None:
+        return None
+    try:
+        value = int(value)
+    except ValueError:
+        raise ValueError(f"{param_name} should be a number")
+    if value < 0:
+        raise ValueError(f"{param_name} should not be negative")
+    return value
 
 
 def parse_and_validate(event):
@@ -20,37 +29,21 @@ def parse_and_validate(event):
     if not session_id:
         raise ValueError("session_id is required")
     session_id = f"SESSION#{session_id}"
-    return session_id
 
-
-def clean_messages_and_metadata_items(message_items, metadata_items):
-    # Extract metadata while filtering out the 'pk' key
-    metadata = (
-        {key: val for key, val in metadata_items[0].items() if key != "pk"}
-        if metadata_items
-        else {}
-    )
-
-    # Extract messages focusing only on the content inside the 'message' dictionary
-    messages = [msg["message"] for msg in message_items if "message" in msg]
-
-    return messages, metadata
+    # Optional range: the last N messages and/or the messages after a seq
+    last = parse_optional_int(event, "last")
+    after = parse_optional_int(event, "after")
+    return session_id, last, after
 
 
 def lambda_handler(event, context):
     try:
-        session_id = parse_and_validate(event)
+        session_id, last, after = parse_and_validate(event)
 
-        res_session = memory_table.query(
-            KeyConditionExpression=Key("pk").eq(session_id), 
-            FilterExpression=Attr("is_deleted").eq(False)
-        )
-        session_items = res_session.get("Items", [])
-
-        if not session_items:
+        session = get_session(memory_table, session_id, last=last, after=after)
+        if not session or session.get("is_deleted"):
             return not_found_error()
-        
-        session = session_items[0]
+
         return success_response(session)
     except ValueError as e:
         return error_response(str(e))
@@ -0,0 +1,69 @@
+"""Single Lambda for every memory endpoint.
+
+Routes on the method and the API Gateway resource to the handler of each
+endpoint, which still work as separate functions. All of them share one
+DynamoDB resource, so the container, its connection pool and its warm state
+serve the whole memory API instead of being spread over nine functions.
+"""
+from common.utils.metrics_utils import ColdStartTracker
+
+cold_start = ColdStartTracker("memory_service")
+
+import time
+
+from common.utils.error_handler import not_found_error
+from common.utils.metrics_utils import emit_metrics
+
+from . import (
+    batch_clear_messages,
+    batch_delete_sessions,
+    batch_get_sessions,
+    clear_messages,
+    delete_session,
+    get_all_sessions,
+    get_session,
+    save_session,
+    update_session_metadata,
+)
+
+ROUTES = {
+    ("GET", "/sessions"): get_all_sessions.lambda_handler,
+    ("POST", "/sessions/batch/get"): batch_get_sessions.lambda_handler,
+    ("POST", "/sessions/batch/delete"): batch_delete_sessions.lambda_handler,
+    ("POST", "/sessions/batch/clear"): batch_clear_messages.lambda_handler,
+    ("POST", "/sessions/{session_id}"): save_session.lambda_handler,
+    ("GET", "/sessions/{session_id}"): get_session.lambda_handler,
+    ("DELETE", "/sessions/{session_id}"): delete_session.lambda_handler,
+    ("POST", "/sessions/{session_id}/metadata"): update_session_metadata.lambda_handler,
+    ("DELETE", "/sessions/{session_id}/clear"): clear_messages.lambda_handler,
+}
+
+
+def route_of(event):
+    # REST API events carry the resource template, HTTP API events the route key
+    if event.get("routeKey"):
+        method, _, resource = event["routeKey"].partition(" ")
+    else:
+        method, resource = event.get("httpMethod", ""), event.get("resource", "")
+    return method.upper(), "/" + resource.strip("/")
+
+
+@cold_start.measure
+def lambda_handler(event, context):
+    route = route_of(event)
+    handler = ROUTES.get(route)
+    if handler is None:
+        return not_found_error()
+
+    started = time.perf_counter()
+    response = handler(event, context)
+    emit_metrics(
+        "memory_service",
+        {"RouteDuration": (time.perf_counter() - started) * 1000},
+        route=" ".join(route),
+        status_code=response.get("statusCode"),
+    )
+    return response
+
+
+cold_start.init_done()
@@ -1,18 +1,13 @@
-import os
-import boto3
-import datetime
-
-from boto3.dynamodb.conditions import Key, Attr
-
 from common.utils.lambda_utils import (
     load_body_from_event,
     load_path_parameter_from_event,
 )
-from common.utils.error_handler import error_response, internal_server_error
+from common.utils.error_handler import conflict_error, error_response, internal_server_error
+from common.utils.memory_utils import clean_message, create_session
+from common.utils.dynamodb_utils import get_memory_table
 from common.utils.response_utils import success_response
 
-table_name = os.getenv("MEMORY_TABLE_NAME")
-memory_table = boto3.resource("dynamodb").Table(table_name)
+memory_table = get_memory_table()
 
 
 def parse_and_validate(event):
@@ -49,23 +44,15 @@ def lambda_handler(event, context):
     try:
         session_id, messages, metadata = parse_and_validate(event)
 
-        session = memory_table.query(
-            KeyConditionExpression=Key("pk").eq(session_id)
-        )
-        
-        if session.get("Items"):
-            return error_response("Session already exists. You can't save it again. You can only update metadata.")
-        
-        item = {
-            "pk": session_id,
-            "messages": messages,
-            "metadata": metadata,
-            "is_deleted": False,
-            "created_at": datetime.datetime.now().isoformat(),
-        }
-        memory_table.put_item(Item=item)
+        # One item for the metadata and one per message, so a session is not
+        # bound by the item size limit
+        item = create_session(memory_table, session_id, messages, metadata)
 
-        return success_response(item)
+        body = {key: val for key, val in item.items() if key != "sk"}
+        body["messages"] = [clean_message(message) for message in messages]
+        return success_response(body)
+    except memory_table.meta.client.exceptions.ConditionalCheckFailedException:
+        return conflict_error("Session already exists. You can't save it again. You can only update metadata.")
     except ValueError as e:
         return error_response(str(e))
     except Exception as e:
@@ -1,7 +1,5 @@
-import os
 import boto3
 
-from boto3.dynamodb.conditions import Key, Attr
 from common.utils.lambda_utils import load_body_from_event
 
 from common.utils.lambda_utils import load_path_parameter_from_event
@@ -10,10 +8,11 @@ from common.utils.error_handler import (
     internal_server_error,
     not_found_error,
 )
+from common.utils.memory_utils import LIVE_SESSION_CONDITION, meta_key, session_owner
+from common.utils.dynamodb_utils import get_memory_table
 from common.utils.response_utils import success_response
 
-table_name = os.getenv("MEMORY_TABLE_NAME")
-memory_table = boto3.resource("dynamodb").Table(table_name)
+memory_table = get_memory_table()
 
 
 def parse_and_validate(event):
@@ -23,31 +22,39 @@ def parse_and_validate(event):
     session_id = f"SESSION#{session_id}"
 
     body = load_body_from_event(event)
-    if not body:
+    if not body or not isinstance(body, dict):
         raise ValueError("Body is required")
+    if not all(isinstance(key, str) and key for key in body):
+        raise ValueError("Metadata keys should be non empty strings")
     return session_id, body
 
 
+def build_metadata_update(body):
+    # One SET per field, the other fields of the stored metadata are left as they are
+    names, values, assignments = {}, {":false": False}, []
+    for index, (key, value) in enumerate(body.items()):
+        names[f"#k{index}"] = key
+        values[f":v{index}"] = value
+        assignments.append(f"metadata.#k{index} = :v{index}")
+    if "user_id" in body:
+        # Keep the live sessions index in sync with the owner
+        values[":owner"] = session_owner(body)
+        assignments.append("owner_id = :owner")
+    return "SET " + ", ".join(assignments), names, values
+
+
 def lambda_handler(event, context):
     try:
         session_id, body = parse_and_validate(event)
 
-        res_session = memory_table.query(
-            KeyConditionExpression=Key("pk").eq(session_id),
-            FilterExpression=Attr("is_deleted").eq(False),
-        )
-        session_item = res_session.get("Items", [])
-
-        if not session_item:
-            return not_found_error()
-
-        metadata = session_item[0].get("metadata", {})
-        metadata.update(body)
-
+        update_expression, names, values = build_metadata_update(body)
+        # A single conditional write, a missing or deleted session fails the condition
         res = memory_table.update_item(
-            Key={"pk": session_id},
-            UpdateExpression="SET metadata = :val",
-            ExpressionAttributeValues={":val": metadata},
+            Key=meta_key(session_id),
+            UpdateExpression=update_expression,
+            ConditionExpression=LIVE_SESSION_CONDITION,
+            ExpressionAttributeNames=names,
+            ExpressionAttributeValues=values,
         )
 
         if res["ResponseMetadata"]["HTTPStatusCode"] != 200:
@@ -55,6 +62,8 @@ def lambda_handler(event, context):
 
         body = {"message": "Session metadata updated successfully"}
         return success_response(body)
+    except memory_table.meta.client.exceptions.ConditionalCheckFailedException:
+        return not_found_error()
     except ValueError as e:
         return error_response(str(e))
     except boto3.exceptions.Boto3Error as e:
@@ -0,0 +1,89 @@
+import json
+import threading
+import urllib.request
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from services.gpt.ask_stream import create_server
+from services.gpt.src.models import OpenAIModel
+
+DELTAS = ["Hello", ", ", "podcast", " world."]
+
+
+class FakeOpenAIHandler(BaseHTTPRequestHandler):
+    """Replays a chat completion as OpenAI server-sent events."""
+
+    def do_POST(self):
+        length = int(self.headers.get("Content-Length", 0))
+        body = json.loads(self.rfile.read(length))
+        assert body["stream"] is True
+
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.end_headers()
+        for delta in DELTAS:
+            chunk = {
+                "id": "chatcmpl-test",
+                "object": "chat.completion.chunk",
+                "created": 0,
+                "model": body["model"],
+                "choices": [{"index": 0, "delta": {"content": delta}, "finish_reason": None}],
+            }
+            self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode())
+            self.wfile.flush()
+        self.wfile.write(b"data: [DONE]\n\n")
+
+    def log_message(self, format, *args):
+        pass
+
+
+def start(server):
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return server
+
+
+@pytest.fixture
+def fake_openai():
+    server = start(ThreadingHTTPServer(("127.0.0.1", 0), FakeOpenAIHandler))
+    yield f"http://127.0.0.1:{server.server_port}/v1"
+    server.shutdown()
+
+
+@pytest.fixture
+def model(fake_openai):
+    return OpenAIModel(
+        api_key="test", model_engine="gpt-test", temperature=0, max_tokens=64, base_url=fake_openai
+    )
+
+
+@pytest.fixture
+def stream_server(model):
+    server = start(create_server(port=0, model=model))
+    yield f"http://127.0.0.1:{server.server_port}"
+    server.shutdown()
+
+
+def test_model_streams_deltas(model):
+    messages = [{"role": "user", "content": "Hi"}]
+    assert list(model.chat_completion_stream(messages)) == DELTAS
+
+
+def test_stream_endpoint_returns_ndjson_events(stream_server):
+    body = json.dumps({"messages": [{"role": "user", "content": "Hi"}]}).encode()
+    request = urllib.request.Request(f"{stream_server}/gpt/ask/stream", data=body, method="POST")
+    with urllib.request.urlopen(request) as res:
+        events = [json.loads(line) for line in res if line.strip()]
+
+    assert [e["content"] for e in events if e["type"] == "delta"] == DELTAS
+    assert events[-1]["type"] == "done"
+    assert events[-1]["last_message"] == {"role": "assistant", "content": "".join(DELTAS)}
+
+
+def test_stream_endpoint_validates_messages(stream_server):
+    body = json.dumps({"messages": []}).encode()
+    request = urllib.request.Request(stream_server, data=body, method="POST")
+    with pytest.raises(urllib.error.HTTPError) as error:
+        urllib.request.urlopen(request)
+    assert error.value.code == 400
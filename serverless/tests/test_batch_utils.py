@@ -0,0 +1,57 @@
+from common.utils.batch_utils import batch_get_items, batch_write_items
+
+
+class ThrottledDynamoDB:
+    """Leaves the last item of every first batch unprocessed."""
+
+    def __init__(self):
+        self.batches = []
+
+    def batch_get_item(self, RequestItems):
+        (table_name, request), = RequestItems.items()
+        keys = request["Keys"]
+        self.batches.append(len(keys))
+        response = {"Responses": {table_name: [dict(key, found=True) for key in keys[:-1]]}}
+        if len(keys) > 1:
+            response["UnprocessedKeys"] = {table_name: {**request, "Keys": keys[-1:]}}
+        else:
+            response["Responses"][table_name].append(dict(keys[0], found=True))
+        return response
+
+    def batch_write_item(self, RequestItems):
+        (table_name, requests), = RequestItems.items()
+        self.batches.append(len(requests))
+        if len(requests) > 1:
+            return {"UnprocessedItems": {table_name: requests[-1:]}}
+        return {"UnprocessedItems": {}}
+
+
+def test_batch_get_chunks_at_100_and_retries_unprocessed_keys():
+    dynamodb = ThrottledDynamoDB()
+    delays = []
+    keys = [{"pk": str(i)} for i in range(150)]
+
+    items, unprocessed = batch_get_items(dynamodb, "memory", keys, sleep=delays.append)
+
+    assert sorted(int(item["pk"]) for item in items) == list(range(150))
+    assert unprocessed == []
+    assert dynamodb.batches == [100, 1, 50, 1]
+    assert len(delays) == 2
+
+
+def test_batch_write_chunks_at_25_and_gives_up_after_max_attempts():
+    class AlwaysThrottled(ThrottledDynamoDB):
+        def batch_write_item(self, RequestItems):
+            self.batches.append(len(RequestItems["memory"]))
+            return {"UnprocessedItems": RequestItems}
+
+    requests = [{"DeleteRequest": {"Key": {"pk": str(i)}}} for i in range(30)]
+    assert batch_write_items(ThrottledDynamoDB(), "memory", requests, sleep=lambda s: None) == []
+
+    dynamodb = AlwaysThrottled()
+    delays = []
+    unprocessed = batch_write_items(dynamodb, "memory", requests, max_attempts=3, sleep=delays.append)
+    assert unprocessed == requests
+    assert dynamodb.batches == [25, 25, 25, 5, 5, 5]
+    # Exponential backoff with jitter, below the capped delay of each attempt
+    assert all(0 <= delay <= 0.05 * 2 ** (i % 2) for i, delay in enumerate(delays))
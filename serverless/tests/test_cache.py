@@ -0,0 +1,84 @@
+from services.gpt.src.cache import (
+    CompletionCache,
+    DynamoDBCache,
+    LRUCache,
+    cache_key,
+)
+
+MESSAGES = [{"role": "user", "content": "Summarize this"}]
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+class FakeTable:
+    def __init__(self):
+        self.items = {}
+
+    def get_item(self, Key):
+        item = self.items.get(Key["pk"])
+        return {"Item": item} if item else {}
+
+    def put_item(self, Item):
+        self.items[Item["pk"]] = Item
+
+
+def test_cache_key_is_canonical():
+    with_user = [{"content": "Summarize this", "role": "user", "user_id": "1"}]
+    assert cache_key("gpt", 0, 100, MESSAGES) == cache_key("gpt", 0, 100, with_user)
+    assert cache_key("gpt", 0, 100, MESSAGES) != cache_key("gpt", 0, 200, MESSAGES)
+    assert cache_key("gpt", 0, 100, MESSAGES) != cache_key("gpt", 1, 100, MESSAGES)
+
+
+def test_lru_cache_evicts_and_expires():
+    clock = FakeClock()
+    cache = LRUCache(max_entries=2, ttl=10, clock=clock)
+    cache.set("a", {"content": "a"})
+    cache.set("b", {"content": "b"})
+    cache.get("a")
+    cache.set("c", {"content": "c"})
+    assert cache.get("b") is None
+    assert cache.get("a") == {"content": "a"}
+
+    clock.now += 11
+    assert cache.get("a") is None
+
+
+def test_dynamodb_cache_ignores_expired_items():
+    clock = FakeClock()
+    table = FakeTable()
+    cache = DynamoDBCache(table, ttl=10, clock=clock)
+    cache.set("a", {"content": "a"})
+    assert table.items["COMPLETION#a"]["expires_at"] == 1010
+    assert cache.get("a") == {"content": "a"}
+    clock.now += 10
+    assert cache.get("a") is None
+
+
+def test_completion_cache_backfills_faster_tier():
+    memory = LRUCache()
+    table = FakeTable()
+    cache = CompletionCache([memory, DynamoDBCache(table)])
+    DynamoDBCache(table).set("a", {"content": "a"})
+
+    assert cache.get("a") == ({"content": "a"}, "dynamodb")
+    assert cache.get("a") == ({"content": "a"}, "memory")
+    assert cache.get("missing") == (None, None)
+
+
+def test_completion_cache_treats_errors_as_misses():
+    class BrokenTable:
+        def get_item(self, Key):
+            raise RuntimeError("throttled")
+
+        def put_item(self, Item):
+            raise RuntimeError("throttled")
+
+    cache = CompletionCache([DynamoDBCache(BrokenTable())])
+    cache.set("a", {"content": "a"})
+    assert cache.get("a") == (None, None)
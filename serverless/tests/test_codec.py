@@ -0,0 +1,31 @@
+import pytest
+
+from common.utils import codec
+
+
+def test_small_contents_stay_plain():
+    assert codec.encode_content("hello") == "hello"
+    assert codec.decode_content("hello") == "hello"
+
+
+def test_round_trip_with_marker():
+    text = "The host and the guest talk about serverless. " * 100
+    encoded = codec.encode_content(text, codec=codec.CODEC_ZLIB)
+    assert isinstance(encoded, bytes)
+    assert encoded[:2] == codec.MAGIC
+    assert encoded[2] == codec.VERSION
+    assert len(encoded) < len(text)
+    assert codec.decode_content(encoded) == text
+
+
+def test_min_bytes_threshold():
+    text = "a podcast transcript line\n" * 10
+    assert codec.encode_content(text, codec=codec.CODEC_ZLIB) == text
+    assert isinstance(codec.encode_content(text, codec=codec.CODEC_ZLIB, min_bytes=0), bytes)
+
+
+def test_unknown_format_is_rejected():
+    with pytest.raises(ValueError):
+        codec.decode_content(b"XX\x01\x01data")
+    with pytest.raises(ValueError):
+        codec.decode_content(codec.MAGIC + bytes([99, codec.CODEC_ZLIB]))
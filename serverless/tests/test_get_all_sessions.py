@@ -0,0 +1,91 @@
+import json
+import os
+
+import pytest
+
+os.environ.setdefault("AWS_DEFAULT_REGION", "us-east-2")
+os.environ.setdefault("MEMORY_TABLE_NAME", "memory-test")
+
+from common.utils.memory_utils import decode_cursor, encode_cursor, session_owner
+from services.memory import get_all_sessions
+
+
+class FakeIndexTable:
+    """Answers index queries from a list of items, like the live sessions index."""
+
+    def __init__(self, items):
+        self.items = items
+        self.queries = []
+
+    def query(self, **kwargs):
+        self.queries.append(kwargs)
+        owner_id = kwargs["KeyConditionExpression"].get_expression()["values"][1]
+        rows = sorted(
+            (item for item in self.items if item.get("owner_id") == owner_id),
+            key=lambda item: item["created_at"],
+            reverse=not kwargs["ScanIndexForward"],
+        )
+        start = kwargs.get("ExclusiveStartKey")
+        if start:
+            rows = rows[[row["pk"] for row in rows].index(start["pk"]) + 1:]
+        page = rows[: kwargs["Limit"]]
+        response = {"Items": [{k: v for k, v in row.items() if k != "messages"} for row in page]}
+        if len(rows) > len(page):
+            last = page[-1]
+            response["LastEvaluatedKey"] = {k: last[k] for k in ("pk", "owner_id", "created_at")}
+        return response
+
+
+@pytest.fixture
+def table(monkeypatch):
+    items = [
+        {"pk": f"SESSION#{i}", "owner_id": "42", "created_at": f"2024-01-0{i}", "messages": []}
+        for i in range(1, 6)
+    ]
+    items.append({"pk": "SESSION#other", "owner_id": "7", "created_at": "2024-01-09"})
+    fake = FakeIndexTable(items)
+    monkeypatch.setattr(get_all_sessions, "memory_table", fake)
+    return fake
+
+
+def list_sessions(**params):
+    response = get_all_sessions.lambda_handler({"queryStringParameters": params}, None)
+    return response["statusCode"], json.loads(response["body"])
+
+
+def test_pages_newest_first_with_a_cursor(table):
+    status, body = list_sessions(owner_id="42", limit="2")
+    assert status == 200
+    assert [s["pk"] for s in body["sessions"]] == ["SESSION#5", "SESSION#4"]
+
+    pages = [body["sessions"]]
+    while body["cursor"]:
+        _, body = list_sessions(owner_id="42", limit="2", cursor=body["cursor"])
+        pages.append(body["sessions"])
+    assert [[s["pk"][-1] for s in page] for page in pages] == [["5", "4"], ["3", "2"], ["1"]]
+    assert all(query["IndexName"] == "LiveSessionsIndex" for query in table.queries)
+    assert all("messages" not in query["ProjectionExpression"] for query in table.queries)
+
+
+def test_owner_is_required(table):
+    response = get_all_sessions.lambda_handler({"queryStringParameters": None}, None)
+    assert response["statusCode"] == 400
+    assert table.queries == []
+
+
+def test_invalid_cursor_and_limit_are_rejected(table):
+    assert list_sessions(owner_id="42", cursor="not a cursor")[0] == 400
+    assert list_sessions(owner_id="42", limit="1000")[0] == 400
+    assert table.queries == []
+
+
+def test_cursor_round_trip():
+    key = {"pk": "SESSION#1", "owner_id": "42", "created_at": "2024-01-01"}
+    assert decode_cursor(encode_cursor(key)) == key
+    assert encode_cursor(None) is None
+
+
+def test_session_owner():
+    assert session_owner({"user_id": 42}) == "42"
+    assert session_owner({}) == "anonymous"
+    assert session_owner(None) == "anonymous"
@@ -0,0 +1,211 @@
+import json
+import os
+
+import boto3
+import pytest
+
+moto = pytest.importorskip("moto")
+
+os.environ.setdefault("AWS_DEFAULT_REGION", "us-east-2")
+os.environ.setdefault("MEMORY_TABLE_NAME", "memory-test")
+
+from common.utils import memory_utils
+from services.memory import (
+    batch_clear_messages,
+    batch_delete_sessions,
+    batch_get_sessions,
+    clear_messages,
+    delete_session,
+    save_session,
+    update_session_metadata,
+)
+
+HANDLERS = [clear_messages, delete_session, save_session, update_session_metadata]
+BATCH_HANDLERS = [batch_clear_messages, batch_delete_sessions, batch_get_sessions]
+
+
+@pytest.fixture
+def table(monkeypatch):
+    monkeypatch.setenv("AWS_ACCESS_KEY_ID", "testing")
+    monkeypatch.setenv("AWS_SECRET_ACCESS_KEY", "testing")
+    with moto.mock_aws():
+        dynamodb = boto3.resource("dynamodb", region_name="us-east-2")
+        table = dynamodb.create_table(
+            TableName="memory-test",
+            KeySchema=[
+                {"AttributeName": "pk", "KeyType": "HASH"},
+                {"AttributeName": "sk", "KeyType": "RANGE"},
+            ],
+            AttributeDefinitions=[
+                {"AttributeName": "pk", "AttributeType": "S"},
+                {"AttributeName": "sk", "AttributeType": "S"},
+            ],
+            BillingMode="PAY_PER_REQUEST",
+        )
+        for handler in HANDLERS + BATCH_HANDLERS:
+            monkeypatch.setattr(handler, "memory_table", table)
+        for handler in BATCH_HANDLERS:
+            if hasattr(handler, "dynamodb"):
+                monkeypatch.setattr(handler, "dynamodb", dynamodb)
+
+        calls = []
+        table.meta.client.meta.events.register(
+            "before-call.dynamodb.*", lambda model, **kwargs: calls.append(model.name)
+        )
+        table.calls = calls
+        yield table
+
+
+def invoke(handler, session_id, body=None):
+    event = {"pathParameters": {"session_id": session_id}}
+    if body is not None:
+        event["body"] = json.dumps(body)
+    response = handler.lambda_handler(event, None)
+    return response["statusCode"], json.loads(response["body"])
+
+
+def create(table, session_id="1", metadata=None):
+    messages = [{"role": "user", "content": "hi"}, {"role": "assistant", "content": "hello"}]
+    memory_utils.create_session(table, f"SESSION#{session_id}", messages, metadata or {"title": "Podcast"})
+    table.calls.clear()
+
+
+def test_update_metadata_sets_only_the_given_fields(table):
+    create(table, metadata={"title": "Podcast", "context_summary": "summary"})
+
+    status, _ = invoke(update_session_metadata, "1", {"title": "New title", "user_id": 42})
+
+    assert status == 200
+    assert table.calls == ["UpdateItem"]
+    meta = memory_utils.get_session_meta(table, "SESSION#1")
+    assert meta["metadata"] == {"title": "New title", "context_summary": "summary", "user_id": 42}
+    assert meta["owner_id"] == "42"
+
+
+def test_writes_to_missing_or_deleted_sessions_are_not_found(table):
+    for handler, body in [(update_session_metadata, {"title": "x"}), (delete_session, None), (clear_messages, None)]:
+        assert invoke(handler, "missing", body)[0] == 404
+    # A failed condition does not create the item
+    assert table.scan()["Items"] == []
+
+    create(table)
+    assert invoke(delete_session, "1")[0] == 200
+    assert invoke(delete_session, "1")[0] == 404
+    assert invoke(update_session_metadata, "1", {"title": "x"})[0] == 404
+    assert invoke(clear_messages, "1")[0] == 404
+
+
+def test_delete_is_a_single_write(table):
+    create(table, metadata={"user_id": 7})
+    assert invoke(delete_session, "1")[0] == 200
+    assert table.calls == ["UpdateItem"]
+    meta = memory_utils.get_session_meta(table, "SESSION#1")
+    assert meta["is_deleted"] is True
+    assert "owner_id" not in meta
+
+
+def test_clear_messages_keeps_the_session(table):
+    create(table)
+    assert invoke(clear_messages, "1")[0] == 200
+    session = memory_utils.get_session(table, "SESSION#1")
+    assert session["messages"] == []
+    assert session["message_count"] == 0
+
+
+def test_save_twice_is_a_conflict(table):
+    body = {"messages": [{"role": "user", "content": "hi"}], "metadata": {"user_id": 1}}
+    assert invoke(save_session, "1", body)[0] == 200
+    status, res = invoke(save_session, "1", body)
+    assert status == 409
+    assert "already exists" in res["message"]
+
+
+def invoke_batch(handler, session_ids):
+    response = handler.lambda_handler({"body": json.dumps({"session_ids": session_ids})}, None)
+    return response["statusCode"], json.loads(response["body"])
+
+
+def test_batch_get_returns_the_live_sessions(table):
+    for session_id in ["1", "2", "3"]:
+        create(table, session_id)
+    invoke(delete_session, "3")
+
+    status, body = invoke_batch(batch_get_sessions, ["1", "2", "3", "4"])
+
+    assert status == 200
+    assert [s["pk"] for s in body["sessions"]] == ["SESSION#1", "SESSION#2"]
+    assert all("messages" not in s for s in body["sessions"])
+    assert body["not_found"] == ["3", "4"]
+    assert body["failed"] == []
+
+
+def test_batch_delete_and_clear_many_sessions(table):
+    session_ids = [str(i) for i in range(30)]
+    for session_id in session_ids:
+        create(table, session_id, metadata={"user_id": 1})
+
+    status, body = invoke_batch(batch_clear_messages, session_ids[:20] + ["missing"])
+    assert status == 200
+    assert body["cleared"] == session_ids[:20]
+    assert body["not_found"] == ["missing"]
+    # The 40 message deletes in chunks of 25, the metadata items are updated concurrently
+    assert table.calls.count("BatchWriteItem") == 2
+    assert memory_utils.get_session(table, "SESSION#0")["messages"] == []
+    assert memory_utils.get_session(table, "SESSION#0")["message_count"] == 0
+    assert len(memory_utils.get_session(table, "SESSION#25")["messages"]) == 2
+
+    status, body = invoke_batch(batch_delete_sessions, session_ids)
+    assert body["deleted"] == session_ids
+    meta = memory_utils.get_session_meta(table, "SESSION#5")
+    assert meta["is_deleted"] is True
+    assert "owner_id" not in meta
+    assert invoke_batch(batch_delete_sessions, ["0"])[1]["not_found"] == ["0"]
+
+
+def test_batch_clear_does_not_undo_a_concurrent_delete(table):
+    create(table, "1", metadata={"user_id": 1})
+    create(table, "2", metadata={"user_id": 1})
+    next_seq = memory_utils.get_session_meta(table, "SESSION#2")["next_seq"]
+    interleaved = []
+
+    def delete_first(params, **kwargs):
+        # The single delete lands while the batch clear is running
+        if params.get("Key", {}).get("pk") == "SESSION#1" and not interleaved:
+            interleaved.append(True)
+            assert invoke(delete_session, "1")[0] == 200
+
+    table.meta.client.meta.events.register("before-parameter-build.dynamodb.UpdateItem", delete_first)
+    status, body = invoke_batch(batch_clear_messages, ["1", "2"])
+
+    assert interleaved
+    assert body["cleared"] == ["2"]
+    assert body["not_found"] == ["1"]
+    meta = memory_utils.get_session_meta(table, "SESSION#1")
+    assert meta["is_deleted"] is True
+    assert "owner_id" not in meta
+    # The reserved sequence numbers are kept, later appends do not reuse them
+    assert memory_utils.get_session_meta(table, "SESSION#2")["next_seq"] == next_seq
+
+
+def test_batch_clear_keeps_the_count_of_sessions_whose_deletes_failed(table, monkeypatch):
+    create(table, "1")
+    create(table, "2")
+    write = memory_utils.batch_write_items
+
+    def throttled(dynamodb, table_name, requests):
+        # The deletes of SESSION#1 stay unprocessed, as after throttling
+        write(dynamodb, table_name, [r for r in requests if r["DeleteRequest"]["Key"]["pk"] != "SESSION#1"])
+        return [r for r in requests if r["DeleteRequest"]["Key"]["pk"] == "SESSION#1"]
+
+    monkeypatch.setattr(memory_utils, "batch_write_items", throttled)
+    status, body = invoke_batch(batch_clear_messages, ["1", "2"])
+
+    assert (body["cleared"], body["failed"]) == (["2"], ["1"])
+    assert memory_utils.get_session_meta(table, "SESSION#1")["message_count"] == 2
+    assert memory_utils.get_session_meta(table, "SESSION#2")["message_count"] == 0
+
+
+def test_batch_requests_are_validated(table):
+    assert invoke_batch(batch_get_sessions, [])[0] == 400
+    assert invoke_batch(batch_get_sessions, [str(i) for i in range(101)])[0] == 400
+    assert invoke_batch(batch_delete_sessions, ["1", 2])[0] == 400
@@ -0,0 +1,65 @@
+import json
+import os
+
+import boto3
+import pytest
+
+moto = pytest.importorskip("moto")
+
+os.environ.setdefault("AWS_DEFAULT_REGION", "us-east-2")
+os.environ.setdefault("MEMORY_TABLE_NAME", "memory-test")
+
+from common.utils.dynamodb_utils import get_memory_table
+from services.memory import memory_service, save_session, get_session
+
+
+def test_handlers_share_one_table_resource():
+    assert save_session.memory_table is get_session.memory_table is get_memory_table()
+
+
+@pytest.fixture
+def table(monkeypatch):
+    monkeypatch.setenv("AWS_ACCESS_KEY_ID", "testing")
+    monkeypatch.setenv("AWS_SECRET_ACCESS_KEY", "testing")
+    with moto.mock_aws():
+        table = boto3.resource("dynamodb", region_name="us-east-2").create_table(
+            TableName="memory-test",
+            KeySchema=[
+                {"AttributeName": "pk", "KeyType": "HASH"},
+                {"AttributeName": "sk", "KeyType": "RANGE"},
+            ],
+            AttributeDefinitions=[
+                {"AttributeName": "pk", "AttributeType": "S"},
+                {"AttributeName": "sk", "AttributeType": "S"},
+            ],
+            BillingMode="PAY_PER_REQUEST",
+        )
+        for handler in [save_session, get_session]:
+            monkeypatch.setattr(handler, "memory_table", table)
+        yield table
+
+
+def test_routes_on_method_and_resource(table, capsys):
+    body = {"messages": [{"role": "user", "content": "hi"}], "metadata": {"title": "Podcast"}}
+    event = {
+        "httpMethod": "POST",
+        "resource": "/sessions/{session_id}",
+        "pathParameters": {"session_id": "1"},
+        "body": json.dumps(body),
+    }
+    assert memory_service.lambda_handler(event, None)["statusCode"] == 200
+
+    event = {"routeKey": "GET /sessions/{session_id}", "pathParameters": {"session_id": "1"}}
+    response = memory_service.lambda_handler(event, None)
+    assert response["statusCode"] == 200
+    assert json.loads(response["body"])["messages"] == body["messages"]
+
+    lines = [line for line in capsys.readouterr().out.splitlines() if line.startswith("{")]
+    routes = [json.loads(line)["route"] for line in lines if "RouteDuration" in line]
+    assert routes == ["POST /sessions/{session_id}", "GET /sessions/{session_id}"]
+
+
+def test_unknown_route_is_not_found():
+    event = {"httpMethod": "PUT", "resource": "/sessions/{session_id}"}
+    assert memory_service.lambda_handler(event, None)["statusCode"] == 404
+    assert memory_service.route_of({"httpMethod": "get", "resource": "/sessions/"}) == ("GET", "/sessions")
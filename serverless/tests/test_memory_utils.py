@@ -0,0 +1,153 @@
+import os
+
+import boto3
+import pytest
+
+moto = pytest.importorskip("moto")
+
+os.environ.setdefault("AWS_DEFAULT_REGION", "us-east-2")
+os.environ.setdefault("MEMORY_TABLE_NAME", "memory-test")
+
+from common.utils import memory_utils
+from scripts.migrate_sessions import migrate
+
+
+def create_table(dynamodb, name):
+    return dynamodb.create_table(
+        TableName=name,
+        KeySchema=[
+            {"AttributeName": "pk", "KeyType": "HASH"},
+            {"AttributeName": "sk", "KeyType": "RANGE"},
+        ],
+        AttributeDefinitions=[
+            {"AttributeName": "pk", "AttributeType": "S"},
+            {"AttributeName": "sk", "AttributeType": "S"},
+        ],
+        BillingMode="PAY_PER_REQUEST",
+    )
+
+
+@pytest.fixture
+def dynamodb(monkeypatch):
+    monkeypatch.setenv("AWS_ACCESS_KEY_ID", "testing")
+    monkeypatch.setenv("AWS_SECRET_ACCESS_KEY", "testing")
+    with moto.mock_aws():
+        yield boto3.resource("dynamodb", region_name="us-east-2")
+
+
+@pytest.fixture
+def table(dynamodb):
+    return create_table(dynamodb, "memory-test")
+
+
+def messages(count, start=0):
+    return [{"role": "user", "content": f"message {i}"} for i in range(start, start + count)]
+
+
+def test_append_writes_one_item_per_message(table):
+    memory_utils.append_session_messages(table, "SESSION#1", messages(2), {"user_id": 42})
+    first_seq = memory_utils.append_session_messages(table, "SESSION#1", messages(3, start=2))
+
+    assert first_seq == 2
+    meta = memory_utils.get_session_meta(table, "SESSION#1")
+    assert meta["message_count"] == 5
+    assert meta["owner_id"] == "42"
+    items = table.scan()["Items"]
+    assert len(items) == 6
+    assert all("messages" not in item for item in items)
+
+
+def test_range_reads(table):
+    memory_utils.create_session(table, "SESSION#1", messages(30), {"title": "Podcast"})
+
+    session = memory_utils.get_session(table, "SESSION#1")
+    assert [m["content"] for m in session["messages"]] == [f"message {i}" for i in range(30)]
+    assert session["metadata"] == {"title": "Podcast"}
+
+    last = memory_utils.get_session(table, "SESSION#1", last=3)
+    assert [m["content"] for m in last["messages"]] == ["message 27", "message 28", "message 29"]
+    assert (last["first_seq"], last["last_seq"]) == (27, 29)
+
+    after = memory_utils.query_messages(table, "SESSION#1", after=25)
+    assert [m["seq"] for m in after] == [26, 27, 28, 29]
+
+    assert [m["seq"] for m in memory_utils.query_messages(table, "SESSION#1", first=1)] == [0]
+
+
+def test_create_session_only_once(table):
+    memory_utils.create_session(table, "SESSION#1", messages(1))
+    with pytest.raises(table.meta.client.exceptions.ConditionalCheckFailedException):
+        memory_utils.create_session(table, "SESSION#1", messages(1))
+
+
+def test_append_to_a_deleted_session_fails(table):
+    memory_utils.create_session(table, "SESSION#1", messages(1))
+    table.update_item(
+        Key=memory_utils.meta_key("SESSION#1"),
+        UpdateExpression="SET is_deleted = :true",
+        ExpressionAttributeValues={":true": True},
+    )
+    with pytest.raises(table.meta.client.exceptions.ConditionalCheckFailedException):
+        memory_utils.append_session_messages(table, "SESSION#1", messages(1))
+
+
+def test_delete_messages_keeps_the_metadata(table):
+    memory_utils.create_session(table, "SESSION#1", messages(60))
+    assert memory_utils.delete_messages(table, "SESSION#1") == 60
+    session = memory_utils.get_session(table, "SESSION#1")
+    assert session["messages"] == []
+    assert session["pk"] == "SESSION#1"
+
+
+def test_migrate_single_item_sessions(dynamodb, table):
+    source = dynamodb.create_table(
+        TableName="memory-legacy",
+        KeySchema=[{"AttributeName": "pk", "KeyType": "HASH"}],
+        AttributeDefinitions=[{"AttributeName": "pk", "AttributeType": "S"}],
+        BillingMode="PAY_PER_REQUEST",
+    )
+    source.put_item(
+        Item={
+            "pk": "SESSION#live",
+            "messages": messages(4),
+            "metadata": {"user_id": 7},
+            "is_deleted": False,
+            "created_at": "2024-01-01T00:00:00",
+        }
+    )
+    source.put_item(Item={"pk": "SESSION#gone", "messages": messages(1), "metadata": {}, "is_deleted": True})
+
+    stats = migrate(source, table)
+    assert stats == {"sessions": 2, "messages": 5, "skipped": 0}
+
+    live = memory_utils.get_session(table, "SESSION#live")
+    assert [m["content"] for m in live["messages"]] == [m["content"] for m in messages(4)]
+    assert live["owner_id"] == "7"
+    assert live["created_at"] == "2024-01-01T00:00:00"
+    gone = memory_utils.get_session_meta(table, "SESSION#gone")
+    assert gone["is_deleted"] is True
+    assert "owner_id" not in gone
+
+    # Running it again rewrites the same items
+    migrate(source, table)
+    assert len(table.scan()["Items"]) == 7
+
+
+def test_large_contents_are_stored_compressed(table):
+    transcript = " ".join(f"speaker {i % 3} talks about topic {i % 50}." for i in range(2000))
+    memory_utils.create_session(table, "SESSION#1", [{"role": "user", "content": transcript}, *messages(1)])
+
+    items = {item["sk"]: item for item in table.scan()["Items"]}
+    stored = items[memory_utils.message_sk(0)]["content"]
+    assert not isinstance(stored, str)
+    assert len(stored.value) < len(transcript) / 4
+    assert items[memory_utils.message_sk(1)]["content"] == "message 0"
+
+    session = memory_utils.get_session(table, "SESSION#1")
+    assert session["messages"][0]["content"] == transcript
+
+
+def test_legacy_plain_contents_are_readable(table):
+    table.put_item(Item={"pk": "SESSION#1", "sk": "META", "is_deleted": False})
+    table.put_item(Item={"pk": "SESSION#1", "sk": memory_utils.message_sk(0), "seq": 0, "role": "user", "content": "x" * 5000})
+    assert memory_utils.get_session(table, "SESSION#1")["messages"][0]["content"] == "x" * 5000
@@ -0,0 +1,39 @@
+import json
+
+from common.utils.metrics_utils import ColdStartTracker
+
+
+def test_cold_start_is_reported_once(capsys):
+    tracker = ColdStartTracker("gpt_ask")
+    tracker.init_done()
+
+    @tracker.measure
+    def handler(event, context):
+        return {"statusCode": 200}
+
+    assert handler({}, None) == {"statusCode": 200}
+    assert handler({}, None) == {"statusCode": 200}
+
+    lines = capsys.readouterr().out.strip().splitlines()
+    assert len(lines) == 1
+    metrics = json.loads(lines[0])
+    assert metrics["function"] == "gpt_ask"
+    assert metrics["cold_start"] is True
+    assert metrics["InitDuration"] >= 0
+    assert metrics["HandlerDuration"] >= 0
+    names = [m["Name"] for m in metrics["_aws"]["CloudWatchMetrics"][0]["Metrics"]]
+    assert names == ["InitDuration", "HandlerDuration"]
+
+
+def test_cold_start_is_reported_when_the_handler_raises(capsys):
+    tracker = ColdStartTracker("gpt_ask")
+
+    @tracker.measure
+    def handler(event, context):
+        raise RuntimeError("boom")
+
+    try:
+        handler({}, None)
+    except RuntimeError:
+        pass
+    assert json.loads(capsys.readouterr().out)["InitDuration"] == 0.0
@@ -0,0 +1,90 @@
+import json
+import os
+
+import boto3
+import pytest
+
+moto = pytest.importorskip("moto")
+requests = pytest.importorskip("requests")
+
+os.environ.setdefault("AWS_DEFAULT_REGION", "us-east-2")
+
+from common.utils.s3_utils import MIN_PART_SIZE, part_layout
+from services.files import (
+    abort_multipart_upload,
+    complete_multipart_upload,
+    create_multipart_upload,
+    get_multipart_upload,
+)
+
+HANDLERS = [abort_multipart_upload, complete_multipart_upload, create_multipart_upload, get_multipart_upload]
+BUCKET = "podcast-audio"
+
+
+@pytest.fixture
+def s3(monkeypatch):
+    monkeypatch.setenv("AWS_ACCESS_KEY_ID", "testing")
+    monkeypatch.setenv("AWS_SECRET_ACCESS_KEY", "testing")
+    with moto.mock_aws():
+        client = boto3.client("s3", region_name="us-east-2")
+        client.create_bucket(Bucket=BUCKET, CreateBucketConfiguration={"LocationConstraint": "us-east-2"})
+        for handler in HANDLERS:
+            monkeypatch.setattr(handler, "s3_client", client)
+            monkeypatch.setattr(handler, "s3_bucket_name", BUCKET)
+        yield client
+
+
+def call(handler, body=None, path=None, query=None):
+    event = {"body": json.dumps(body or {}), "pathParameters": path or {}, "queryStringParameters": query}
+    response = handler.lambda_handler(event, None)
+    return response["statusCode"], json.loads(response["body"])
+
+
+def test_part_layout_respects_the_s3_limits():
+    assert part_layout(20 * 1024 * 1024) == {"part_size": 8 * 1024 * 1024, "parts": 3}
+    large = part_layout(200 * 1024 ** 3)
+    assert large["parts"] <= 10000 and large["part_size"] * large["parts"] >= 200 * 1024 ** 3
+    for size, part_size in [(0, None), (10, MIN_PART_SIZE - 1), ("10", None)]:
+        with pytest.raises(ValueError):
+            part_layout(size, part_size)
+
+
+def test_upload_resumes_from_the_finished_parts(s3):
+    data = os.urandom(MIN_PART_SIZE * 2 + 1000)
+    status, upload = call(
+        create_multipart_upload, {"key": "audio/episode.wav", "size": len(data), "part_size": MIN_PART_SIZE}
+    )
+    assert status == 200
+    assert (upload["part_count"], len(upload["parts"])) == (3, 3)
+    upload_id = upload["upload_id"]
+
+    # Only the first part makes it before the transfer is interrupted
+    first = upload["parts"][0]
+    res = requests.put(first["url"], data=data[:MIN_PART_SIZE])
+    assert res.status_code == 200
+
+    path = {"upload_id": upload_id}
+    status, state = call(get_multipart_upload, path=path, query={"key": "audio/episode.wav", "parts": "3"})
+    assert status == 200
+    assert [part["part_number"] for part in state["uploaded"]] == [1]
+    assert [part["part_number"] for part in state["parts"]] == [2, 3]
+
+    parts = [{"part_number": 1, "etag": state["uploaded"][0]["etag"]}]
+    for part in state["parts"]:
+        start = (part["part_number"] - 1) * MIN_PART_SIZE
+        res = requests.put(part["url"], data=data[start:start + MIN_PART_SIZE])
+        parts.append({"part_number": part["part_number"], "etag": res.headers["ETag"]})
+
+    status, body = call(complete_multipart_upload, {"key": "audio/episode.wav", "parts": parts[::-1]}, path)
+    assert status == 200 and body["parts"] == 3
+    assert s3.get_object(Bucket=BUCKET, Key="audio/episode.wav")["Body"].read() == data
+
+
+def test_abort_and_validation(s3):
+    status, upload = call(create_multipart_upload, {"key": "audio/a.wav", "size": 100})
+    path = {"upload_id": upload["upload_id"]}
+    assert call(complete_multipart_upload, {"key": "audio/a.wav", "parts": []}, path)[0] == 400
+    assert call(abort_multipart_upload, path=path, query={"key": "audio/a.wav"})[0] == 200
+    assert call(abort_multipart_upload, path=path, query={"key": "audio/a.wav"})[0] == 404
+    assert call(create_multipart_upload, {"key": "audio/a.wav"})[0] == 400
+    assert call(get_multipart_upload, path=path, query={"key": "audio/a.wav", "parts": "x"})[0] == 400